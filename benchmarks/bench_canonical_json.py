@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+<Program Name>
+  bench_canonical_json.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Benchmarks in_toto.canonical_json.encode_canonical against
+  securesystemslib.formats.encode_canonical, for link dictionaries with the
+  passed numbers of materials and products, each with a sha256 and a sha512
+  hash, i.e. the shape of links created by in_toto.runlib.
+
+  Usage:
+    python benchmarks/bench_canonical_json.py [--artifacts <number> ...]
+        [--repeat <number>]
+
+"""
+import os
+import timeit
+import argparse
+import binascii
+
+import securesystemslib.formats
+
+from in_toto.canonical_json import encode_canonical
+
+
+def _create_link_dict(number):
+  artifacts = {}
+  for index in range(number):
+    artifacts["src/dir{}/file{}.c".format(index % 100, index)] = {
+      "sha256": binascii.hexlify(os.urandom(32)).decode(),
+      "sha512": binascii.hexlify(os.urandom(64)).decode(),
+    }
+
+  return {"_type": "link", "name": "build", "materials": artifacts,
+      "products": dict(artifacts), "byproducts": {"stdout": "", "stderr": "",
+      "return-value": 0}, "command": ["make"], "environment": {}}
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Benchmark canonical JSON encoders.")
+  parser.add_argument("--artifacts", type=int, nargs="+",
+      default=[1000, 100000], metavar="<number>",
+      help="numbers of materials and products per link")
+  parser.add_argument("--repeat", type=int, default=3, metavar="<number>",
+      help="number of runs per benchmark, the fastest is reported")
+  args = parser.parse_args()
+
+  for number in args.artifacts:
+    link_dict = _create_link_dict(number)
+    print("{} artifacts:".format(number))
+    for name, encode in [
+        ("securesystemslib", securesystemslib.formats.encode_canonical),
+        ("in_toto", encode_canonical)]:
+      seconds = min(timeit.repeat(lambda: encode(link_dict), number=1,
+          repeat=args.repeat))
+      print("  {:<18} {:>8.3f} s".format(name, seconds))
+
+
+if __name__ == "__main__":
+  main()
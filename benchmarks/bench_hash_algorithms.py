@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+<Program Name>
+  bench_hash_algorithms.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Benchmarks the throughput of in_toto.runlib._hash_artifact per supported
+  hash algorithm (see in_toto.formats.HASH_ALGORITHMS_SCHEMA), to help
+  choosing the ARTIFACT_HASH_ALGORITHMS setting. Algorithms that are not
+  provided by hashlib, e.g. BLAKE2 and SHA-3 on Python 2, are skipped.
+
+  Test files are created in a temporary directory and are likely served from
+  the page cache, i.e. the benchmark measures hashing rather than disk
+  throughput.
+
+  Usage:
+    python benchmarks/bench_hash_algorithms.py [--sizes <MiB> ...]
+        [--algorithms <algorithm> ...] [--repeat <number>]
+
+"""
+import os
+import shutil
+import timeit
+import argparse
+import tempfile
+
+import securesystemslib.hash
+import securesystemslib.exceptions
+
+from in_toto.runlib import _hash_artifact
+
+
+ALGORITHMS = ["md5", "sha1", "sha256", "sha512", "blake2b", "blake2s",
+    "sha3_256", "sha3_512"]
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark hash algorithms.")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1, 256],
+      metavar="<MiB>", help="sizes of the hashed files in MiB")
+  parser.add_argument("--algorithms", nargs="+", default=ALGORITHMS,
+      metavar="<algorithm>", help="hash algorithms")
+  parser.add_argument("--repeat", type=int, default=5, metavar="<number>",
+      help="number of runs per benchmark, the fastest is reported")
+  args = parser.parse_args()
+
+  algorithms = []
+  for algorithm in args.algorithms:
+    try:
+      securesystemslib.hash.digest(algorithm)
+
+    except securesystemslib.exceptions.UnsupportedAlgorithmError:
+      print("Skipping unsupported algorithm '{}'".format(algorithm))
+
+    else:
+      algorithms.append(algorithm)
+
+  test_dir = tempfile.mkdtemp()
+  try:
+    for size in args.sizes:
+      filepath = os.path.join(test_dir, "artifact-{}".format(size))
+      with open(filepath, "wb") as fp:
+        for _ in range(size):
+          fp.write(os.urandom(1024 * 1024))
+
+      print("{} MiB:".format(size))
+      for algorithm in algorithms:
+        seconds = min(timeit.repeat(
+            lambda: _hash_artifact(filepath, [algorithm]),
+            number=1, repeat=args.repeat))
+        print("  {:<10} {:>8.3f} s {:>10.1f} MiB/s".format(
+            algorithm, seconds, size / seconds))
+
+      os.remove(filepath)
+
+  finally:
+    shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,127 @@
+"""
+<Program Name>
+  archives.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides streaming access to the members of tar and zip archives, used by
+  `runlib.record_artifacts_as_dict` to record archive members without
+  extracting them, if the ARTIFACT_ARCHIVE_MEMBERS setting is enabled.
+
+  Archives are recognized by their file name extension (see
+  ARCHIVE_EXTENSIONS). Tar archives are read as a stream, i.e. compressed
+  tar archives are decompressed once, from start to end, and zip archives are
+  read member by member using their central directory. Only regular files
+  are yielded, directories, links and special files are skipped.
+
+"""
+import zlib
+import posixpath
+import tarfile
+import zipfile
+
+
+# Archive file name extensions and how to open them, i.e. "zip" or the mode
+# passed to `tarfile.open` (xz-compressed tar archives require Python 3)
+ARCHIVE_EXTENSIONS = [
+  (".tar", "r|"),
+  (".tar.gz", "r|gz"),
+  (".tgz", "r|gz"),
+  (".tar.bz2", "r|bz2"),
+  (".tbz2", "r|bz2"),
+  (".tar.xz", "r|xz"),
+  (".txz", "r|xz"),
+  (".zip", "zip"),
+]
+
+# Errors raised for unreadable archives, including decompression errors that
+# are not wrapped by tarfile or zipfile
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipfile, zlib.error, EOFError,
+    IOError, OSError, ValueError)
+
+try:
+  import lzma
+  ARCHIVE_ERRORS += (lzma.LZMAError,)
+except ImportError: # pragma: no cover (Python 2)
+  pass
+
+
+def _get_mode(path):
+  """Private helper that returns how to open the archive at the passed path
+  (see ARCHIVE_EXTENSIONS), or None if it is not an archive. """
+  lower_path = path.lower()
+  for extension, mode in ARCHIVE_EXTENSIONS:
+    if lower_path.endswith(extension):
+      return mode
+
+  return None
+
+
+def is_archive(path):
+  """
+  <Purpose>
+    Returns True if the passed path has an archive file name extension (see
+    ARCHIVE_EXTENSIONS).
+
+  <Arguments>
+    path:
+            A file path.
+
+  <Returns>
+    A boolean.
+
+  """
+  return _get_mode(path) is not None
+
+
+def iter_members(path):
+  """
+  <Purpose>
+    Generator that yields the name and a readable file object of each regular
+    file in the archive at the passed path, in the order in which they are
+    stored. A file object is only valid until the next member is yielded.
+
+    Member names are normalized, e.g. "./src//main.c" is yielded as
+    "src/main.c", but not resolved, i.e. they are never used to access the
+    file system.
+
+  <Arguments>
+    path:
+            Path to a tar or zip archive (see ARCHIVE_EXTENSIONS).
+
+  <Exceptions>
+    One of ARCHIVE_ERRORS, if the archive can't be read.
+
+  <Returns>
+    A generator of (member name, file object) tuples.
+
+  """
+  mode = _get_mode(path)
+  if mode == "zip":
+    with zipfile.ZipFile(path) as archive:
+      for info in archive.infolist():
+        if info.filename.endswith("/"):
+          continue
+
+        member_file = archive.open(info)
+        try:
+          yield posixpath.normpath(info.filename), member_file
+
+        finally:
+          member_file.close()
+
+  else:
+    with tarfile.open(path, mode) as archive:
+      for info in archive:
+        if not info.isfile():
+          continue
+
+        yield posixpath.normpath(info.name), archive.extractfile(info)
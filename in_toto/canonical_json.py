@@ -0,0 +1,200 @@
+"""
+<Program Name>
+  canonical_json.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides a canonical JSON encoder, which returns the same string as
+  `securesystemslib.formats.encode_canonical` and raises FormatError for the
+  same objects, but is much faster for large metadata, e.g. links with many
+  artifacts. It is used to create `Signable.signable_bytes`, i.e. the bytes
+  that are signed and verified.
+
+  In canonical JSON, dictionary keys are sorted, there is no whitespace,
+  only '"' and '\\' are escaped in strings, and the only numbers are
+  integers. Most metadata, i.e. dictionaries with string keys, lists,
+  strings, integers, booleans and None, encode the same with the C
+  accelerated `json.dumps` with sorted keys and compact separators, except
+  for control characters, which `json.dumps` escapes. Hence, on Python 3,
+  objects are first checked to only contain these types, encoded with
+  `json.dumps` and, if the result contains other escapes than '\\"' and
+  '\\\\', encoded again with a pure Python encoder, which is also used for
+  all other objects. The pure Python encoder builds a list of string parts
+  and joins them once, instead of calling an output function per part.
+
+"""
+import json
+
+import six
+
+import securesystemslib.exceptions
+
+
+# Types of scalar values, which `json.dumps` encodes canonically
+_JSON_SCALAR_TYPES = (str, int, bool, type(None))
+
+# Returns the JSON text of an object. Circular references are not checked,
+# i.e. they fail with RecursionError, like with securesystemslib's encoder
+_json_dumps = json.JSONEncoder(ensure_ascii=False, check_circular=False,
+    allow_nan=False, sort_keys=True, separators=(",", ":")).encode
+
+
+def _is_json_compatible(obj):
+  """Private helper that returns True, if the passed object only contains
+  dictionaries with string keys, lists, tuples, strings, integers, booleans
+  and None, i.e. no subclasses of these types, and False otherwise.
+
+  Dictionaries in dictionaries, e.g. the hashes of artifacts, are checked
+  along with their parent, all other containers are pushed to a stack and
+  only checked once, which also stops the check on circular references. """
+  seen = set()
+  stack = [obj]
+  while stack:
+    obj = stack.pop()
+    obj_type = type(obj)
+    if obj_type in _JSON_SCALAR_TYPES:
+      continue
+
+    if id(obj) in seen:
+      continue
+    seen.add(id(obj))
+
+    if obj_type is dict:
+      for key in obj:
+        if type(key) is not str:
+          return False
+
+      for value in six.itervalues(obj):
+        value_type = type(value)
+        if value_type is str:
+          continue
+
+        if value_type is not dict:
+          stack.append(value)
+          continue
+
+        for key, item in six.iteritems(value):
+          if type(key) is not str:
+            return False
+
+          if type(item) is not str:
+            stack.append(item)
+
+    elif obj_type is list or obj_type is tuple:
+      stack.extend(obj)
+
+    else:
+      return False
+
+  return True
+
+
+def _has_non_canonical_escapes(text):
+  """Private helper that returns True, if the passed JSON text contains
+  escape sequences other than '\\"' and '\\\\'. Escapes are paired from left
+  to right, like a JSON parser does, i.e. a backslash that remains after
+  removing all escaped backslashes and quotes begins another escape. """
+  if "\\" not in text:
+    return False
+
+  return "\\" in text.replace("\\\\", "").replace("\\\"", "")
+
+
+def _encode_string(string):
+  """Private helper that returns the passed string as canonical JSON string.
+  """
+  return "\"" + string.replace("\\", "\\\\").replace("\"", "\\\"") + "\""
+
+
+def _encode(obj, parts):
+  """Private helper that appends the canonical JSON string parts of the
+  passed object to the passed list (see module docstring). """
+  if isinstance(obj, six.string_types):
+    parts.append(_encode_string(obj))
+
+  elif obj is True:
+    parts.append("true")
+
+  elif obj is False:
+    parts.append("false")
+
+  elif obj is None:
+    parts.append("null")
+
+  elif isinstance(obj, six.integer_types):
+    parts.append(str(obj))
+
+  elif isinstance(obj, (tuple, list)):
+    parts.append("[")
+    for index, item in enumerate(obj):
+      if index:
+        parts.append(",")
+      _encode(item, parts)
+    parts.append("]")
+
+  elif isinstance(obj, dict):
+    parts.append("{")
+    for index, (key, value) in enumerate(sorted(six.iteritems(obj))):
+      if not isinstance(key, six.string_types):
+        raise securesystemslib.exceptions.FormatError(
+            "I cannot encode key " + repr(key))
+
+      if index:
+        parts.append(",")
+      parts.append(_encode_string(key))
+      parts.append(":")
+      _encode(value, parts)
+    parts.append("}")
+
+  else:
+    raise securesystemslib.exceptions.FormatError(
+        "I cannot encode " + repr(obj))
+
+
+def encode_canonical(obj):
+  """
+  <Purpose>
+    Encodes the passed object as canonical JSON string, like
+    `securesystemslib.formats.encode_canonical` (see module docstring).
+
+    Usage:
+    ```
+    signable_bytes = encode_canonical(link_dict).encode("utf-8")
+    ```
+
+  <Arguments>
+    obj:
+            A dictionary, list, tuple, string, integer, boolean or None, where
+            dictionaries have string keys and containers only contain these
+            types.
+
+  <Exceptions>
+    securesystemslib.exceptions.FormatError,
+            if the object cannot be encoded, e.g. because it contains a float.
+
+  <Returns>
+    A string.
+
+  """
+  if six.PY3 and _is_json_compatible(obj):
+    text = _json_dumps(obj)
+    if not _has_non_canonical_escapes(text):
+      return text
+
+  parts = []
+  try:
+    _encode(obj, parts)
+
+  except (TypeError, securesystemslib.exceptions.FormatError) as e:
+    raise securesystemslib.exceptions.FormatError(
+        "Could not encode " + repr(obj) + ": " + str(e))
+
+  return "".join(parts)
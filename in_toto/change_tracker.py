@@ -0,0 +1,389 @@
+"""
+<Program Name>
+  change_tracker.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides a Linux-only tracker for changes to artifacts, built on the
+  kernel's inotify API, which `runlib.in_toto_run` uses if the
+  ARTIFACT_TRACK_CHANGES setting is enabled, to record products that were not
+  touched by the command with the hashes of the corresponding materials,
+  without even stat'ing them.
+
+  The tracker watches every directory below the passed paths before the
+  materials are recorded, and collects the paths reported by the kernel until
+  it is stopped after the command has finished. A path is only considered
+  unchanged if:
+    - the tracker did not fail, e.g. because the kernel's event queue
+      overflowed, a watch could not be added (see the
+      fs.inotify.max_user_watches sysctl), or inotify is not available,
+    - its parent directory was watched and neither the path itself nor any
+      of its parent directories were reported as created, modified, moved,
+      deleted, or as having changed attributes,
+    - it was not a symbolic link when the watches were added.
+
+  Callers must additionally make sure that the file has no other hard links,
+  whose writes would not be reported for the watched directory.
+
+  NOTE: inotify does not report writes to memory-mapped files. These are
+  covered by the IN_CLOSE_WRITE event, which is reported when the file
+  descriptor used to create a writable mapping is closed, as long as the file
+  was opened after the watches were added.
+
+"""
+import os
+import sys
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+import six
+
+try:
+  from os import scandir
+except ImportError: # pragma: no cover (Python < 3.5)
+  from scandir import scandir
+
+# Inherits from in_toto base logger (c.f. in_toto.log)
+log = logging.getLogger(__name__)
+
+
+# Constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Events that make a watched directory or its entries untrustworthy
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+    IN_ONLYDIR | IN_DONT_FOLLOW)
+
+# struct inotify_event without the variable-length name
+_EVENT_HEADER = struct.Struct("iIII")
+
+_READ_SIZE = 64 * 1024
+
+
+def _load_libc():
+  """Private helper that returns the C library with the inotify functions,
+  or None if inotify is not available. """
+  if not sys.platform.startswith("linux"):
+    return None
+
+  try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+        use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+        ctypes.c_uint32]
+
+  except (OSError, AttributeError): # pragma: no cover
+    return None
+
+  return libc
+
+
+def _encode(path):
+  """Private helper that returns the passed path as bytes. """
+  if isinstance(path, six.binary_type):
+    return path
+
+  return path.encode(sys.getfilesystemencoding() or "utf-8")
+
+
+def _decode(name):
+  """Private helper that returns the passed name of an event as native
+  string. """
+  if six.PY2: # pragma: no cover
+    return name
+
+  return os.fsdecode(name)
+
+
+
+class ChangeTracker(object):
+  """Tracks changes to the files below a list of artifact paths while a
+  command is executed (see module docstring).
+
+  Events are read in a background thread, to keep the kernel's event queue
+  from overflowing during long running commands.
+
+  Usage:
+  ```
+  tracker = ChangeTracker(["src", "Makefile"], base_path="project")
+  tracker.start()
+  ... # record materials and run command
+  tracker.stop()
+  tracker.is_unchanged("src/main.c") # False, if e.g. modified
+  ```
+  """
+
+  def __init__(self, paths, base_path=None):
+    """
+    <Purpose>
+      Creates a tracker for the passed artifact paths.
+
+    <Arguments>
+      paths:
+              A list of recorded paths of files or directories, i.e. relative
+              to base_path.
+
+      base_path: (optional)
+              The directory relative to which paths are recorded. Default is
+              the current working directory.
+
+    """
+    self.paths = [os.path.normpath(path) for path in paths]
+    self.base_path = base_path
+    self.error = None
+
+    # Recorded paths of watched directories by watch descriptor, and all
+    # watched directories
+    self._watches = {}
+    self._watched = set()
+    # Recorded paths reported by events, and symlinks found in watched
+    # directories
+    self._changed = set()
+    self._symlinks = set()
+
+    self._fd = None
+    self._wakeup = None
+    self._thread = None
+    self._lock = threading.Lock()
+
+
+  @property
+  def failed(self):
+    """True, if tracking failed and no path is considered unchanged. """
+    return self.error is not None
+
+
+  def _fail(self, error):
+    """Private helper that marks the tracker as failed with the passed
+    error message, unless it has already failed. """
+    if self.error is None:
+      self.error = error
+      log.warning("Could not track changes ({}), rehashing changed files"
+          " instead...".format(error))
+
+
+  def _disk_path(self, path):
+    """Private helper that returns the path on disk of a recorded path. """
+    if self.base_path:
+      return os.path.join(self.base_path, path)
+
+    return path
+
+
+  def _add_watch(self, libc, path):
+    """Private helper that adds a watch for the directory at the passed
+    recorded path. """
+    wd = libc.inotify_add_watch(self._fd, _encode(self._disk_path(path)),
+        WATCH_MASK)
+    if wd < 0:
+      error = ctypes.get_errno()
+      raise OSError(error, os.strerror(error), self._disk_path(path))
+
+    # The same directory can't be watched under two different paths
+    if self._watches.setdefault(wd, path) != path:
+      raise OSError(errno.EEXIST, "Directory watched twice",
+          self._disk_path(path))
+
+    self._watched.add(path)
+
+
+  def _add_watches(self, libc, path):
+    """Private helper that adds watches for the directory at the passed
+    recorded path and all its subdirectories, without following symlinks.
+    """
+    stack = [path]
+    while stack:
+      directory = stack.pop()
+      self._add_watch(libc, directory)
+      for entry in scandir(self._disk_path(directory)):
+        entry_path = os.path.normpath(os.path.join(directory, entry.name))
+        if entry.is_symlink():
+          self._symlinks.add(entry_path)
+
+        elif entry.is_dir():
+          stack.append(entry_path)
+
+
+  def start(self):
+    """
+    <Purpose>
+      Adds the watches and starts reading events. Tracking fails with a
+      warning, if inotify is not available or the watches can't be added.
+
+    """
+    libc = _load_libc()
+    if libc is None:
+      self._fail("inotify is not available")
+      return
+
+    self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self._fd < 0:
+      self._fd = None
+      self._fail(os.strerror(ctypes.get_errno()))
+      return
+
+    try:
+      for path in self.paths:
+        disk_path = self._disk_path(path)
+        if os.path.isdir(disk_path) and not os.path.islink(disk_path):
+          self._add_watches(libc, path)
+
+        else:
+          # Files are tracked by watching their parent directory
+          parent = os.path.dirname(path) or "."
+          if parent not in self._watched:
+            self._add_watch(libc, parent)
+
+          if os.path.islink(disk_path):
+            self._symlinks.add(path)
+
+    except (OSError, IOError) as e:
+      self._fail(str(e))
+      self._close()
+      return
+
+    self._wakeup = os.pipe()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+
+  def _run(self):
+    """Private helper that reads events until the tracker is stopped. """
+    while True:
+      readable = select.select([self._fd, self._wakeup[0]], [], [])[0]
+      if self._wakeup[0] in readable:
+        return
+
+      self._read_events()
+
+
+  def _read_events(self):
+    """Private helper that reads and handles all queued events. """
+    while True:
+      try:
+        data = os.read(self._fd, _READ_SIZE)
+
+      except OSError as e:
+        if e.errno in (errno.EAGAIN, errno.EINTR):
+          return
+        self._fail(str(e)) # pragma: no cover
+        return # pragma: no cover
+
+      offset = 0
+      with self._lock:
+        while offset < len(data):
+          wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+          offset += _EVENT_HEADER.size
+          name = data[offset:offset + length].rstrip(b"\0")
+          offset += length
+          self._handle_event(wd, mask, name)
+
+
+  def _handle_event(self, wd, mask, name):
+    """Private helper that records the path reported by the passed event. """
+    if mask & IN_Q_OVERFLOW:
+      self._fail("event queue overflow")
+      return
+
+    directory = self._watches.get(wd)
+    if directory is None:
+      return
+
+    if name:
+      self._changed.add(os.path.normpath(os.path.join(directory,
+          _decode(name))))
+
+    # The watched directory itself was moved, deleted or unmounted
+    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_UNMOUNT | IN_IGNORED):
+      self._changed.add(directory)
+
+
+  def _close(self):
+    """Private helper that closes the inotify file descriptor. """
+    if self._fd is not None:
+      os.close(self._fd)
+      self._fd = None
+
+
+  def stop(self):
+    """
+    <Purpose>
+      Stops reading events, after reading all events queued so far, and
+      removes the watches.
+
+    """
+    if self._thread is not None:
+      os.write(self._wakeup[1], b"\0")
+      self._thread.join()
+      self._thread = None
+      for fd in self._wakeup:
+        os.close(fd)
+      self._wakeup = None
+
+      self._read_events()
+
+    self._close()
+
+    if not self.failed:
+      log.info("Tracked changes to {} paths".format(len(self._changed)))
+
+
+  def is_unchanged(self, path):
+    """
+    <Purpose>
+      Returns True, if the file at the passed recorded path is known not to
+      have changed while tracking (see module docstring).
+
+    <Arguments>
+      path:
+              The normalized recorded path of a file.
+
+    <Returns>
+      A boolean.
+
+    """
+    with self._lock:
+      if self.failed or path in self._symlinks:
+        return False
+
+      parent = os.path.dirname(path) or "."
+      if parent not in self._watched:
+        return False
+
+      while path:
+        if path in self._changed:
+          return False
+        path = os.path.dirname(path)
+
+      return "." not in self._changed
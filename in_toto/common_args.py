@@ -25,6 +25,7 @@
   ```
 
 """
+from in_toto.hash_cache import DEFAULT_CACHE_PATH
 
 EXCLUDE_ARGS = ["--exclude"]
 EXCLUDE_KWARGS = {
@@ -46,3 +47,55 @@ BASE_PATH_KWARGS = {
   "help": ("Record 'materials/products' relative to <path>. If not set,"
           " current working directory is used as base path.")
   }
+
+JOBS_ARGS = ["--jobs"]
+JOBS_KWARGS = {
+  "dest": "jobs",
+  "required": False,
+  "type": int,
+  "metavar": "<number>",
+  "help": ("Hash 'materials/products' using <number> parallel workers, or"
+          " one worker per CPU if <number> is 0. Overrides previously set"
+          " numbers, using e.g.: environment variables or RCfiles. See"
+          " ARTIFACT_HASH_JOBS documentation for additional info.")
+  }
+
+HASH_CACHE_ARGS = ["--hash-cache"]
+HASH_CACHE_KWARGS = {
+  "dest": "hash_cache",
+  "required": False,
+  "metavar": "<path>",
+  "nargs": "?",
+  "const": DEFAULT_CACHE_PATH,
+  "help": ("Look up hashes of unchanged 'materials/products' in the hash"
+          " cache database at <path>, or in the user's cache directory if"
+          " <path> is omitted, and add new hashes to it. Overrides previously"
+          " set paths, using e.g.: environment variables or RCfiles. See"
+          " ARTIFACT_HASH_CACHE documentation for additional info.")
+  }
+
+HASH_ALGORITHMS_ARGS = ["--hash-algorithms"]
+HASH_ALGORITHMS_KWARGS = {
+  "dest": "hash_algorithms",
+  "required": False,
+  "metavar": "<algorithm>",
+  "nargs": "+",
+  "help": ("Hash 'materials/products' using each <algorithm>, e.g. 'sha256"
+          " blake2b'. Supported are 'sha256', 'sha512' and other SHA-2"
+          " algorithms, 'blake2b', 'blake2s', 'sha3_256' and other SHA-3"
+          " algorithms, and the legacy 'md5' and 'sha1'. Passed algorithms"
+          " override previously set algorithms, using e.g.: environment"
+          " variables or RCfiles. See"
+          " ARTIFACT_HASH_ALGORITHMS documentation for additional info.")
+  }
+
+PROGRESS_ARGS = ["--progress"]
+PROGRESS_KWARGS = {
+  "dest": "progress",
+  "required": False,
+  "default": False,
+  "action": "store_true",
+  "help": ("Show the progress of recording 'materials/products' on stderr,"
+          " i.e. the number of recorded and remaining files, files/s, MB/s"
+          " and the estimated time until recording is done.")
+  }
@@ -51,3 +51,11 @@ ANY_SIGNATURE_SCHEMA = ssl_schema.OneOf([ssl_formats.SIGNATURE_SCHEMA,
 
 ANY_STRING_SCHEMA = ssl_schema.AnyString()
 LIST_OF_ANY_STRING_SCHEMA = ssl_schema.ListOf(ANY_STRING_SCHEMA)
+
+# Hash algorithms for recording artifacts, i.e. the legacy algorithms of
+# securesystemslib.formats.HASHALGORITHMS_SCHEMA, and the faster BLAKE2 and
+# SHA-3 algorithms provided by hashlib on Python 3.6 and later
+HASH_ALGORITHM_SCHEMA = ssl_schema.OneOf([ssl_schema.String(name)
+    for name in ["md5", "sha1", "sha224", "sha256", "sha384", "sha512",
+    "blake2b", "blake2s", "sha3_224", "sha3_256", "sha3_384", "sha3_512"]])
+HASH_ALGORITHMS_SCHEMA = ssl_schema.ListOf(HASH_ALGORITHM_SCHEMA)
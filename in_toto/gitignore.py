@@ -0,0 +1,244 @@
+"""
+<Program Name>
+  gitignore.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides a matcher for artifact exclude patterns in gitignore syntax, used
+  by `runlib.record_artifacts_as_dict` if the ARTIFACT_EXCLUDE_SYNTAX setting
+  is "gitignore".
+
+  Supported syntax (c.f. `git help gitignore`):
+    - Blank lines and lines starting with # are ignored, trailing spaces are
+      ignored unless escaped with a backslash, e.g. "\\#file" or "file\\ ".
+    - A leading ! negates the pattern, i.e. paths matched by a previous
+      pattern are included again. The last matching pattern decides.
+    - A trailing / only matches directories.
+    - A pattern with a leading or middle / is anchored, i.e. it matches the
+      full path. Any other pattern matches the path's basename at any level.
+    - * matches anything except /, ? matches any single character except /,
+      [seq] and [!seq] match any character in or not in seq.
+    - A leading **/ matches in all directories, a trailing /** matches
+      everything inside, and /**/ matches zero or more directories.
+
+  Like in git, a path whose parent directory is excluded can't be included
+  again, which allows to skip excluded directories without traversing them.
+
+  Paths are matched as recorded, i.e. relative to the base path, and with /
+  as separator.
+
+"""
+import re
+import io
+
+
+def read_patterns(path):
+  """
+  <Purpose>
+    Reads the patterns from the ignore file at the passed path, e.g. a
+    .gitignore file.
+
+  <Arguments>
+    path:
+            Path to an ignore file with one pattern per line.
+
+  <Exceptions>
+    IOError if the file can't be read.
+
+  <Returns>
+    A list of patterns, i.e. the lines of the file without line breaks.
+
+  """
+  with io.open(path, "r", encoding="utf-8") as fp:
+    return fp.read().splitlines()
+
+
+def _translate(pattern):
+  """Private helper that translates the passed gitignore pattern, without
+  negation, trailing spaces and trailing slash, to a regular expression
+  string that matches full paths. """
+  # Anchored patterns contain a slash before the last character
+  anchored = "/" in pattern
+  if pattern.startswith("/"):
+    pattern = pattern[1:]
+
+  regex = ""
+  if pattern.startswith("**/"):
+    regex = "(?:.*/)?"
+    pattern = pattern[3:]
+
+  elif not anchored:
+    regex = "(?:.*/)?"
+
+  index = 0
+  length = len(pattern)
+  while index < length:
+    char = pattern[index]
+
+    if pattern.startswith("/**/", index):
+      regex += "/(?:.*/)?"
+      index += 4
+      continue
+
+    if pattern.startswith("/**", index) and index + 3 == length:
+      regex += "/.*"
+      index += 3
+      continue
+
+    index += 1
+    if char == "*":
+      # Other consecutive asterisks are regular asterisks
+      while index < length and pattern[index] == "*":
+        index += 1
+      regex += "[^/]*"
+
+    elif char == "?":
+      regex += "[^/]"
+
+    elif char == "\\" and index < length:
+      regex += re.escape(pattern[index])
+      index += 1
+
+    elif char == "[":
+      end = index
+      if end < length and pattern[end] in "!^":
+        end += 1
+      if end < length and pattern[end] == "]":
+        end += 1
+      end = pattern.find("]", end)
+
+      # Unclosed brackets are literal brackets
+      if end == -1:
+        regex += "\\["
+
+      else:
+        seq = pattern[index:end].replace("\\", "\\\\").replace(
+            "[", "\\[")
+        if seq[:1] in ("!", "^"):
+          seq = "^" + seq[1:]
+        regex += "(?!/)[{}]".format(seq)
+        index = end + 1
+
+    else:
+      regex += re.escape(char)
+
+  return regex + r"\Z"
+
+
+def _parse(line):
+  """Private helper that parses the passed line of a gitignore file. Returns
+  a tuple (regex string, is negated, is directory only) or None, if the line
+  is blank or a comment. """
+  if not line or line.startswith("#"):
+    return None
+
+  # Strip trailing spaces, unless escaped
+  stripped = line.rstrip(" ")
+  if stripped.endswith("\\") and len(stripped) < len(line):
+    stripped += " "
+  line = stripped
+
+  negated = line.startswith("!")
+  if negated or line.startswith("\\!") or line.startswith("\\#"):
+    line = line[1:]
+
+  dir_only = line.endswith("/")
+  line = line.rstrip("/")
+
+  if not line:
+    return None
+
+  return _translate(line), negated, dir_only
+
+
+
+class GitIgnore(object):
+  """Compiled list of exclude patterns in gitignore syntax (see module
+  docstring).
+
+  Consecutive patterns of the same polarity, i.e. excluding or including,
+  are folded into one regular expression per block, and blocks are matched
+  from last to first, so that matching a path usually costs a single regex
+  match, independently of the number of patterns.
+
+  Usage:
+  ```
+  gitignore = GitIgnore(["node_modules/", "*.log", "!important.log"])
+  gitignore.match("src/node_modules", is_dir=True) # True
+  gitignore.match("logs/important.log") # False
+  ```
+  """
+
+  def __init__(self, patterns):
+    """
+    <Purpose>
+      Parses and compiles the passed patterns.
+
+    <Arguments>
+      patterns:
+              A list of patterns in gitignore syntax, e.g. as returned by
+              `read_patterns`.
+
+    """
+    # Blocks of consecutive patterns of the same polarity, each a list with
+    # negated flag and regex strings for directories and other paths
+    blocks = []
+    for line in patterns:
+      parsed = _parse(line)
+      if parsed is None:
+        continue
+
+      regex, negated, dir_only = parsed
+      if not blocks or blocks[-1][0] != negated:
+        blocks.append([negated, [], []])
+
+      blocks[-1][1].append(regex)
+      if not dir_only:
+        blocks[-1][2].append(regex)
+
+    # Compile blocks in reverse order, i.e. the last matching block decides
+    self._dir_blocks = []
+    self._file_blocks = []
+    for negated, dir_regexes, file_regexes in reversed(blocks):
+      for regexes, compiled_blocks in [(dir_regexes, self._dir_blocks),
+          (file_regexes, self._file_blocks)]:
+        if regexes:
+          compiled_blocks.append((negated, re.compile("|".join(
+              "(?:{})".format(regex) for regex in regexes), re.DOTALL)))
+
+
+  def match(self, path, is_dir=False):
+    """
+    <Purpose>
+      Returns True if the passed path is excluded, i.e. if the last pattern
+      that matches the path is not negated. Parent directories of the path
+      are not matched (see module docstring).
+
+    <Arguments>
+      path:
+              A normalized path using / as separator.
+
+      is_dir: (optional)
+              True if the path is a directory (default is False), which
+              enables directory-only patterns.
+
+    <Returns>
+      A boolean.
+
+    """
+    if path == ".":
+      return False
+
+    for negated, regex in (self._dir_blocks if is_dir else self._file_blocks):
+      if regex.match(path):
+        return not negated
+
+    return False
@@ -21,6 +21,8 @@ import in_toto.gpg.dsa as dsa
 GPG_SIGN_COMMAND = "gpg2 --detach-sign --digest-algo SHA256 {keyarg} {homearg}"
 GPG_EXPORT_PUBKEY_COMMAND = "gpg2 {homearg} --export {keyid}"
 GPG_VERSION_COMMAND = "gpg2 --version"
+GPG_LIST_SECRET_KEYS_COMMAND = ("gpg2 --batch {homearg} --list-secret-keys"
+    " {keyid}")
 
 FULLY_SUPPORTED_MIN_VERSION = "2.1.0"
 
@@ -23,7 +23,8 @@ import in_toto.gpg.common
 import in_toto.gpg.exceptions
 import in_toto.gpg.formats
 from in_toto.gpg.constants import (GPG_EXPORT_PUBKEY_COMMAND, GPG_SIGN_COMMAND,
-    SIGNATURE_HANDLERS, FULLY_SUPPORTED_MIN_VERSION)
+    GPG_LIST_SECRET_KEYS_COMMAND, SIGNATURE_HANDLERS,
+    FULLY_SUPPORTED_MIN_VERSION)
 
 import securesystemslib.formats
 
@@ -136,6 +137,56 @@ def gpg_sign_object(content, keyid=None, homedir=None):
   return signature
 
 
+def gpg_launch_agent(keyid=None, homedir=None):
+  """
+  <Purpose>
+    Calls the gpg2 command line utility to list the secret keys identified by
+    the passed keyid, or all secret keys, in the gpg keyring at the passed
+    homedir, discarding the output. This launches the gpg-agent and reads the
+    keyring, which `gpg_sign_object` would otherwise have to wait for, e.g.
+    while the content to be signed is still being created.
+
+    The executed base command is defined in
+    constants.GPG_LIST_SECRET_KEYS_COMMAND. Running it never prompts for a
+    passphrase.
+
+  <Arguments>
+    keyid: (optional)
+            The keyid of the gpg signing key in the format
+            securesystemslib.formats.KEYID_SCHEMA.
+
+    homedir: (optional)
+            Path to the gpg keyring. If not passed the default keyring is used.
+
+  <Exceptions>
+    securesystemslib.exceptions.FormatError:
+            If the keyid was passed and does not match
+            securesystemslib.formats.KEYID_SCHEMA
+
+    OSError:
+            If the gpg command is not present or non-executable.
+
+  <Side Effects>
+    Launches the gpg-agent, if it is not running.
+
+  <Returns>
+    None.
+
+  """
+  if keyid:
+    securesystemslib.formats.KEYID_SCHEMA.check_match(keyid)
+
+  homearg = ""
+  if homedir:
+    homearg = "--homedir {}".format(homedir)
+
+  command = GPG_LIST_SECRET_KEYS_COMMAND.format(keyid=keyid or "",
+      homearg=homearg)
+  process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE,
+      stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+  process.communicate()
+
+
 def gpg_verify_signature(signature_object, pubkey_info, content):
   """
   <Purpose>
@@ -0,0 +1,571 @@
+"""
+<Program Name>
+  hash_cache.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides a persistent, size-bounded cache for artifact hashes, used by
+  `runlib.record_artifacts_as_dict` to avoid re-reading files that have not
+  changed since they were last hashed.
+
+  Cache entries are stored in an sqlite database, one entry per file and hash
+  algorithm, identified by the file's device and inode numbers. An entry is
+  only used if the file's current size, modification time and inode change
+  time equal the stored values, i.e. the hash of an unchanged file costs a
+  single `stat` call.
+
+  Safe invalidation:
+    - Any write to a file changes its inode change time (ctime), which can't
+      be set from user space. Hence a changed file never matches an entry.
+    - Files whose timestamps are not older than TIMESTAMP_GRANULARITY_NS
+      at the time they are hashed, or that change while they are hashed, are
+      not cached. This prevents caching a hash for file contents that could
+      still be modified within the same timestamp tick (a.k.a. "racy" files).
+    - Unreadable or corrupted cache databases are ignored with a warning.
+
+  `StatSnapshot` applies the same invalidation rules to an in-memory map of
+  recorded paths, which `runlib.in_toto_run` uses to reuse the hashes of
+  materials for unchanged products. If the ARTIFACT_RECORD_SNAPSHOT setting is
+  enabled, `runlib.in_toto_record_start` writes the snapshot of the materials
+  to a sidecar file next to the preliminary link (see
+  SNAPSHOT_FILENAME_SUFFIX), which `runlib.in_toto_record_stop` loads to the
+  same end. The sidecar only holds the stat fields of each file, the hashes
+  are taken from the signed materials of the preliminary link, once its
+  signature is verified.
+
+  NOTE: The stat fields in the sidecar are not signed. Whoever can write to it
+  can make `runlib.in_toto_record_stop` record the hash of a material for a
+  modified product, which is why the sidecar is disabled by default.
+
+  NOTE: Whoever can write to the cache database can make in-toto record
+  arbitrary hashes for unchanged files. The database is created with
+  permissions for the current user only and should not be shared with less
+  trusted users.
+
+"""
+import os
+import time
+import json
+import errno
+import hashlib
+import logging
+import sqlite3
+
+import six
+
+# Inherits from in_toto base logger (c.f. in_toto.log)
+log = logging.getLogger(__name__)
+
+
+# Cache location used if caching is enabled without specifying a path
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME",
+        os.path.join(os.path.expanduser("~"), ".cache")),
+    "in_toto", "hash_cache.sqlite")
+
+# Maximum number of entries kept if no size is specified, least recently used
+# entries are evicted first
+DEFAULT_CACHE_SIZE = 1000000
+
+# Files with timestamps less than this many nanoseconds older than the time at
+# which hashing starts are not cached (some file systems have a timestamp
+# resolution of two seconds)
+TIMESTAMP_GRANULARITY_NS = 2 * 10**9
+
+# Bump to discard databases created with an incompatible schema
+_SCHEMA_VERSION = 1
+
+# Suffix appended to the file name of a preliminary link to get the name of
+# its stat snapshot sidecar file
+SNAPSHOT_FILENAME_SUFFIX = ".snapshot"
+
+
+def stat_key(stat_result):
+  """Returns the tuple of `os.stat_result` fields used to detect changes to a
+  file, i.e. (device, inode, size, mtime, ctime) with nanosecond timestamps.
+  """
+  mtime_ns = getattr(stat_result, "st_mtime_ns", None)
+  if mtime_ns is None: # pragma: no cover (Python 2)
+    mtime_ns = int(stat_result.st_mtime * 10**9)
+    ctime_ns = int(stat_result.st_ctime * 10**9)
+
+  else:
+    ctime_ns = stat_result.st_ctime_ns
+
+  return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size,
+      mtime_ns, ctime_ns)
+
+
+def is_racy(stat_result, start_ns):
+  """Returns True if the file with the passed `os.stat_result` might be
+  modified after `start_ns` (time in nanoseconds since the epoch) without
+  changing its timestamps, because they lie within the same timestamp tick.
+  """
+  newest_ns = max(stat_key(stat_result)[3:])
+  return newest_ns >= start_ns - TIMESTAMP_GRANULARITY_NS
+
+
+def time_ns():
+  """Returns the current time in nanoseconds since the epoch. """
+  return int(time.time() * 10**9)
+
+
+
+class HashCache(object):
+  """Persistent cache mapping unchanged files to their hashes.
+
+  The cache is not thread-safe, i.e. an instance must only be used by the
+  thread that created it. Multiple instances, e.g. in different processes,
+  can share one database file.
+
+  Usage:
+  ```
+  with HashCache(path) as cache:
+    hash_dict = cache.get(os.stat(filepath), ["sha256"])
+    if hash_dict is None:
+      hash_dict = ...
+      cache.set(os.stat(filepath), hash_dict)
+  ```
+  """
+
+  def __init__(self, path=None, max_size=None):
+    """
+    <Purpose>
+      Opens or creates the cache database at the passed path. If the database
+      can't be used a warning is logged and the cache stays empty.
+
+    <Arguments>
+      path: (optional)
+              Path to the cache database (default is DEFAULT_CACHE_PATH).
+
+      max_size: (optional)
+              Maximum number of entries kept in the database (default is
+              DEFAULT_CACHE_SIZE).
+
+    <Exceptions>
+      ValueError if max_size is not a positive integer.
+
+    """
+    self.path = path or DEFAULT_CACHE_PATH
+    self.max_size = int(max_size or DEFAULT_CACHE_SIZE)
+    if self.max_size < 1:
+      raise ValueError("Hash cache size must be a positive integer, got"
+          " '{}'.".format(max_size))
+
+    self.hits = 0
+    self.misses = 0
+    self._used = []
+    self._connection = None
+
+    try:
+      self._connection = self._connect()
+
+    except (sqlite3.Error, OSError, IOError) as e:
+      log.warning("Could not use hash cache '{}', hashing all files: {}"
+          .format(self.path, e))
+
+
+  def _connect(self):
+    """Private method to open (and create or reset) the cache database. """
+    dirname = os.path.dirname(os.path.abspath(self.path))
+    try:
+      os.makedirs(dirname, 0o700)
+
+    except OSError as e:
+      if e.errno != errno.EEXIST:
+        raise
+
+    created = not os.path.exists(self.path)
+    connection = sqlite3.connect(self.path, timeout=30)
+
+    try:
+      if created:
+        os.chmod(self.path, 0o600)
+
+      if connection.execute("PRAGMA user_version").fetchone()[0] != \
+          _SCHEMA_VERSION:
+        connection.execute("DROP TABLE IF EXISTS hashes")
+        connection.execute("CREATE TABLE hashes (dev INTEGER, ino INTEGER,"
+            " algorithm TEXT, size INTEGER, mtime_ns INTEGER,"
+            " ctime_ns INTEGER, digest TEXT, last_used REAL,"
+            " PRIMARY KEY (dev, ino, algorithm))")
+        connection.execute(
+            "CREATE INDEX hashes_last_used ON hashes (last_used)")
+        connection.execute("PRAGMA user_version = {:d}".format(
+            _SCHEMA_VERSION))
+        connection.commit()
+
+    except sqlite3.Error:
+      connection.close()
+      raise
+
+    return connection
+
+
+  def _disable(self, error):
+    """Private method to stop using a database that turned out unusable. """
+    log.warning("Could not use hash cache '{}', hashing all files: {}"
+        .format(self.path, error))
+    self._connection.close()
+    self._connection = None
+
+
+  def get(self, stat_result, hash_algorithms):
+    """
+    <Purpose>
+      Returns the cached hashes for the file with the passed `os.stat_result`,
+      if all passed algorithms are cached for the file in its current state.
+
+    <Arguments>
+      stat_result:
+              The `os.stat_result` of the file, taken before it is read.
+
+      hash_algorithms:
+              A list of hash algorithm names.
+
+    <Returns>
+      A hashdict conformant with securesystemslib.formats.HASHDICT_SCHEMA, or
+      None.
+
+    """
+    hash_dict = None
+    if self._connection:
+      dev, ino, size, mtime_ns, ctime_ns = stat_key(stat_result)
+      try:
+        rows = self._connection.execute("SELECT algorithm, digest FROM hashes"
+            " WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND"
+            " ctime_ns = ?", (dev, ino, size, mtime_ns, ctime_ns)).fetchall()
+
+      except sqlite3.Error as e:
+        self._disable(e)
+        rows = []
+
+      cached = dict(rows)
+      if all(algorithm in cached for algorithm in hash_algorithms):
+        hash_dict = {algorithm: str(cached[algorithm])
+            for algorithm in hash_algorithms}
+        self._used.append((dev, ino))
+
+    if hash_dict is None:
+      self.misses += 1
+
+    else:
+      self.hits += 1
+
+    return hash_dict
+
+
+  def set(self, stat_result, hash_dict, start_ns):
+    """
+    <Purpose>
+      Caches the passed hashes for the file with the passed `os.stat_result`,
+      unless the file is racy (see module docstring).
+
+    <Arguments>
+      stat_result:
+              The `os.stat_result` of the file, taken before it was read.
+
+      hash_dict:
+              The hashdict of the file.
+
+      start_ns:
+              The time in nanoseconds since the epoch, before the file was
+              read.
+
+    """
+    if not self._connection or is_racy(stat_result, start_ns):
+      return
+
+    dev, ino, size, mtime_ns, ctime_ns = stat_key(stat_result)
+    now = time.time()
+    try:
+      self._connection.executemany("INSERT OR REPLACE INTO hashes VALUES"
+          " (?, ?, ?, ?, ?, ?, ?, ?)", [(dev, ino, algorithm, size, mtime_ns,
+          ctime_ns, digest, now) for algorithm, digest in hash_dict.items()])
+
+    except sqlite3.Error as e:
+      self._disable(e)
+
+
+  def close(self):
+    """
+    <Purpose>
+      Updates the recently used entries, evicts the least recently used
+      entries exceeding the maximum cache size, writes all changes to disk
+      and closes the database.
+
+    """
+    if not self._connection:
+      return
+
+    try:
+      self._connection.executemany("UPDATE hashes SET last_used = ? WHERE"
+          " dev = ? AND ino = ?", [(time.time(), dev, ino)
+          for dev, ino in self._used])
+
+      count = self._connection.execute(
+          "SELECT COUNT(*) FROM hashes").fetchone()[0]
+      if count > self.max_size:
+        self._connection.execute("DELETE FROM hashes WHERE rowid IN (SELECT"
+            " rowid FROM hashes ORDER BY last_used LIMIT ?)",
+            (count - self.max_size,))
+
+      self._connection.commit()
+
+    except sqlite3.Error as e:
+      log.warning("Could not update hash cache '{}': {}".format(self.path, e))
+
+    self._connection.close()
+    self._connection = None
+    self._used = []
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+
+class StatSnapshot(object):
+  """In-memory map of recorded artifact paths to the `stat_key` and hashes of
+  the files at the time they were recorded, used to only rehash files that
+  have changed since, e.g. products that were recorded as materials.
+
+  Entries are only added for files that are not racy (see module
+  docstring), and only returned if the file's current `stat_key`, which
+  includes device and inode numbers, equals the stored one.
+
+  If an `in_toto.change_tracker.ChangeTracker` is assigned to `tracker`,
+  `get_tracked` returns the hashes of files that the tracker reports as
+  unchanged without a `stat_result`.
+
+  Snapshots can be written to a file, with `dump`, and read back for the same
+  signed link, whose materials hold the hashes, with `load`.
+
+  Usage:
+  ```
+  snapshot = StatSnapshot()
+  snapshot.set(path, os.stat(path), hash_dict, start_ns)
+  ... # run command
+  hash_dict = snapshot.get(path, os.stat(path), ["sha256"])
+  ```
+  """
+
+  def __init__(self):
+    self.hits = 0
+    self.misses = 0
+    self.tracker = None
+    self._entries = {}
+
+
+  def __len__(self):
+    return len(self._entries)
+
+
+  def get(self, path, stat_result, hash_algorithms):
+    """
+    <Purpose>
+      Returns the snapshot hashes of the file at the passed recorded path, if
+      all passed algorithms are in the snapshot and the file's passed
+      `os.stat_result` is unchanged.
+
+    <Arguments>
+      path:
+              The recorded path of the file.
+
+      stat_result:
+              The current `os.stat_result` of the file.
+
+      hash_algorithms:
+              A list of hash algorithm names.
+
+    <Returns>
+      A hashdict conformant with securesystemslib.formats.HASHDICT_SCHEMA, or
+      None.
+
+    """
+    hash_dict = None
+    entry = self._entries.get(path)
+    if entry is not None and entry[0] == stat_key(stat_result):
+      hash_dict = self._get_hashes(entry, hash_algorithms)
+
+    if hash_dict is None:
+      self.misses += 1
+
+    else:
+      self.hits += 1
+
+    return hash_dict
+
+
+  def get_tracked(self, path, hash_algorithms):
+    """
+    <Purpose>
+      Returns the snapshot hashes of the file at the passed recorded path, if
+      all passed algorithms are in the snapshot, the assigned tracker reports
+      the file as unchanged, and the file had no other hard links when it was
+      added, whose changes the tracker could miss.
+
+    <Arguments>
+      path:
+              The recorded path of the file.
+
+      hash_algorithms:
+              A list of hash algorithm names.
+
+    <Returns>
+      A hashdict conformant with securesystemslib.formats.HASHDICT_SCHEMA, or
+      None.
+
+    """
+    entry = self._entries.get(path)
+    if entry is None or entry[2] != 1 or self.tracker is None or \
+        not self.tracker.is_unchanged(path):
+      return None
+
+    hash_dict = self._get_hashes(entry, hash_algorithms)
+    if hash_dict is not None:
+      self.hits += 1
+
+    return hash_dict
+
+
+  @staticmethod
+  def _get_hashes(entry, hash_algorithms):
+    """Private helper that returns the hashes of the passed entry for the
+    passed algorithms, or None if any of them is missing. """
+    if not all(algorithm in entry[1] for algorithm in hash_algorithms):
+      return None
+
+    return {algorithm: entry[1][algorithm] for algorithm in hash_algorithms}
+
+
+  def set(self, path, stat_result, hash_dict, start_ns):
+    """
+    <Purpose>
+      Adds the passed hashes of the file at the passed recorded path to the
+      snapshot, unless the file is racy (see module docstring).
+
+    <Arguments>
+      path:
+              The recorded path of the file.
+
+      stat_result:
+              The `os.stat_result` of the file, taken before it was read.
+
+      hash_dict:
+              The hashdict of the file.
+
+      start_ns:
+              The time in nanoseconds since the epoch, before the file was
+              read.
+
+    """
+    if is_racy(stat_result, start_ns):
+      self._entries.pop(path, None)
+
+    else:
+      self._entries[path] = (stat_key(stat_result), dict(hash_dict),
+          stat_result.st_nlink)
+
+
+  @staticmethod
+  def _get_link_digest(link):
+    """Private helper that returns a digest of the signed bytes of the passed
+    link, which ties a snapshot file to the link it was dumped for. """
+    return hashlib.sha256(link.signable_bytes).hexdigest()
+
+
+  def dump(self, path, link):
+    """
+    <Purpose>
+      Writes the stat fields of the snapshot entries, whose hashes are the
+      materials of the passed link, to a file at the passed path.
+
+    <Arguments>
+      path:
+              The path of the sidecar file, i.e. the preliminary link's path
+              with SNAPSHOT_FILENAME_SUFFIX.
+
+      link:
+              The Link object whose materials the snapshot was recorded for.
+
+    <Side Effects>
+      Writes the sidecar file.
+
+    """
+    entries = {entry_path: list(entry[0]) + [entry[2]]
+        for entry_path, entry in self._entries.items()
+        if link.materials.get(entry_path) == entry[1]}
+
+    with open(path, "w") as fp:
+      json.dump({"link": self._get_link_digest(link), "entries": entries}, fp,
+          separators=(",", ":"))
+
+
+  @classmethod
+  def load(cls, path, link):
+    """
+    <Purpose>
+      Reads a snapshot from the file at the passed path, written by `dump`
+      for the passed link, whose signature must have been verified. The
+      hashes of the entries are the materials of the link.
+
+      If the file is missing, can't be read, or was written for a different
+      link, i.e. is stale, a message is logged and None is returned, in which
+      case callers hash all files.
+
+    <Arguments>
+      path:
+              The path of the sidecar file.
+
+      link:
+              The Link object the snapshot was dumped for.
+
+    <Returns>
+      A StatSnapshot object, or None.
+
+    """
+    try:
+      with open(path, "r") as fp:
+        data = json.load(fp)
+
+      if data["link"] != cls._get_link_digest(link):
+        log.info("Ignoring stale stat snapshot '{}', hashing all files..."
+            .format(path))
+        return None
+
+      snapshot = cls()
+      for entry_path, fields in data["entries"].items():
+        if entry_path not in link.materials:
+          continue
+
+        if len(fields) != 6 or not all(isinstance(field, six.integer_types) and
+            not isinstance(field, bool) for field in fields):
+          raise ValueError("bad entry '{}'".format(entry_path))
+
+        snapshot._entries[entry_path] = (tuple(fields[:5]),
+            dict(link.materials[entry_path]), fields[5])
+
+    except (IOError, OSError) as e:
+      log.info("Could not read stat snapshot '{}', hashing all files: {}"
+          .format(path, e))
+      return None
+
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+      log.warning("Ignoring invalid stat snapshot '{}', hashing all files:"
+          " {}".format(path, e))
+      return None
+
+    return snapshot
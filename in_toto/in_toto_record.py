@@ -64,6 +64,31 @@ optional arguments:
                         for additional info.
   --base-path <path>    Record 'materials/products' relative to <path>. If not
                         set, current working directory is used as base path.
+  --jobs <number>       Hash 'materials/products' using <number> parallel
+                        workers, or one worker per CPU if <number> is 0.
+                        Overrides previously set numbers, using e.g.:
+                        environment variables or RCfiles. See
+                        ARTIFACT_HASH_JOBS documentation for additional info.
+  --hash-cache [<path>]
+                        Look up hashes of unchanged 'materials/products' in
+                        the hash cache database at <path>, or in the user's
+                        cache directory if <path> is omitted, and add new
+                        hashes to it. Overrides previously set paths, using
+                        e.g.: environment variables or RCfiles. See
+                        ARTIFACT_HASH_CACHE documentation for additional info.
+  --hash-algorithms <algorithm> [<algorithm> ...]
+                        Hash 'materials/products' using each <algorithm>, e.g.
+                        'sha256 blake2b'. Supported are 'sha256', 'sha512' and
+                        other SHA-2 algorithms, 'blake2b', 'blake2s',
+                        'sha3_256' and other SHA-3 algorithms, and the legacy
+                        'md5' and 'sha1'. Passed algorithms override
+                        previously set algorithms, using e.g.: environment
+                        variables or RCfiles. See ARTIFACT_HASH_ALGORITHMS
+                        documentation for additional info.
+  --progress            Show the progress of recording 'materials/products' on
+                        stderr, i.e. the number of recorded and remaining
+                        files, files/s, MB/s and the estimated time until
+                        recording is done.
   -v, --verbose         Verbose execution.
   -q, --quiet           Suppress all output.
 
@@ -109,9 +134,12 @@ import logging
 import in_toto.util
 import in_toto.user_settings
 import in_toto.runlib
+import in_toto.progress
 
 from in_toto.common_args import (EXCLUDE_ARGS, EXCLUDE_KWARGS,
-    BASE_PATH_ARGS, BASE_PATH_KWARGS)
+    BASE_PATH_ARGS, BASE_PATH_KWARGS, JOBS_ARGS, JOBS_KWARGS,
+    HASH_CACHE_ARGS, HASH_CACHE_KWARGS, HASH_ALGORITHMS_ARGS,
+    HASH_ALGORITHMS_KWARGS, PROGRESS_ARGS, PROGRESS_KWARGS)
 
 # Command line interfaces should use in_toto base logger (c.f. in_toto.log)
 log = logging.getLogger("in_toto")
@@ -185,6 +213,11 @@ examples:
 
   parent_parser.add_argument(*EXCLUDE_ARGS, **EXCLUDE_KWARGS)
   parent_parser.add_argument(*BASE_PATH_ARGS, **BASE_PATH_KWARGS)
+  parent_parser.add_argument(*JOBS_ARGS, **JOBS_KWARGS)
+  parent_parser.add_argument(*HASH_CACHE_ARGS, **HASH_CACHE_KWARGS)
+  parent_parser.add_argument(*HASH_ALGORITHMS_ARGS,
+      **HASH_ALGORITHMS_KWARGS)
+  parent_parser.add_argument(*PROGRESS_ARGS, **PROGRESS_KWARGS)
 
 
   verbosity_args = parent_parser.add_mutually_exclusive_group(required=False)
@@ -244,18 +277,26 @@ examples:
     if args.key:
       key = in_toto.util.prompt_import_rsa_key_from_file(args.key)
 
+    progress = None
+    if args.progress:
+      progress = in_toto.progress.ProgressReporter()
+
     if args.command == "start":
       in_toto.runlib.in_toto_record_start(args.step_name, args.materials,
           signing_key=key, gpg_keyid=gpg_keyid,
           gpg_use_default=gpg_use_default, gpg_home=args.gpg_home,
-          exclude_patterns=args.exclude_patterns, base_path=args.base_path)
+          exclude_patterns=args.exclude_patterns, base_path=args.base_path,
+          jobs=args.jobs, hash_cache=args.hash_cache,
+          hash_algorithms=args.hash_algorithms, progress=progress)
 
     # Mutually exclusiveness is guaranteed by argparser
     else: # args.command == "stop":
       in_toto.runlib.in_toto_record_stop(args.step_name, args.products,
           signing_key=key, gpg_keyid=gpg_keyid,
           gpg_use_default=gpg_use_default, gpg_home=args.gpg_home,
-          exclude_patterns=args.exclude_patterns, base_path=args.base_path)
+          exclude_patterns=args.exclude_patterns, base_path=args.base_path,
+          jobs=args.jobs, hash_cache=args.hash_cache,
+          hash_algorithms=args.hash_algorithms, progress=progress)
 
   except Exception as e:
     log.error("(in-toto-record {0}) {1}: {2}"
@@ -60,6 +60,44 @@ optional arguments:
                         for additional info.
   --base-path <path>    Record 'materials/products' relative to <path>. If not
                         set, current working directory is used as base path.
+  --jobs <number>       Hash 'materials/products' using <number> parallel
+                        workers, or one worker per CPU if <number> is 0.
+                        Overrides previously set numbers, using e.g.:
+                        environment variables or RCfiles. See
+                        ARTIFACT_HASH_JOBS documentation for additional info.
+  --hash-cache [<path>]
+                        Look up hashes of unchanged 'materials/products' in
+                        the hash cache database at <path>, or in the user's
+                        cache directory if <path> is omitted, and add new
+                        hashes to it. Overrides previously set paths, using
+                        e.g.: environment variables or RCfiles. See
+                        ARTIFACT_HASH_CACHE documentation for additional info.
+  --hash-algorithms <algorithm> [<algorithm> ...]
+                        Hash 'materials/products' using each <algorithm>, e.g.
+                        'sha256 blake2b'. Supported are 'sha256', 'sha512' and
+                        other SHA-2 algorithms, 'blake2b', 'blake2s',
+                        'sha3_256' and other SHA-3 algorithms, and the legacy
+                        'md5' and 'sha1'. Passed algorithms override
+                        previously set algorithms, using e.g.: environment
+                        variables or RCfiles. See ARTIFACT_HASH_ALGORITHMS
+                        documentation for additional info.
+  --progress            Show the progress of recording 'materials/products' on
+                        stderr, i.e. the number of recorded and remaining
+                        files, files/s, MB/s and the estimated time until
+                        recording is done.
+  --full-rehash         Hash all 'products', instead of reusing the hashes of
+                        'materials' that did not change while the command was
+                        executed. See ARTIFACT_FULL_REHASH documentation for
+                        additional info.
+  --track-changes       Watch 'products' for changes while 'materials' are
+                        recorded and the command is executed (Linux only), and
+                        reuse the hashes of untouched 'materials' without
+                        reading their timestamps. See ARTIFACT_TRACK_CHANGES
+                        documentation for additional info.
+  --directory-digests   Record each 'materials/products' directory as a single
+                        Merkle root, and store its files in a '.leaves' file
+                        next to the link. See ARTIFACT_DIRECTORY_DIGESTS
+                        documentation for additional info.
   -v, --verbose         Verbose execution.
   -q, --quiet           Suppress all output.
 
@@ -98,10 +136,13 @@ import sys
 import argparse
 import logging
 import in_toto.user_settings
+import in_toto.progress
 from in_toto import (util, runlib)
 
 from in_toto.common_args import (EXCLUDE_ARGS, EXCLUDE_KWARGS,
-    BASE_PATH_ARGS, BASE_PATH_KWARGS)
+    BASE_PATH_ARGS, BASE_PATH_KWARGS, JOBS_ARGS, JOBS_KWARGS,
+    HASH_CACHE_ARGS, HASH_CACHE_KWARGS, HASH_ALGORITHMS_ARGS,
+    HASH_ALGORITHMS_KWARGS, PROGRESS_ARGS, PROGRESS_KWARGS)
 
 # Command line interfaces should use in_toto base logger (c.f. in_toto.log)
 log = logging.getLogger("in_toto")
@@ -189,6 +230,29 @@ examples:
 
   parser.add_argument(*EXCLUDE_ARGS, **EXCLUDE_KWARGS)
   parser.add_argument(*BASE_PATH_ARGS, **BASE_PATH_KWARGS)
+  parser.add_argument(*JOBS_ARGS, **JOBS_KWARGS)
+  parser.add_argument(*HASH_CACHE_ARGS, **HASH_CACHE_KWARGS)
+  parser.add_argument(*HASH_ALGORITHMS_ARGS, **HASH_ALGORITHMS_KWARGS)
+  parser.add_argument(*PROGRESS_ARGS, **PROGRESS_KWARGS)
+
+  parser.add_argument("--full-rehash", dest="full_rehash", default=None,
+      action="store_true", help=(
+      "Hash all 'products', instead of reusing the hashes of 'materials' that"
+      " did not change while the command was executed. See"
+      " ARTIFACT_FULL_REHASH documentation for additional info."))
+
+  parser.add_argument("--track-changes", dest="track_changes", default=None,
+      action="store_true", help=(
+      "Watch 'products' for changes while 'materials' are recorded and the"
+      " command is executed (Linux only), and reuse the hashes of untouched"
+      " 'materials' without reading their timestamps. See"
+      " ARTIFACT_TRACK_CHANGES documentation for additional info."))
+
+  parser.add_argument("--directory-digests", dest="directory_digests",
+      default=None, action="store_true", help=(
+      "Record each 'materials/products' directory as a single Merkle root,"
+      " and store its files in a '.leaves' file next to the link. See"
+      " ARTIFACT_DIRECTORY_DIGESTS documentation for additional info."))
 
   verbosity_args = parser.add_mutually_exclusive_group(required=False)
   verbosity_args.add_argument("-v", "--verbose", dest="verbose",
@@ -242,9 +306,18 @@ examples:
     if args.key:
       key = util.prompt_import_rsa_key_from_file(args.key)
 
+    progress = None
+    if args.progress:
+      progress = in_toto.progress.ProgressReporter()
+
     runlib.in_toto_run(args.step_name, args.materials, args.products,
         args.link_cmd, args.record_streams, key, gpg_keyid, gpg_use_default,
-        args.gpg_home, args.exclude_patterns, args.base_path)
+        args.gpg_home, args.exclude_patterns, args.base_path,
+        jobs=args.jobs, hash_cache=args.hash_cache,
+        hash_algorithms=args.hash_algorithms, full_rehash=args.full_rehash,
+        track_changes=args.track_changes,
+        directory_digests=args.directory_digests,
+        progress=progress)
 
   except Exception as e:
     log.error("(in-toto-run) {0}: {1}".format(type(e).__name__, e))
@@ -31,7 +31,8 @@ verify its signatures, with options to:
 
   * write signed metadata to a specified path. If no output path is specified,
     + layout metadata is written to the path of the input file,
-    + link metadata is written to '<name>.<keyid prefix>.link'.
+    + link metadata is written to '<name>.<keyid prefix>.link', followed by
+      '.gz', '.bz2' or '.xz' if the METADATA_COMPRESSION setting is set.
 
   * verify signatures
 
@@ -101,7 +102,7 @@ import logging
 
 from in_toto import exceptions, util
 from in_toto.models.link import FILENAME_FORMAT
-from in_toto.models.metadata import Metablock
+from in_toto.models.metadata import Metablock, add_compression_suffix
 import in_toto.gpg.functions
 
 import securesystemslib.formats
@@ -165,8 +166,8 @@ def _sign_and_dump_metadata(metadata, args):
     elif metadata.type_ == "link":
       in_toto.formats.ANY_SIGNATURE_SCHEMA.check_match(signature)
       keyid = signature["keyid"]
-      out_path = FILENAME_FORMAT.format(step_name=metadata.signed.name,
-          keyid=keyid)
+      out_path = add_compression_suffix(FILENAME_FORMAT.format(
+          step_name=metadata.signed.name, keyid=keyid))
 
     # In case of layouts we just override the input file.
     elif metadata.type_ == "layout": # pragma: no branch
@@ -269,7 +270,8 @@ verify its signatures, with options to:
 
   * write signed metadata to a specified path. If no output path is specified,
     + layout metadata is written to the path of the input file,
-    + link metadata is written to '<name>.<keyid prefix>.link'.
+    + link metadata is written to '<name>.<keyid prefix>.link', followed by
+      '.gz', '.bz2' or '.xz' if the METADATA_COMPRESSION setting is set.
 
   * verify signatures
 
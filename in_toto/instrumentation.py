@@ -0,0 +1,198 @@
+"""
+<Program Name>
+  instrumentation.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides timing and resource usage instrumentation for
+  `runlib.in_toto_run`, to find out where the time of a recording goes, i.e.
+  to hashing materials, running the command, hashing products or signing.
+
+  If the LINK_INSTRUMENTATION setting is enabled, the instrumentation is
+  written to an unsigned JSON sidecar file next to the link (see
+  INSTRUMENTATION_FILENAME_SUFFIX), e.g.:
+
+  ```
+  {
+    "phases": {
+      "materials": {"wall": 0.12, "cpu": 0.1},
+      "command": {"wall": 30.5, "cpu": 0.01},
+      "products": {...},
+      "signing": {...},
+      "storing": {...}
+    },
+    "command": {
+      "wall": 30.5, "user": 25.2, "system": 3.1, "max_rss": 204800,
+      "in_blocks": 0, "out_blocks": 1024, "voluntary_context_switches": 812,
+      "involuntary_context_switches": 97
+    },
+    "artifacts": {
+      "materials": {"files": 120, "hashed_files": 120, ...},
+      "products": {...}
+    }
+  }
+  ```
+
+  Phase times are in seconds, where "cpu" is the user plus system time of
+  the in-toto process itself. The "command" entry holds the resource usage of
+  the command's process tree (see getrusage(2)), i.e. its CPU times, the
+  maximum resident set size of the largest child so far, in the unit of the
+  platform (kilobytes on Linux), and the number of block I/O operations and
+  context switches. Resource usage is not available on Windows. The
+  "artifacts" entries are the counters of `runlib.RecordingStats`.
+
+"""
+import os
+import time
+import json
+import contextlib
+
+try:
+  import resource
+except ImportError: # pragma: no cover (Windows)
+  resource = None
+
+
+# Suffix appended to the file name of a link to get the name of its
+# instrumentation sidecar file
+INSTRUMENTATION_FILENAME_SUFFIX = ".instrumentation"
+
+# Wall clock used for timings, monotonic on Python 3
+_wall_clock = getattr(time, "perf_counter", time.time)
+
+# Names of the reported getrusage fields and the corresponding struct fields,
+# all but max_rss are reported as the difference before and after the command
+_RUSAGE_FIELDS = [
+  ("user", "ru_utime"),
+  ("system", "ru_stime"),
+  ("in_blocks", "ru_inblock"),
+  ("out_blocks", "ru_oublock"),
+  ("voluntary_context_switches", "ru_nvcsw"),
+  ("involuntary_context_switches", "ru_nivcsw"),
+]
+
+
+def _cpu_clock():
+  """Private helper that returns the user plus system time of the current
+  process in seconds. """
+  times = os.times()
+  return times[0] + times[1]
+
+
+
+class Instrumentation(object):
+  """Collects the timings, resource usage and hashing counters of a recording
+  (see module docstring).
+
+  Usage:
+  ```
+  instrumentation = Instrumentation()
+  with instrumentation.measure_phase("command"):
+    with instrumentation.measure_command():
+      subprocess.call(["make"])
+  instrumentation.dump("package.2f89b927.link.instrumentation")
+  ```
+
+  Attributes:
+    phases:
+            A dictionary of phase names and their "wall" and "cpu" times.
+    command:
+            A dictionary of resource usage of the command, empty if no
+            command was measured.
+    artifacts:
+            A dictionary of "materials" and "products" and the corresponding
+            `runlib.RecordingStats`.
+
+  """
+
+  def __init__(self):
+    self.phases = {}
+    self.command = {}
+    self.artifacts = {}
+
+
+  @contextlib.contextmanager
+  def measure_phase(self, name):
+    """
+    <Purpose>
+      Context manager that adds the wall and CPU time spent in its body to
+      the phase with the passed name.
+
+    <Arguments>
+      name:
+              The name of the phase, e.g. "materials".
+
+    """
+    wall = _wall_clock()
+    cpu = _cpu_clock()
+    try:
+      yield
+
+    finally:
+      phase = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+      phase["wall"] += _wall_clock() - wall
+      phase["cpu"] += _cpu_clock() - cpu
+
+
+  @contextlib.contextmanager
+  def measure_command(self):
+    """
+    <Purpose>
+      Context manager that records the wall time and the resource usage of
+      the child processes waited for in its body, i.e. the executed command.
+
+    """
+    wall = _wall_clock()
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    try:
+      yield
+
+    finally:
+      self.command = {"wall": _wall_clock() - wall}
+      if usage is not None:
+        new_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        for name, field in _RUSAGE_FIELDS:
+          self.command[name] = getattr(new_usage, field) - getattr(usage,
+              field)
+        self.command["max_rss"] = new_usage.ru_maxrss
+
+
+  def to_dict(self):
+    """
+    <Purpose>
+      Returns the instrumentation as JSON serializable dictionary (see module
+      docstring).
+
+    """
+    return {
+      "phases": self.phases,
+      "command": self.command,
+      "artifacts": {name: vars(stats)
+          for name, stats in self.artifacts.items()},
+    }
+
+
+  def dump(self, path):
+    """
+    <Purpose>
+      Writes the instrumentation to the JSON file at the passed path.
+
+    <Arguments>
+      path:
+              The path of the sidecar file, i.e. the link's path with
+              INSTRUMENTATION_FILENAME_SUFFIX.
+
+    <Side Effects>
+      Writes the sidecar file.
+
+    """
+    with open(path, "w") as fp:
+      json.dump(self.to_dict(), fp, indent=1, sort_keys=True)
@@ -0,0 +1,302 @@
+"""
+<Program Name>
+  merkle.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides Merkle tree digests over recorded directories, used by
+  `runlib.in_toto_run` if the ARTIFACT_DIRECTORY_DIGESTS setting is enabled,
+  and by `verifylib.in_toto_verify`.
+
+  Instead of one entry per file, a link records one entry per directory, i.e.
+  the directory path with a trailing slash (see DIRECTORY_SUFFIX), whose
+  hashdict carries the Merkle root of the directory's files for each hash
+  algorithm. The files, i.e. the leaves, are stored in an unsigned sidecar
+  file next to the link (see LEAVES_FILENAME_SUFFIX):
+
+  ```
+  {
+    "materials": {
+      "<directory>/": {<path relative to directory>: <hashdict>, ...}, ...
+    },
+    "products": {...}
+  }
+  ```
+
+  Verifiers compare the signed roots of links for the same step in constant
+  time per directory, and only read the leaves if the roots differ, or to
+  verify artifact rules. Leaves are only used after the root computed from
+  them equals the signed root, hence the sidecar needs no signature.
+
+  Tree construction (per hash algorithm):
+    - Leaves are sorted by path. The hash of a leaf is
+      H(0x00 || utf-8 path || 0x00 || digest of the file).
+    - The hash of an inner node is H(0x01 || left child || right child). A
+      node without sibling is promoted to the next level unchanged.
+    - The root of a directory without files is H(""), i.e. the hash of the
+      empty string.
+
+"""
+import json
+import binascii
+
+import six
+
+import securesystemslib.hash
+import securesystemslib.exceptions
+
+
+# Suffix of recorded directory paths, whose hashdict holds Merkle roots
+DIRECTORY_SUFFIX = "/"
+
+# Suffix appended to the file name of a link to get the name of its leaves
+# sidecar file
+LEAVES_FILENAME_SUFFIX = ".leaves"
+
+# Domain separation prefixes for leaf and inner node hashes
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+def is_directory_entry(path):
+  """
+  <Purpose>
+    Returns True if the passed recorded path is a directory entry, i.e. its
+    hashdict holds Merkle roots.
+
+  <Arguments>
+    path:
+            A recorded artifact path.
+
+  <Returns>
+    A boolean.
+
+  """
+  return path.endswith(DIRECTORY_SUFFIX)
+
+
+def compute_root(leaves, algorithm):
+  """
+  <Purpose>
+    Computes the Merkle root over the passed leaves using the passed hash
+    algorithm (see module docstring).
+
+  <Arguments>
+    leaves:
+            A dictionary of file paths, relative to the directory, and the
+            files' hashdicts, which must contain the passed algorithm.
+
+    algorithm:
+            A hash algorithm name, e.g. "sha256".
+
+  <Exceptions>
+    KeyError, if a hashdict does not contain the algorithm.
+    securesystemslib.exceptions.UnsupportedAlgorithmError, if the algorithm
+    is not supported.
+
+  <Returns>
+    The hex digest of the root.
+
+  """
+  def _hash(data):
+    digest_object = securesystemslib.hash.digest(algorithm)
+    digest_object.update(data)
+    return digest_object.digest()
+
+  level = [_hash(_LEAF_PREFIX + path.encode("utf-8") + _LEAF_PREFIX +
+      binascii.unhexlify(leaves[path][algorithm])) for path in sorted(leaves)]
+
+  if not level:
+    return binascii.hexlify(_hash(b"")).decode("ascii")
+
+  while len(level) > 1:
+    next_level = [_hash(_NODE_PREFIX + level[index] + level[index + 1])
+        for index in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+      next_level.append(level[-1])
+    level = next_level
+
+  return binascii.hexlify(level[0]).decode("ascii")
+
+
+def summarize(artifacts, directories, hash_algorithms):
+  """
+  <Purpose>
+    Replaces the files below each of the passed directories in the passed
+    recorded artifacts with a single directory entry, holding the Merkle root
+    of the files for each passed hash algorithm.
+
+  <Arguments>
+    artifacts:
+            A dictionary of recorded paths and hashdicts, as returned by
+            `runlib.record_artifacts_as_dict`.
+
+    directories:
+            A list of normalized recorded directory paths. Directories below
+            another passed directory are part of that directory's tree.
+
+    hash_algorithms:
+            A list of hash algorithm names, which each hashdict contains.
+
+  <Returns>
+    A tuple of the summarized artifacts dictionary and a dictionary of
+    directory entry paths and the leaves of each directory. Directories
+    without recorded files get no entry.
+
+  """
+  prefixes = []
+  for directory in sorted(set(directories), key=len):
+    prefix = "" if directory == "." else directory + "/"
+    if not any(prefix.startswith(outer) for outer, _ in prefixes):
+      prefixes.append((prefix, directory + DIRECTORY_SUFFIX))
+
+  summarized = {}
+  leaves = {}
+  for path, hash_dict in six.iteritems(artifacts):
+    for prefix, entry in prefixes:
+      if path.startswith(prefix) and not path.startswith("../"):
+        leaves.setdefault(entry, {})[path[len(prefix):]] = hash_dict
+        break
+
+    else:
+      summarized[path] = hash_dict
+
+  for entry, directory_leaves in six.iteritems(leaves):
+    summarized[entry] = {algorithm: compute_root(directory_leaves, algorithm)
+        for algorithm in hash_algorithms}
+
+  return summarized, leaves
+
+
+def expand(artifacts, leaves):
+  """
+  <Purpose>
+    Replaces each directory entry in the passed recorded artifacts with the
+    passed leaves of the directory, after verifying that the Merkle root
+    computed from the leaves equals the recorded root, for each recorded
+    algorithm.
+
+  <Arguments>
+    artifacts:
+            A dictionary of recorded paths and hashdicts, e.g. the materials
+            of a link.
+
+    leaves:
+            A dictionary of directory entry paths and the leaves of each
+            directory, e.g. as loaded with `load_leaves`.
+
+  <Exceptions>
+    securesystemslib.exceptions.BadHashError, if the leaves of a directory
+    are missing or don't match the recorded root.
+
+  <Returns>
+    The expanded artifacts dictionary, i.e. with one entry per file, whose
+    hashdicts only contain the algorithms of the directory's roots.
+
+  """
+  expanded = {}
+  for path, hash_dict in six.iteritems(artifacts):
+    if not is_directory_entry(path):
+      expanded[path] = hash_dict
+      continue
+
+    directory_leaves = leaves.get(path, {})
+    if not hash_dict:
+      raise securesystemslib.exceptions.BadHashError(None, None)
+
+    for algorithm, root in six.iteritems(hash_dict):
+      try:
+        observed_root = compute_root(directory_leaves, algorithm)
+
+      except (KeyError, TypeError, ValueError, binascii.Error):
+        observed_root = None
+
+      if observed_root != root:
+        raise securesystemslib.exceptions.BadHashError(root, observed_root)
+
+    # Only the verified algorithms of each leaf are used
+    prefix = "" if path == "." + DIRECTORY_SUFFIX else path
+    for leaf_path, leaf_hash_dict in six.iteritems(directory_leaves):
+      expanded[prefix + leaf_path] = {algorithm: leaf_hash_dict[algorithm]
+          for algorithm in hash_dict}
+
+  return expanded
+
+
+def diff(leaves, other_leaves):
+  """
+  <Purpose>
+    Returns the sorted paths that are only in one of the passed leaves of a
+    directory, or whose hashdicts differ, e.g. to report which files of a
+    directory with different roots differ.
+
+  <Arguments>
+    leaves, other_leaves:
+            Dictionaries of file paths and hashdicts.
+
+  <Returns>
+    A list of paths.
+
+  """
+  return sorted(path for path in set(leaves) | set(other_leaves)
+      if leaves.get(path) != other_leaves.get(path))
+
+
+def dump_leaves(path, materials_leaves, products_leaves):
+  """
+  <Purpose>
+    Writes the passed leaves of material and product directories to the
+    sidecar file at the passed path.
+
+  <Arguments>
+    path:
+            The path of the sidecar file, i.e. the link's path with
+            LEAVES_FILENAME_SUFFIX.
+
+    materials_leaves, products_leaves:
+            Dictionaries of directory entry paths and the leaves of each
+            directory, as returned by `summarize`.
+
+  <Side Effects>
+    Writes the sidecar file.
+
+  """
+  with open(path, "w") as fp:
+    json.dump({"materials": materials_leaves, "products": products_leaves},
+        fp, sort_keys=True, separators=(",", ":"))
+
+
+def load_leaves(path):
+  """
+  <Purpose>
+    Reads the leaves of material and product directories from the sidecar
+    file at the passed path. The leaves are not verified (see `expand`).
+
+  <Arguments>
+    path:
+            The path of the sidecar file.
+
+  <Exceptions>
+    IOError, if the file can't be read.
+    ValueError, if the file is not valid JSON.
+
+  <Returns>
+    A tuple of dictionaries of directory entry paths and the leaves of each
+    directory, for materials and products.
+
+  """
+  with open(path, "r") as fp:
+    data = json.load(fp)
+
+  if not isinstance(data, dict):
+    raise ValueError("Invalid leaves file '{}'".format(path))
+
+  return data.get("materials", {}), data.get("products", {})
@@ -20,7 +20,27 @@
 import json
 import attr
 import inspect
-import securesystemslib.formats
+import in_toto.canonical_json
+
+
+
+def _asdict(obj):
+  """Private helper that returns the dictionary representation of the passed
+  attrs object like `attr.asdict`, but without copying attribute values other
+  than attrs objects and lists of them, e.g. the Steps of a Layout. The
+  result has the same canonical JSON encoding, but creating it doesn't grow
+  with the size of e.g. the materials of a Link. """
+  data = attr.asdict(obj, recurse=False)
+  for name, value in data.items():
+    if attr.has(type(value)):
+      data[name] = _asdict(value)
+
+    elif isinstance(value, (list, tuple)) and any(attr.has(type(item))
+        for item in value):
+      data[name] = [_asdict(item) if attr.has(type(item)) else item
+          for item in value]
+
+  return data
 
 
 
@@ -49,9 +69,13 @@ class ValidationMixin(object):
       None
 
     """
-    for method in inspect.getmembers(self, predicate=inspect.ismethod):
-      if method[0].startswith("_validate_"):
-        method[1]()
+    # Only look up validate methods, e.g. `inspect.getmembers` would also
+    # evaluate properties, such as the costly `Signable.signable_bytes`
+    for name in dir(self):
+      if name.startswith("_validate_"):
+        method = getattr(self, name)
+        if inspect.ismethod(method):
+          method()
 
 
 
@@ -75,18 +99,5 @@ class Signable(ValidationMixin):
     and verify signatures (c.f. `metadata.Metablock`). Changes to this
     function might break backwards compatibility with existing metadata. """
 
-    return securesystemslib.formats.encode_canonical(
-        attr.asdict(self)).encode("UTF-8")
-
-  @property
-  def signable_dict(self):
-    """Returns the dictionary representation of Signable, which we pass to
-    securesystemslib signing and verifying functions, where it gets converted
-    to canonical JSON utf-8 encoded bytes before signing and verifying.
-
-    TODO: I'd rather fully control what data is signed here and not in the
-    crypto backend, i.e. pass signable_bytes to the signing/verifying
-    functions. This would require a change to securesystemslib.
-    """
-
-    return attr.asdict(self)
+    return in_toto.canonical_json.encode_canonical(
+        _asdict(self)).encode("UTF-8")
@@ -18,7 +18,10 @@
   step of the supply chain is performed.
 """
 
+import re
+
 import attr
+import six
 import securesystemslib.formats
 from in_toto.models.common import Signable
 
@@ -28,6 +31,28 @@ FILENAME_FORMAT_SHORT = "{step_name}.link"
 UNFINISHED_FILENAME_FORMAT = ".{step_name}.{keyid:.8}.link-unfinished"
 UNFINISHED_FILENAME_FORMAT_GLOB = ".{step_name}.{pattern}.link-unfinished"
 
+# Matches the same values as `securesystemslib.formats.HEX_SCHEMA`
+_HEX_MATCH = re.compile(r"[a-fA-F0-9]+$").match
+
+
+def _check_artifacts(name, artifacts):
+  """Private helper to check that the passed materials or products, as
+  indicated by name, are a `dict` of `HASHDICTs`. """
+  if not isinstance(artifacts, dict):
+    raise securesystemslib.exceptions.FormatError(
+        "Invalid Link: field `{}` must be of type dict, got: {}"
+        .format(name, type(artifacts)))
+
+  # Check the hashes with plain type checks and the pattern of HEX_SCHEMA,
+  # which is much faster than the schema for many artifacts, and only use the
+  # schema to raise the error for invalid hashes
+  for artifact in list(artifacts.values()):
+    if not isinstance(artifact, dict) or not all(
+        isinstance(algorithm, six.string_types) and
+        isinstance(digest, six.string_types) and _HEX_MATCH(digest)
+        for algorithm, digest in six.iteritems(artifact)):
+      securesystemslib.formats.HASHDICT_SCHEMA.check_match(artifact)
+
 
 @attr.s(repr=False, init=False)
 class Link(Signable):
@@ -122,24 +147,12 @@ class Link(Signable):
 
   def _validate_materials(self):
     """Private method to check that `materials` is a `dict` of `HASHDICTs`."""
-    if not isinstance(self.materials, dict):
-      raise securesystemslib.exceptions.FormatError(
-          "Invalid Link: field `materials` must be of type dict, got: {}"
-          .format(type(self.materials)))
-
-    for material in list(self.materials.values()):
-      securesystemslib.formats.HASHDICT_SCHEMA.check_match(material)
+    _check_artifacts("materials", self.materials)
 
 
   def _validate_products(self):
     """Private method to check that `products` is a `dict` of `HASHDICTs`."""
-    if not isinstance(self.products, dict):
-      raise securesystemslib.exceptions.FormatError(
-          "Invalid Link: field `products` must be of type dict, got: {}"
-          .format(type(self.products)))
-
-    for product in list(self.products.values()):
-      securesystemslib.formats.HASHDICT_SCHEMA.check_match(product)
+    _check_artifacts("products", self.products)
 
 
   def _validate_byproducts(self):
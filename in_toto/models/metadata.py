@@ -19,13 +19,28 @@
 
 """
 
+import os
+import sys
+import bz2
+import stat
+import zlib
 import attr
 import json
+import binascii
+import collections
+
+import six
+
+try:
+  import lzma
+except ImportError: # pragma: no cover (Python 2)
+  lzma = None
 
 import securesystemslib.keys
 import securesystemslib.formats
 import securesystemslib.exceptions
 
+import in_toto.settings
 import in_toto.formats
 import in_toto.gpg.functions
 
@@ -33,6 +48,272 @@ from in_toto.models.common import ValidationMixin
 from in_toto.models.link import Link
 from in_toto.models.layout import Layout
 from in_toto.exceptions import SignatureVerificationError
+from in_toto.user_settings import get_bool_setting, get_size_setting
+
+
+# Number of characters of JSON text collected by `Metablock.dump`, before they
+# are encoded and written to disk
+DUMP_CHUNK_SIZE = 1024 * 1024
+
+# Compression codecs of metadata files and the file name suffixes they are
+# detected by in `Metablock.dump`, and searched for in
+# `verifylib.load_links_for_layout`
+COMPRESSION_SUFFIXES = collections.OrderedDict([
+  ("gzip", ".gz"),
+  ("bz2", ".bz2"),
+  ("lzma", ".xz"),
+])
+
+# Magic bytes at the beginning of compressed metadata files, by which
+# `Metablock.load` detects their compression codec
+_COMPRESSION_MAGIC = [
+  ("gzip", b"\x1f\x8b"),
+  ("bz2", b"BZh"),
+  ("lzma", b"\xfd7zXZ\x00"),
+]
+
+# Errors raised by decompressors for corrupt data
+_DECOMPRESSION_ERRORS = (zlib.error, EOFError, IOError, OSError) + (
+    (lzma.LZMAError,) if lzma else ())
+
+# Codecs whose decompressors take a maximum output length, which bz2 and lzma
+# decompressors only do on Python 3.5 and later
+_BOUNDED_DECOMPRESSION = ["gzip"] + (["bz2", "lzma"]
+    if sys.version_info >= (3, 5) else [])
+
+# Atomically replaces a file on Python 3, falls back to rename on Python 2,
+# which fails on Windows if the file exists
+_replace_file = getattr(os, "replace", os.rename)
+
+
+def _asdict(obj):
+  """Private helper that returns the attributes of the passed attrs object,
+  e.g. a Link, Layout or Step, as dictionary without copying their values,
+  for `_JSON_ENCODER`. """
+  if attr.has(type(obj)):
+    return attr.asdict(obj, recurse=False)
+
+  raise TypeError("{!r} is not JSON serializable".format(obj))
+
+
+# Encoder for the JSON representation of a Metablock (see `Metablock.dump`),
+# which encodes contained Link and Layout objects as it goes, i.e. without
+# deep copying them into dictionaries first
+_JSON_ENCODER = json.JSONEncoder(indent=1, separators=(",", ": "),
+    sort_keys=True, default=_asdict)
+
+
+def _get_compression_setting(compression):
+  """Private helper that returns the passed compression codec or, if None,
+  the value of the METADATA_COMPRESSION setting, where None means no
+  compression. Raises FormatError if the codec is not one of "none", "gzip",
+  "bz2" or "lzma" (case-insensitive), or not available. """
+  if compression is None:
+    compression = in_toto.settings.METADATA_COMPRESSION
+
+  if compression is None:
+    return "none"
+
+  if not isinstance(compression, six.string_types) or \
+      compression.lower() not in ["none"] + list(COMPRESSION_SUFFIXES):
+    raise securesystemslib.exceptions.FormatError("'METADATA_COMPRESSION'"
+        " must be one of 'none', {}, got '{}'.".format(", ".join(
+        "'" + codec + "'" for codec in COMPRESSION_SUFFIXES), compression))
+
+  compression = compression.lower()
+  if compression == "lzma" and not lzma: # pragma: no cover (Python 2)
+    raise securesystemslib.exceptions.FormatError("'lzma' compression is"
+        " not available.")
+
+  return compression
+
+
+def _get_compression_level_setting(level):
+  """Private helper that returns the passed compression level or, if None,
+  the value of the METADATA_COMPRESSION_LEVEL setting, where None means the
+  default level of the codec. Raises FormatError if the level is not an
+  integer, or a string of an integer, from 1 to 9. """
+  if level is None:
+    level = in_toto.settings.METADATA_COMPRESSION_LEVEL
+
+  if level is None:
+    return None
+
+  if isinstance(level, six.string_types) and level.strip().isdigit():
+    level = int(level)
+
+  if isinstance(level, bool) or \
+      not isinstance(level, six.integer_types) or not 1 <= level <= 9:
+    raise securesystemslib.exceptions.FormatError(
+        "'METADATA_COMPRESSION_LEVEL' must be an integer from 1 to 9, got"
+        " '{}'.".format(level))
+
+  return level
+
+
+def _create_compressor(compression, level):
+  """Private helper that returns a compressor object for the passed codec
+  and level (None for the default level of the codec), or None if the codec
+  is "none". """
+  if compression == "gzip":
+    # Writes a gzip header without file name and modification time, i.e. the
+    # same metadata is always compressed to the same bytes
+    return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None
+        else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  elif compression == "bz2":
+    return bz2.BZ2Compressor(9 if level is None else level)
+
+  elif compression == "lzma":
+    return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+
+  return None
+
+
+def _create_decompressor(compression):
+  """Private helper that returns a decompressor object for the passed codec.
+  """
+  if compression == "gzip":
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+  elif compression == "bz2":
+    return bz2.BZ2Decompressor()
+
+  elif lzma:
+    return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+  raise securesystemslib.exceptions.FormatError( # pragma: no cover
+      "'lzma' compression is not available.")
+
+
+def _get_file_compression(path):
+  """Private helper that returns the compression codec of the file at the
+  passed path as detected by its magic bytes, or "none". """
+  with open(path, "rb") as fp:
+    magic = fp.read(6)
+
+  for compression, prefix in _COMPRESSION_MAGIC:
+    if magic.startswith(prefix):
+      return compression
+
+  return "none"
+
+
+def _is_end_of_stream(decompressor):
+  """Private helper that returns True if the passed decompressor reached the
+  end-of-stream marker. Decompressors have no `eof` attribute on Python 2,
+  where bz2 decompressors instead raise EOFError for input past the end, and
+  zlib decompressors collect it in `unused_data`, which is probed on a copy.
+  """
+  eof = getattr(decompressor, "eof", None)
+  if eof is not None:
+    return eof
+
+  if decompressor.unused_data:
+    return True
+
+  if isinstance(decompressor, bz2.BZ2Decompressor):
+    try:
+      decompressor.decompress(b"")
+
+    except EOFError:
+      return True
+
+    return False
+
+  probe = decompressor.copy()
+  try:
+    probe.decompress(b"\0")
+
+  except zlib.error:
+    return False
+
+  return bool(probe.unused_data)
+
+
+def _read_compressed(path, compression):
+  """Private helper that reads and decompresses the file at the passed path
+  in chunks of DUMP_CHUNK_SIZE bytes and returns the decompressed bytes.
+  Concatenated streams, e.g. of `cat a.gz b.gz`, are decompressed one after
+  the other. Raises FormatError if the file is corrupt or truncated, or if it
+  decompresses to more than METADATA_MAX_DECOMPRESSED_SIZE bytes, which is
+  detected before more than that is held in memory. """
+  # Zero disables the limit, like None, e.g. to load links with large
+  # artifact lists
+  max_size = get_size_setting("METADATA_MAX_DECOMPRESSED_SIZE") or None
+  if max_size is not None and \
+      compression not in _BOUNDED_DECOMPRESSION: # pragma: no cover
+    raise securesystemslib.exceptions.FormatError("Could not decompress '{}'"
+        " ({}): METADATA_MAX_DECOMPRESSED_SIZE requires Python 3.5 or later"
+        " for this codec".format(path, compression))
+
+  chunks = []
+  size = 0
+  decompressor = None
+  with open(path, "rb") as fp:
+    try:
+      for data in iter(lambda: fp.read(DUMP_CHUNK_SIZE), b""):
+        while data:
+          if decompressor is None or _is_end_of_stream(decompressor):
+            decompressor = _create_decompressor(compression)
+
+          # Ask for one byte more than is left to detect an exceeded limit,
+          # output below the maximum length means all input was consumed
+          if max_size is None:
+            chunk = decompressor.decompress(data)
+          else:
+            chunk = decompressor.decompress(data, max_size - size + 1)
+
+          size += len(chunk)
+          if max_size is not None and size > max_size:
+            raise securesystemslib.exceptions.FormatError("Could not"
+                " decompress '{}' ({}): Decompressed size exceeds"
+                " METADATA_MAX_DECOMPRESSED_SIZE of {} bytes".format(path,
+                compression, max_size))
+
+          chunks.append(chunk)
+          data = decompressor.unused_data
+
+    except _DECOMPRESSION_ERRORS as e:
+      raise securesystemslib.exceptions.FormatError("Could not decompress"
+          " '{}' ({}): {}".format(path, compression, e))
+
+  if decompressor is None or not _is_end_of_stream(decompressor):
+    raise securesystemslib.exceptions.FormatError("Could not decompress '{}'"
+        " ({}): Compressed file ended before the end-of-stream marker was"
+        " reached".format(path, compression))
+
+  return b"".join(chunks)
+
+
+def add_compression_suffix(filename, compression=None):
+  """
+  <Purpose>
+    Returns the passed file name with the suffix of the passed compression
+    codec appended, e.g. "package.2f89b927.link.gz" for "gzip", or the file
+    name as is, if the codec is "none". Used for link files named by in-toto,
+    i.e. `link.FILENAME_FORMAT`, which `Metablock.dump` then compresses with
+    the codec of the suffix.
+
+  <Arguments>
+    filename:
+            A file name or path.
+
+    compression: (optional)
+            One of "none", "gzip", "bz2" or "lzma". If not passed, the
+            METADATA_COMPRESSION setting is used (default is no compression).
+
+  <Exceptions>
+    securesystemslib.exceptions.FormatError
+            If the codec is not supported.
+
+  <Returns>
+    A file name or path.
+
+  """
+  compression = _get_compression_setting(compression)
+  return filename + COMPRESSION_SUFFIXES.get(compression, "")
+
 
 @attr.s(repr=False, init=False)
 class Metablock(ValidationMixin):
@@ -52,23 +333,57 @@ class Metablock(ValidationMixin):
 
   def __repr__(self):
     """Returns an indented JSON string of the metadata object. """
-    return json.dumps(
-        {
-          "signatures": self.signatures,
-          "signed": attr.asdict(self.signed)
-        }, indent=1, separators=(",", ": "), sort_keys=True)
+    return _JSON_ENCODER.encode(self._to_json_object())
+
 
+  def _to_json_object(self):
+    """Private helper that returns the object encoded by `_JSON_ENCODER`. """
+    return {"signatures": self.signatures, "signed": self.signed}
 
-  def dump(self, filename):
+
+  def dump(self, filename, fsync=None, compression=None,
+      compression_level=None):
     """
     <Purpose>
       Write the JSON string representation of the Metablock object
       to disk.
 
+      The JSON text is encoded and written in chunks of DUMP_CHUNK_SIZE
+      characters, i.e. without holding the whole text in memory, to a
+      temporary file in the same directory, which then replaces the file at
+      the passed path. Readers of the file hence see either the previous or
+      the new metadata, but never a partially written file. Like a file
+      written in place, a replaced file keeps its permissions, and symlinks
+      are written through.
+
+      Files with a suffix in COMPRESSION_SUFFIXES, e.g. ".gz", are written
+      compressed with the corresponding codec, chunk by chunk.
+
     <Arguments>
       filename:
               The path to write the file to.
 
+      fsync: (optional)
+              If True, the file and its directory are flushed to disk before
+              and after the file is replaced, i.e. the metadata survives a
+              crash of the system. If not passed, the METADATA_FSYNC setting
+              is used (default is False).
+
+      compression: (optional)
+              One of "none", "gzip", "bz2" or "lzma", to write the file
+              compressed regardless of its suffix. If not passed, the codec
+              is detected by the suffix of filename.
+
+      compression_level: (optional)
+              The compression level from 1 (fastest) to 9 (smallest). If not
+              passed, the METADATA_COMPRESSION_LEVEL setting is used (default
+              is the default level of the codec).
+
+    <Exceptions>
+      securesystemslib.exceptions.FormatError
+              If fsync or the METADATA_FSYNC setting is not a boolean, or if
+              the compression codec or level is not supported.
+
     <Side Effects>
       Writing metadata file to disk
 
@@ -76,8 +391,68 @@ class Metablock(ValidationMixin):
       None.
 
     """
-    with open(filename, "wb") as fp:
-      fp.write("{}".format(self).encode("utf-8"))
+    fsync = get_bool_setting(fsync, "METADATA_FSYNC")
+
+    if compression is None:
+      compression = "none"
+      for codec, suffix in six.iteritems(COMPRESSION_SUFFIXES):
+        if filename.endswith(suffix):
+          compression = codec
+
+    compressor = _create_compressor(_get_compression_setting(compression),
+        _get_compression_level_setting(compression_level))
+
+    # Write through symlinks, like writing the file in place would, instead
+    # of replacing them with a regular file
+    filename = os.path.realpath(filename)
+    dirname = os.path.dirname(filename)
+    temp_filename = os.path.join(dirname, ".{}.{}.tmp".format(
+        os.path.basename(filename), binascii.hexlify(os.urandom(4)).decode()))
+
+    # Unlike with `tempfile.mkstemp`, the file is created with the default
+    # permissions subject to the umask, like `open` does
+    fd = os.open(temp_filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+        getattr(os, "O_BINARY", 0), 0o666)
+    try:
+      with os.fdopen(fd, "wb") as fp:
+        chunks = []
+        size = 0
+        for chunk in _JSON_ENCODER.iterencode(self._to_json_object()):
+          chunks.append(chunk)
+          size += len(chunk)
+          if size >= DUMP_CHUNK_SIZE:
+            data = "".join(chunks).encode("utf-8")
+            fp.write(compressor.compress(data) if compressor else data)
+            chunks = []
+            size = 0
+
+        data = "".join(chunks).encode("utf-8")
+        fp.write(compressor.compress(data) + compressor.flush()
+            if compressor else data)
+
+        if fsync:
+          fp.flush()
+          os.fsync(fp.fileno())
+
+      # Keep the permissions of a replaced file
+      if os.path.exists(filename):
+        os.chmod(temp_filename, stat.S_IMODE(os.stat(filename).st_mode))
+
+      _replace_file(temp_filename, filename)
+
+    # The temporary file only remains if writing or replacing failed
+    finally:
+      if os.path.exists(temp_filename):
+        os.remove(temp_filename)
+
+    # Directories can only be flushed on POSIX
+    if fsync and hasattr(os, "O_DIRECTORY"):
+      dir_fd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+      try:
+        os.fsync(dir_fd)
+
+      finally:
+        os.close(dir_fd)
 
 
   @staticmethod
@@ -90,10 +465,21 @@ class Metablock(ValidationMixin):
       or Layout object, depending on the `_type` field in the loaded
       metadata file.
 
+      Files compressed with one of the codecs in COMPRESSION_SUFFIXES are
+      detected by their magic bytes, regardless of their suffix, and
+      decompressed chunk by chunk, up to METADATA_MAX_DECOMPRESSED_SIZE
+      bytes.
+
     <Arguments>
       path:
               The path to write the file to.
 
+    <Exceptions>
+      securesystemslib.exceptions.FormatError
+              If the file is not in the metadata format, is corrupt,
+              decompresses to more than METADATA_MAX_DECOMPRESSED_SIZE
+              bytes.
+
     <Side Effects>
       Reading metadata file from disk
 
@@ -101,8 +487,14 @@ class Metablock(ValidationMixin):
       None.
 
     """
-    with open(path, "r") as fp:
-      data = json.load(fp)
+    compression = _get_file_compression(path)
+
+    if compression != "none":
+      data = json.loads(_read_compressed(path, compression).decode("utf-8"))
+
+    else:
+      with open(path, "r") as fp:
+        data = json.load(fp)
 
     signatures = data.get("signatures", [])
     signed_data = data.get("signed", {})
@@ -135,10 +527,6 @@ class Metablock(ValidationMixin):
       contained in `self.signed` with the passed key and appends the created
       signature to `self.signatures`.
 
-      Note: We actually pass the dictionary representation of the data to be
-      signed and `securesystemslib.keys.create_signature` converts it to
-      canonical JSON utf-8 encoded bytes before creating the signature.
-
     <Arguments>
       key:
               A signing key in the format securesystemslib.formats.KEY_SCHEMA
@@ -150,7 +538,7 @@ class Metablock(ValidationMixin):
     securesystemslib.formats.KEY_SCHEMA.check_match(key)
 
     signature = securesystemslib.keys.create_signature(key,
-        self.signed.signable_dict)
+        self.signed.signable_bytes)
 
     self.signatures.append(signature)
 
@@ -197,11 +585,6 @@ class Metablock(ValidationMixin):
       if the signature matches `securesystemslib.formats.SIGNATURE_SCHEMA`
       `securesystemslib.keys.verify_signature` is used.
 
-      Note: In case of securesystemslib we actually pass the dictionary
-      representation of the data to be verified and
-      `securesystemslib.keys.verify_signature` converts it to
-      canonical JSON utf-8 encoded bytes before verifying the signature.
-
     <Arguments>
       verification_key:
               Verifying key in the format:
@@ -251,7 +634,7 @@ class Metablock(ValidationMixin):
 
     elif securesystemslib.formats.SIGNATURE_SCHEMA.matches(signature):
       valid = securesystemslib.keys.verify_signature(
-          verification_key, signature, self.signed.signable_dict)
+          verification_key, signature, self.signed.signable_bytes)
 
     else:
       valid = False
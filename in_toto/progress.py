@@ -0,0 +1,142 @@
+"""
+<Program Name>
+  progress.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides a progress reporter for artifact recording, used by the
+  `--progress` option of in-toto-run and in-toto-record.
+
+  `runlib.record_artifacts_as_dict` and related functions accept a progress
+  callback, which is called with the `runlib.RecordingStats` of the recording
+  after each recorded file, and once more when the recording is done:
+
+  ```
+  def progress(stats, done):
+    print(stats.files, stats.total_files, stats.hashed_bytes, done)
+
+  record_artifacts_as_dict(["."], progress=progress)
+  ```
+
+  `ProgressReporter` is such a callback, which writes the number of recorded
+  and remaining files, the throughput in files/s and MB/s, and the estimated
+  time until the recording is done, to a stream, e.g. (in one line):
+
+  ```
+  Recording: 1200/5000 files, 400.0 files/s, 52.3 MB/s, 3800 remaining,
+  ETA 0:00:09
+  ```
+
+"""
+import sys
+import time
+
+
+def _format_seconds(seconds):
+  """Private helper that returns the passed number of seconds as H:MM:SS. """
+  seconds = int(seconds)
+  return "{:d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60,
+      seconds % 60)
+
+
+
+class ProgressReporter(object):
+  """Progress callback, which writes the progress of recordings to a stream
+  at most once per interval (see module docstring).
+
+  Each recording, i.e. each `RecordingStats` object the reporter is called
+  with, is reported on its own line. On terminals the line is updated in
+  place, otherwise a new line is written per update.
+  """
+
+  def __init__(self, stream=None, interval=1.0, label="Recording"):
+    """
+    <Purpose>
+      Creates a progress reporter.
+
+    <Arguments>
+      stream: (optional)
+              A writable text stream. Default is `sys.stderr`.
+
+      interval: (optional)
+              The minimum number of seconds between two updates.
+
+      label: (optional)
+              A string written at the beginning of each update.
+
+    """
+    self.stream = stream or sys.stderr
+    self.interval = interval
+    self.label = label
+
+    self._stats = None
+    self._start = None
+    self._last = None
+
+
+  def _format(self, stats, elapsed):
+    """Private helper that returns the progress line for the passed stats and
+    elapsed seconds. """
+    files_per_second = stats.files / elapsed if elapsed else 0.0
+    bytes_per_second = stats.hashed_bytes / elapsed if elapsed else 0.0
+    line = "{}: {}/{} files, {:.1f} files/s, {:.1f} MB/s".format(self.label,
+        stats.files, stats.total_files, files_per_second,
+        bytes_per_second / 10**6)
+
+    remaining = max(stats.total_files - stats.files, 0)
+    if remaining:
+      line += ", {} remaining".format(remaining)
+      if files_per_second:
+        line += ", ETA {}".format(_format_seconds(
+            remaining / files_per_second))
+
+    return line
+
+
+  def __call__(self, stats, done):
+    """
+    <Purpose>
+      Writes the progress of the recording with the passed stats, if the
+      interval has passed since the last update or the recording is done.
+
+    <Arguments>
+      stats:
+              The `RecordingStats` of the recording.
+
+      done:
+              True, if the recording is done.
+
+    """
+    now = time.time()
+    if stats is not self._stats:
+      self._stats = stats
+      self._start = now
+      self._last = None
+
+    if not done and self._last is not None and \
+        now - self._last < self.interval:
+      return
+
+    self._last = now
+    line = self._format(stats, now - self._start)
+
+    try:
+      if self.stream.isatty():
+        self.stream.write("\r\033[K" + line + ("\n" if done else ""))
+
+      else:
+        self.stream.write(line + "\n")
+
+      self.stream.flush()
+
+    # Progress must never fail a recording
+    except (IOError, OSError, ValueError): # pragma: no cover
+      pass
@@ -26,12 +26,37 @@
 """
 import sys
 import os
+import re
+import stat
+import mmap
 import fnmatch
 import glob
+import time
 import logging
+import threading
+import functools
+import collections
+import multiprocessing
+import concurrent.futures
+
+import six
+
+try:
+  from os import scandir
+except ImportError: # pragma: no cover (Python < 3.5)
+  from scandir import scandir
 
 import in_toto.settings
 import in_toto.exceptions
+import in_toto.formats
+import in_toto.hash_cache
+import in_toto.gitignore
+import in_toto.change_tracker
+import in_toto.archives
+import in_toto.merkle
+import in_toto.instrumentation
+import in_toto.streams
+import in_toto.gpg.functions
 from in_toto.models.link import (UNFINISHED_FILENAME_FORMAT, FILENAME_FORMAT,
     FILENAME_FORMAT_SHORT, UNFINISHED_FILENAME_FORMAT_GLOB)
 
@@ -39,7 +64,8 @@ import securesystemslib.formats
 import securesystemslib.hash
 import securesystemslib.exceptions
 
-from in_toto.models.metadata import Metablock
+from in_toto.models.metadata import Metablock, add_compression_suffix
+from in_toto.user_settings import get_bool_setting, get_size_setting
 
 
 # Inherits from in_toto base logger (c.f. in_toto.log)
@@ -59,36 +85,884 @@ else: # pragma: no cover
   import subprocess
 
 
-def _hash_artifact(filepath, hash_algorithms=None):
+# Size of the chunks in which files are read for hashing
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Holds a chunk buffer per thread, which is reused for all files hashed in
+# that thread (see `_hash_artifact`)
+_hash_buffers = threading.local()
+
+# Maximum number of hard linked files remembered per recording, if
+# ARTIFACT_DEDUPLICATE_HARD_LINKS is enabled, the least recently added are
+# forgotten first (see `_iter_hash_artifacts`)
+HARD_LINK_INODES_SIZE = 10000
+
+
+
+class RecordingStats(object):
+  """Counters of how the files of one or more recordings were hashed, which
+  can be passed to `record_artifacts_as_dict` or `iter_artifacts`.
+
+  Attributes:
+    files:
+            Number of recorded files.
+    hashed_files, hashed_bytes:
+            Number and total size of files that were read and hashed.
+    cached_files:
+            Number of files whose hashes were found in the hash cache.
+    reused_files:
+            Number of files whose hashes were reused from a `StatSnapshot`.
+    deduplicated_files, deduplicated_bytes:
+            Number and total size of files that were not read, because
+            another recorded path is a hard link to the same unchanged file.
+            The size is the number of bytes saved.
+    total_files:
+            Number of files to be recorded, only counted if a progress
+            callback is passed (see `in_toto.progress`). Archive members are
+            not included.
+
+  """
+
+  def __init__(self):
+    self.files = 0
+    self.total_files = 0
+    self.hashed_files = 0
+    self.hashed_bytes = 0
+    self.cached_files = 0
+    self.reused_files = 0
+    self.deduplicated_files = 0
+    self.deduplicated_bytes = 0
+
+
+  def __repr__(self):
+    return "{}({})".format(type(self).__name__, ", ".join(
+        "{}={}".format(name, value)
+        for name, value in sorted(vars(self).items())))
+
+
+
+def _update_digests_mmap(file_object, digest_objects):
+  """Internal helper that memory-maps the passed open file and feeds
+  memoryview slices of HASH_CHUNK_SIZE bytes of the mapping to the passed
+  digest objects, i.e. without copying the file contents. Returns False,
+  without updating the digest objects, if the file can't be mapped, or if
+  the mapping has no buffer interface (Python 2). """
+  try:
+    mapping = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+
+  except (ValueError, EnvironmentError) as e:
+    log.debug("Could not memory-map '{}', reading it instead: {}".format(
+        file_object.name, e))
+    return False
+
+  try:
+    view = data = memoryview(mapping)
+
+  except TypeError as e:
+    log.debug("Could not memory-map '{}', reading it instead: {}".format(
+        file_object.name, e))
+    mapping.close()
+    return False
+
+  try:
+    # Tell the kernel to read ahead aggressively (Python 3.8+)
+    if hasattr(mapping, "madvise"): # pragma: no cover
+      mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+    for offset in range(0, len(mapping), HASH_CHUNK_SIZE):
+      data = view[offset:offset + HASH_CHUNK_SIZE]
+      for digest_object in digest_objects:
+        digest_object.update(data)
+
+  # All views on the mapping must be released before it can be closed, also
+  # if updating failed, which would otherwise be masked by a BufferError
+  finally:
+    data.release()
+    view.release()
+    mapping.close()
+
+  return True
+
+
+def _update_digests_read(file_object, digest_objects):
+  """Internal helper that reads the passed file object in chunks of
+  HASH_CHUNK_SIZE bytes into a per-thread buffer, and feeds each chunk to the
+  passed digest objects. File objects without `readinto`, e.g. archive
+  members on Python 2, are read chunk by chunk instead. Returns the number of
+  bytes read. """
+  size = 0
+  if not hasattr(file_object, "readinto"): # pragma: no cover (Python 2)
+    for data in iter(functools.partial(file_object.read, HASH_CHUNK_SIZE),
+        b""):
+      size += len(data)
+      for digest_object in digest_objects:
+        digest_object.update(data)
+    return size
+
+  chunk = getattr(_hash_buffers, "chunk", None)
+  if chunk is None:
+    chunk = _hash_buffers.chunk = memoryview(bytearray(HASH_CHUNK_SIZE))
+
+  while True:
+    length = file_object.readinto(chunk)
+    if not length:
+      break
+
+    size += length
+    data = chunk if length == len(chunk) else chunk[:length]
+    for digest_object in digest_objects:
+      digest_object.update(data)
+
+  return size
+
+
+def _hash_artifact(filepath, hash_algorithms=None, mmap_threshold=None):
   """Internal helper that takes a filename and hashes the respective file's
   contents using the passed hash_algorithms and returns a hashdict conformant
-  with securesystemslib.formats.HASHDICT_SCHEMA. """
+  with securesystemslib.formats.HASHDICT_SCHEMA (see
+  `_hash_artifact_with_size`). """
+  return _hash_artifact_with_size(filepath, hash_algorithms=hash_algorithms,
+      mmap_threshold=mmap_threshold)[0]
+
+
+def _hash_artifact_with_size(filepath, hash_algorithms=None,
+    mmap_threshold=None):
+  """Internal helper that takes a filename and hashes the respective file's
+  contents using the passed hash_algorithms and returns a tuple of a hashdict
+  conformant with securesystemslib.formats.HASHDICT_SCHEMA and the number of
+  hashed bytes, i.e. without the caller having to stat the file.
+
+  The file is read only once, in chunks of HASH_CHUNK_SIZE bytes, into a
+  preallocated buffer, and each chunk is fed to the digest objects of all
+  passed algorithms. Regular files of at least mmap_threshold bytes are
+  memory-mapped instead of read (see `_update_digests_mmap`), if
+  mmap_threshold is not None. """
   if not hash_algorithms:
     hash_algorithms = ['sha256']
 
-  securesystemslib.formats.HASHALGORITHMS_SCHEMA.check_match(hash_algorithms)
+  in_toto.formats.HASH_ALGORITHMS_SCHEMA.check_match(hash_algorithms)
+  digest_objects = [securesystemslib.hash.digest(algorithm)
+      for algorithm in hash_algorithms]
+
+  # Read unbuffered, i.e. directly into our buffer
+  with open(filepath, "rb", 0) as file_object:
+    # Pipes and special files can't be mapped, and empty files needn't be
+    stat_result = os.fstat(file_object.fileno())
+    mapped = (mmap_threshold is not None and
+        stat.S_ISREG(stat_result.st_mode) and
+        stat_result.st_size >= max(mmap_threshold, 1) and
+        _update_digests_mmap(file_object, digest_objects))
+
+    if mapped:
+      size = stat_result.st_size
+
+    else:
+      size = _update_digests_read(file_object, digest_objects)
+
   hash_dict = {}
+  for algorithm, digest_object in zip(hash_algorithms, digest_objects):
+    hash_dict[algorithm] = digest_object.hexdigest()
+
+  securesystemslib.formats.HASHDICT_SCHEMA.check_match(hash_dict)
+
+  return hash_dict, size
 
+
+def _get_hash_algorithms(hash_algorithms=None):
+  """Internal helper that returns the list of algorithms to hash artifacts
+  with, i.e. the passed hash_algorithms or, if None, the
+  ARTIFACT_HASH_ALGORITHMS setting. Raises FormatError if the algorithms
+  don't match in_toto.formats.HASH_ALGORITHMS_SCHEMA, and
+  UnsupportedAlgorithmError if an algorithm is not provided by hashlib, e.g.
+  BLAKE2 and SHA-3 on Python 2. """
+  if hash_algorithms is None:
+    hash_algorithms = in_toto.settings.ARTIFACT_HASH_ALGORITHMS
+
+  # Single values from envvars or rcfiles are not split into lists
+  if isinstance(hash_algorithms, six.string_types):
+    hash_algorithms = [hash_algorithms]
+
+  in_toto.formats.HASH_ALGORITHMS_SCHEMA.check_match(hash_algorithms)
+  if not hash_algorithms:
+    raise securesystemslib.exceptions.FormatError("At least one hash"
+        " algorithm is required.")
+
+  # Fail before recording rather than in the workers
   for algorithm in hash_algorithms:
-    digest_object = securesystemslib.hash.digest_filename(filepath, algorithm)
-    hash_dict.update({algorithm: digest_object.hexdigest()})
+    securesystemslib.hash.digest(algorithm)
 
-  securesystemslib.formats.HASHDICT_SCHEMA.check_match(hash_dict)
+  return hash_algorithms
 
-  return hash_dict
+
+def _get_hash_jobs(jobs=None):
+  """Internal helper that returns the number of workers to hash artifacts
+  with, i.e. the passed jobs or, if None, the ARTIFACT_HASH_JOBS setting.
+  Zero means one worker per CPU. Raises FormatError if jobs is not a
+  non-negative integer. """
+  if jobs is None:
+    jobs = in_toto.settings.ARTIFACT_HASH_JOBS
+
+  # Settings from envvars or rcfiles are strings, booleans are no option
+  try:
+    if isinstance(jobs, bool):
+      raise ValueError
+    jobs = int(jobs)
+    if jobs < 0:
+      raise ValueError
+
+  except (TypeError, ValueError):
+    raise securesystemslib.exceptions.FormatError("Number of hashing jobs"
+        " must be a non-negative integer, got '{}'.".format(jobs))
+
+  if jobs == 0:
+    jobs = multiprocessing.cpu_count()
+
+  return jobs
+
+
+def _get_hash_pool():
+  """Internal helper that returns the ARTIFACT_HASH_POOL setting, i.e. the
+  type of worker pool used to hash artifacts in parallel. Raises FormatError
+  if the setting is neither "thread" nor "process". """
+  pool = in_toto.settings.ARTIFACT_HASH_POOL
+  if pool not in ("thread", "process"):
+    raise securesystemslib.exceptions.FormatError("Hash pool must be one of"
+        " 'thread' or 'process', got '{}'.".format(pool))
+
+  return pool
+
+
+def _get_archive_separator(archive_members=None):
+  """Internal helper that returns the ARTIFACT_ARCHIVE_SEPARATOR setting, if
+  the passed archive_members or, if None, the ARTIFACT_ARCHIVE_MEMBERS setting
+  is True, or else None. Raises FormatError if either setting is invalid. """
+  if not get_bool_setting(archive_members, "ARTIFACT_ARCHIVE_MEMBERS"):
+    return None
+
+  separator = in_toto.settings.ARTIFACT_ARCHIVE_SEPARATOR
+  if not isinstance(separator, six.string_types) or not separator:
+    raise securesystemslib.exceptions.FormatError("Archive separator must be"
+        " a non-empty string, got '{}'.".format(separator))
+
+  return separator
+
+
+def _hash_archive_members(path, artifact_path, hash_algorithms, separator,
+    exclude_patterns=None, stats=None):
+  """Internal generator that hashes each regular file in the archive at the
+  passed path on disk without extracting it (see `in_toto.archives`), and
+  yields (recorded member path, hashdict) tuples, where the recorded member
+  path is the recorded path of the archive and the member name, joined by
+  the passed separator, e.g. "foo.tar.gz!foo". Members matched by the passed
+  compiled exclude patterns are skipped. Unreadable archives are logged and
+  yield no (further) members. """
+  try:
+    for name, member_file in in_toto.archives.iter_members(artifact_path):
+      member_path = path + separator + name
+      if exclude_patterns and exclude_patterns(member_path):
+        continue
+
+      digest_objects = [securesystemslib.hash.digest(algorithm)
+          for algorithm in hash_algorithms]
+      size = _update_digests_read(member_file, digest_objects)
+
+      if stats is not None:
+        stats.files += 1
+        stats.hashed_files += 1
+        stats.hashed_bytes += size
+
+      yield member_path, {algorithm: digest_object.hexdigest()
+          for algorithm, digest_object in zip(hash_algorithms, digest_objects)}
+
+  except in_toto.archives.ARCHIVE_ERRORS as e:
+    log.warning("Could not record members of archive '{}': {}".format(path,
+        e))
+
+
+def _iter_hash_artifacts(artifacts, jobs=1, hash_algorithms=None,
+    hash_cache=None, ordered=True, snapshot=None, stats=None):
+  """Internal helper that hashes the files of the passed iterable of
+  (recorded path, path on disk) tuples using `_hash_artifact` with the passed
+  hash_algorithms, and yields (recorded path, hashdict) tuples as soon as
+  each file is hashed.
+
+  Files are hashed one after another, or with `jobs` parallel workers of the
+  pool type set in ARTIFACT_HASH_POOL ("thread" or "process"). At most two
+  files per worker are submitted ahead, i.e. memory use doesn't grow with
+  the number of files. If ordered is True, results are yielded in the order
+  of the passed files, otherwise in the order in which they are hashed.
+
+  Files are only stat'ed if a hash cache or snapshot is passed, or if the
+  ARTIFACT_DEDUPLICATE_HARD_LINKS setting is enabled. In the latter case,
+  hard linked files that are reached via several paths are only hashed once,
+  as long as their `stat_key` is unchanged. Only files with more than one
+  link are remembered, until all of their links were recorded, and at most
+  HARD_LINK_INODES_SIZE of them, i.e. memory use is bounded.
+
+  If an `in_toto.hash_cache.HashCache` is passed, cached hashes are used for
+  unchanged files, and the hashes of the remaining files are cached. If an
+  `in_toto.hash_cache.StatSnapshot` is passed, the same applies to the
+  snapshot, which takes precedence over the cache, and files reported as
+  unchanged by the snapshot's change tracker are not even stat'ed. Files above
+  ARTIFACT_HASH_MMAP_THRESHOLD are memory-mapped. Counters are added to the
+  passed `RecordingStats`, if any. """
+  hash_artifact = functools.partial(_hash_artifact_with_size,
+      hash_algorithms=hash_algorithms,
+      mmap_threshold=get_size_setting("ARTIFACT_HASH_MMAP_THRESHOLD"))
+  deduplicate = get_bool_setting(None, "ARTIFACT_DEDUPLICATE_HARD_LINKS")
+
+  if stats is None:
+    stats = RecordingStats()
+
+  executor = None
+  pool = None
+  if jobs > 1:
+    pool = _get_hash_pool()
+    if pool == "thread":
+      executor = concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+
+    else:
+      executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+
+  # Take the start time before the files are stat'ed (see `is_racy`)
+  if hash_cache or snapshot is not None:
+    start_ns = in_toto.hash_cache.time_ns()
+  hits = misses = reused = deduplicated = 0
+
+  # Futures of the hashes of hard linked files by device and inode number,
+  # each as list of the `stat_key` of the file when it was submitted for
+  # hashing, the future, and the number of its links not yet recorded
+  inodes = collections.OrderedDict()
+
+  # Files submitted for hashing, each as list of recorded path, path on
+  # disk, `os.stat_result` (if stat'ed), future of the hashdict and the
+  # number of hashed bytes, and whether the file is hashed
+  pending = collections.deque()
+  max_pending = jobs * 2 if executor else 1
+
+  def _finish(item):
+    """Returns the recorded path and hashdict of a pending item, and caches
+    and snapshots the hashdict, unless the file has changed while it was
+    hashed. """
+    path, artifact_path, stat_result, future, hashed = item
+    hash_dict, size = future.result()
+    hash_dict = dict(hash_dict)
+    if hashed:
+      stats.hashed_bytes += size
+
+    if (hash_cache or snapshot is not None) and stat_result is not None and (
+        not hashed or in_toto.hash_cache.stat_key(os.stat(artifact_path)) ==
+        in_toto.hash_cache.stat_key(stat_result)):
+      if hashed and hash_cache:
+        hash_cache.set(stat_result, hash_dict, start_ns)
+
+      if snapshot is not None:
+        snapshot.set(path, stat_result, hash_dict, start_ns)
+
+    return path, hash_dict
+
+  try:
+    for path, artifact_path in artifacts:
+      stats.files += 1
+      future = concurrent.futures.Future()
+      stat_result = None
+      if snapshot is not None:
+        hash_dict = snapshot.get_tracked(path, hash_algorithms)
+        if hash_dict is not None:
+          reused += 1
+          future.set_result((hash_dict, None))
+
+      # Only stat if needed, which costs a round trip per file on NFS
+      if not future.done() and (hash_cache or snapshot is not None or
+          deduplicate):
+        stat_result = os.stat(artifact_path)
+
+      if snapshot is not None and not future.done():
+        hash_dict = snapshot.get(path, stat_result, hash_algorithms)
+        if hash_dict is not None:
+          reused += 1
+          future.set_result((hash_dict, None))
+
+      if hash_cache and not future.done():
+        hash_dict = hash_cache.get(stat_result, hash_algorithms)
+        if hash_dict is None:
+          misses += 1
+
+        else:
+          hits += 1
+          future.set_result((hash_dict, None))
+
+      # Reuse the (possibly pending) hashes of another path to the same file
+      hashed = not future.done()
+      inode = None
+      if hashed and deduplicate and stat.S_ISREG(stat_result.st_mode) and \
+          stat_result.st_nlink > 1:
+        inode = (stat_result.st_dev, stat_result.st_ino)
+        entry = inodes.get(inode)
+        if entry is not None and \
+            entry[0] == in_toto.hash_cache.stat_key(stat_result):
+          deduplicated += 1
+          stats.deduplicated_bytes += stat_result.st_size
+          future = entry[1]
+          hashed = False
+
+          # Forget the file once all of its links were recorded
+          entry[2] -= 1
+          if entry[2] <= 0:
+            del inodes[inode]
+
+      if hashed:
+        stats.hashed_files += 1
+        if executor is None:
+          future.set_result(hash_artifact(artifact_path))
+
+        # Workers might not share our current working directory, hence we
+        # pass them absolute paths
+        elif pool == "process":
+          future = executor.submit(hash_artifact,
+              os.path.abspath(artifact_path))
+
+        else:
+          future = executor.submit(hash_artifact, artifact_path)
+
+        if inode is not None:
+          # Replaces the entry of a changed file, if any
+          inodes.pop(inode, None)
+          inodes[inode] = [in_toto.hash_cache.stat_key(stat_result), future,
+              stat_result.st_nlink - 1]
+          if len(inodes) > HARD_LINK_INODES_SIZE:
+            inodes.popitem(last=False)
+
+      pending.append([path, artifact_path, stat_result, future, hashed])
+
+      while len(pending) >= max_pending:
+        yield _finish(_pop_pending(pending, ordered))
+
+    while pending:
+      yield _finish(_pop_pending(pending, ordered))
+
+  finally:
+    if executor is not None:
+      # Don't start hashing files whose results won't be consumed
+      for item in pending:
+        item[3].cancel()
+      executor.shutdown(wait=True)
+
+  stats.cached_files += hits
+  stats.reused_files += reused
+  stats.deduplicated_files += deduplicated
+
+  if hash_cache:
+    log.info("Hash cache: {} hits, {} misses".format(hits, misses))
+
+  if snapshot is not None and reused:
+    log.info("Reused hashes of {} unchanged files".format(reused))
+
+  if deduplicated:
+    log.info("Skipped hashing {} hard links to already hashed files".format(
+        deduplicated))
+
+
+def _pop_pending(pending, ordered):
+  """Internal helper that removes and returns the first item of the passed
+  deque of pending hashing items (see `_iter_hash_artifacts`), if ordered is
+  True, or else the first item whose hashing is done, waiting for one if
+  necessary. """
+  if not ordered:
+    futures = [item[3] for item in pending]
+    if not any(future.done() for future in futures):
+      concurrent.futures.wait(futures,
+          return_when=concurrent.futures.FIRST_COMPLETED)
+
+    for index, item in enumerate(pending):
+      if item[3].done():
+        del pending[index]
+        return item
+
+  return pending.popleft()
+
+
+def _compile_exclude_patterns(exclude_patterns, syntax="fnmatch"):
+  """Internal helper that compiles the passed list of exclude patterns, using
+  the passed syntax, i.e. "fnmatch" or "gitignore" (see
+  `record_artifacts_as_dict`), and returns a function that takes a path and
+  an optional is_dir boolean, and returns True if the path is excluded.
+  Returns None if no patterns are passed.
+
+  fnmatch-style patterns are folded into a single compiled regular
+  expression, which matches a name if any of the patterns matches it, like
+  `fnmatch.fnmatch`. gitignore-style patterns are compiled with
+  `in_toto.gitignore.GitIgnore`. Raises FormatError for other syntaxes. """
+  if syntax not in ("fnmatch", "gitignore"):
+    raise securesystemslib.exceptions.FormatError("Exclude syntax must be"
+        " one of 'fnmatch' or 'gitignore', got '{}'.".format(syntax))
+
+  if not exclude_patterns:
+    return None
+
+  if syntax == "gitignore":
+    gitignore = in_toto.gitignore.GitIgnore(exclude_patterns)
+    def _is_excluded(path, is_dir=False):
+      return gitignore.match(path.replace(os.sep, "/"), is_dir)
+
+  else:
+    regex = re.compile("|".join("(?:{})".format(
+        fnmatch.translate(os.path.normcase(exclude_pattern)))
+        for exclude_pattern in exclude_patterns))
+    def _is_excluded(path, is_dir=False): # pylint: disable=unused-argument
+      return regex.match(os.path.normcase(path)) is not None
+
+  return _is_excluded
 
 
 def _apply_exclude_patterns(names, exclude_patterns):
-  """Exclude matched patterns from passed names. """
+  """Exclude matched patterns from passed names, keeping the order of the
+  remaining names. Patterns are passed as list or as function returned by
+  `_compile_exclude_patterns`. """
+  if not callable(exclude_patterns):
+    exclude_patterns = _compile_exclude_patterns(exclude_patterns)
+
+  if exclude_patterns is None:
+    return list(names)
+
+  return [name for name in names if not exclude_patterns(name)]
+
+
+def _join_base_path(base_path, path):
+  """Internal helper that returns the passed path joined to the passed base
+  path, if any, i.e. the path of an artifact on disk. Absolute paths are not
+  changed. """
+  if base_path:
+    return os.path.join(base_path, path)
+
+  return path
+
+
+def _walk_artifact_files(directory, exclude_patterns=None,
+    follow_symlink_dirs=False, base_path=None):
+  """Internal helper that traverses the passed directory tree top-down, like
+  `os.walk`, and yields the normalized paths of all regular files, or
+  symlinks to regular files, in the tree that are not excluded by the passed
+  exclude patterns, as returned by `_compile_exclude_patterns`. Excluded
+  directories are not descended into.
+  Directory entries are visited in the order of their names, i.e. the order
+  of the returned paths doesn't depend on the file system.
+
+  The directory and the returned paths are relative to the passed base path,
+  if any, which is joined to each listed path, i.e. the current working
+  directory is not used for relative paths and never changed.
+
+  The tree is listed with `scandir`, whose directory entries carry the file
+  type, so that only symlinks, and directories if symlinked directories are
+  followed, need an additional `stat` call.
+
+  Symlinked directories are only descended into if follow_symlink_dirs is
+  True, and never if they link to a directory on the current path, which
+  would recurse forever. Directories that can't be listed are skipped. """
+  # Each directory to list is stacked together with the (device, inode)
+  # pairs of itself and its parent directories, if symlinks are followed
+  ancestors = None
+  if follow_symlink_dirs:
+    try:
+      stat_result = os.stat(_join_base_path(base_path, directory))
+    except OSError:
+      return
+    ancestors = frozenset([(stat_result.st_dev, stat_result.st_ino)])
+
+  stack = [(directory, ancestors)]
+  while stack:
+    root, ancestors = stack.pop()
+    try:
+      entries = sorted(scandir(_join_base_path(base_path, root)),
+          key=lambda entry: entry.name)
+    except OSError:
+      continue
+
+    dir_entries = []
+    files = []
+    for entry in entries:
+      norm_path = os.path.normpath(os.path.join(root, entry.name))
+
+      # Both methods follow symlinks, i.e. dead symlinks are neither
+      # directories nor files, and would result in an error later when trying
+      # to read the file
+      try:
+        is_dir = entry.is_dir()
+        is_file = not is_dir and entry.is_file()
+      except OSError: # pragma: no cover
+        is_dir = is_file = False
+
+      if is_dir:
+        dir_entries.append((norm_path, entry))
+
+      elif is_file:
+        files.append(norm_path)
+
+      else:
+        log.info("File '{}' appears to be a broken symlink. Skipping..."
+            .format(norm_path))
+
+    # Applying exclude patterns on the directory paths allows to exclude a
+    # subdirectory 'sub' with a pattern 'sub'. If we only applied the patterns
+    # below on the subdirectory's containing file paths, we'd have to use a
+    # wildcard, e.g.: 'sub*'
+    if exclude_patterns:
+      dir_entries = [(dirpath, entry) for dirpath, entry in dir_entries
+          if not exclude_patterns(dirpath, True)]
+
+      files = _apply_exclude_patterns(files, exclude_patterns)
+
+    for filepath in files:
+      yield filepath
+
+    # Stack in reverse order to descend into directories in listing order
+    for dirpath, entry in reversed(dir_entries):
+      if ancestors is None:
+        if not entry.is_symlink():
+          stack.append((dirpath, None))
+        continue
+
+      try:
+        stat_result = entry.stat()
+      except OSError: # pragma: no cover
+        continue
+
+      dir_id = (stat_result.st_dev, stat_result.st_ino)
+      if dir_id in ancestors:
+        log.warning("Directory '{}' links to itself or a parent directory."
+            " Skipping...".format(dirpath))
+        continue
+
+      stack.append((dirpath, ancestors | frozenset([dir_id])))
+
+
+def _iter_artifact_files(norm_artifacts, exclude_patterns=None,
+    follow_symlink_dirs=False, base_path=None):
+  """Internal helper that yields a (recorded path, path on disk) tuple for
+  each file in the passed list of normalized artifact paths, traversing
+  directories with `_walk_artifact_files`. """
+  for artifact in norm_artifacts:
+    artifact_path = _join_base_path(base_path, artifact)
+    if os.path.isfile(artifact_path):
+      # Path was already normalized
+      yield artifact, artifact_path
+
+    elif os.path.isdir(artifact_path):
+      for filepath in _walk_artifact_files(artifact,
+          exclude_patterns=exclude_patterns,
+          follow_symlink_dirs=follow_symlink_dirs, base_path=base_path):
+        yield filepath, _join_base_path(base_path, filepath)
+
+    # Path is no file and no directory
+    else:
+      log.info("path: {} does not exist, skipping..".format(artifact))
+
+
+def _log_summary(stats, counters, seconds):
+  """Private helper that logs the totals of a recording, i.e. the difference
+  between the passed stats and a copy of their counters taken at the start of
+  the recording, which took the passed number of seconds. """
+  totals = {name: value - counters.get(name, 0)
+      for name, value in vars(stats).items()}
+  log.info("Recording summary: files={} hashed_files={} hashed_bytes={}"
+      " cached_files={} reused_files={} deduplicated_files={} seconds={:.3f}"
+      " files_per_second={:.1f} mb_per_second={:.1f}".format(
+      totals["files"], totals["hashed_files"], totals["hashed_bytes"],
+      totals["cached_files"], totals["reused_files"],
+      totals["deduplicated_files"], seconds,
+      totals["files"] / seconds if seconds else 0.0,
+      totals["hashed_bytes"] / seconds / 10**6 if seconds else 0.0))
+
+
+def _iter_artifacts(norm_artifacts, exclude_patterns, follow_symlink_dirs,
+    base_path, jobs, hash_algorithms, hash_cache, ordered, snapshot, stats,
+    archive_separator, progress):
+  """Internal generator returned by `iter_artifacts` (see arguments there),
+  which traverses and hashes the passed normalized artifacts, using a hash
+  cache database at the passed path, if any, and hashes the members of
+  archives after each archive, if an archive separator is passed. The passed
+  progress callback, if any, is called after each yielded file, and the
+  totals are logged when all files are yielded. """
+  if stats is None:
+    stats = RecordingStats()
+
+  start = time.time()
+  counters = dict(vars(stats))
+
+  artifact_files = _iter_artifact_files(norm_artifacts,
+      exclude_patterns=exclude_patterns,
+      follow_symlink_dirs=follow_symlink_dirs, base_path=base_path)
+
+  # The directory traversal is only completed ahead of hashing to count the
+  # files for the progress callback, i.e. only if a callback is passed
+  if progress is not None:
+    artifact_files = list(artifact_files)
+    stats.total_files += len(artifact_files)
+
+  cache = None
+  if hash_cache:
+    cache = in_toto.hash_cache.HashCache(hash_cache,
+        in_toto.settings.ARTIFACT_HASH_CACHE_SIZE)
+
+  try:
+    for path, hash_dict in _iter_hash_artifacts(artifact_files, jobs,
+        hash_algorithms, cache, ordered, snapshot, stats):
+      yield path, hash_dict
+      if progress is not None:
+        progress(stats, False)
+
+      if archive_separator and in_toto.archives.is_archive(path):
+        for member in _hash_archive_members(path,
+            _join_base_path(base_path, path), hash_algorithms,
+            archive_separator, exclude_patterns, stats):
+          yield member
+          if progress is not None:
+            progress(stats, False)
+
+  finally:
+    if cache is not None:
+      cache.close()
+
+  if progress is not None:
+    progress(stats, True)
+
+  _log_summary(stats, counters, time.time() - start)
+
+
+def iter_artifacts(artifacts, exclude_patterns=None, base_path=None,
+    follow_symlink_dirs=False, jobs=None, hash_cache=None,
+    hash_algorithms=None, ordered=True, snapshot=None, stats=None,
+    archive_members=None, progress=None):
+  """
+  <Purpose>
+    Returns an iterator that hashes each file in the passed path list,
+    traversing directories, and yields the path and hashes of each file as
+    soon as the file is hashed. Unlike `record_artifacts_as_dict`, results
+    can be processed while remaining files are still being hashed, and memory
+    use doesn't grow with the number of files.
+
+    Arguments and exceptions are checked when this function is called, i.e.
+    before the first file is hashed.
+
+    Usage:
+    ```
+    for path, hash_dict in iter_artifacts(["."], jobs=4, ordered=False):
+      writer.write(path, hash_dict)
+    ```
+
+    NOTE: A file is yielded once per passed path that leads to it, e.g. if
+    both a directory and a file in that directory are passed.
+
+  <Arguments>
+    artifacts, exclude_patterns, base_path, follow_symlink_dirs, jobs,
+    hash_cache, hash_algorithms, snapshot, stats, archive_members, progress:
+            See `record_artifacts_as_dict`.
+
+    ordered: (optional)
+            If True (default), files are yielded in a stable order, i.e. in
+            the order of the passed paths and, within directories, in the
+            order of their names. If False, files are yielded in the order in
+            which they are hashed, which avoids waiting on large files if
+            multiple jobs are used.
+
+  <Exceptions>
+    See `record_artifacts_as_dict`.
+
+  <Side Effects>
+    Calls functions to generate cryptographic hashes, when iterated.
+
+  <Returns>
+    An iterator of (path, hashdict) tuples, where hashdict conforms with
+    securesystemslib.formats.HASHDICT_SCHEMA.
+
+  """
+  if not artifacts:
+    return iter(())
+
+  jobs = _get_hash_jobs(jobs)
+  hash_algorithms = _get_hash_algorithms(hash_algorithms)
+  archive_separator = _get_archive_separator(archive_members)
+  if jobs > 1:
+    _get_hash_pool()
+
+  if hash_cache is None:
+    hash_cache = in_toto.settings.ARTIFACT_HASH_CACHE
+
+  # Relative cache paths are relative to the current working directory and
+  # not to the base path
+  if hash_cache:
+    hash_cache = os.path.abspath(os.path.expanduser(hash_cache))
+
+  # Passed exclude patterns take precedence over exclude pattern settings
+  if exclude_patterns:
+    log.info("Overriding setting ARTIFACT_EXCLUDE_PATTERNS with passed"
+        " exclude patterns.")
+  else:
+    # TODO: Do we want to keep the exclude pattern setting?
+    exclude_patterns = in_toto.settings.ARTIFACT_EXCLUDE_PATTERNS
+
+  if exclude_patterns:
+    securesystemslib.formats.NAMES_SCHEMA.check_match(exclude_patterns)
+
+  exclude_syntax = in_toto.settings.ARTIFACT_EXCLUDE_SYNTAX
+
+  # Patterns from the exclude file come first, i.e. in gitignore syntax
+  # passed patterns or pattern settings can negate them. Relative paths are
+  # relative to the current working directory and not to the base path
+  exclude_file = in_toto.settings.ARTIFACT_EXCLUDE_FILE
+  if exclude_file:
+    try:
+      file_patterns = in_toto.gitignore.read_patterns(exclude_file)
+
+    except (IOError, OSError) as e:
+      raise ValueError("Could not read exclude file '{}': '{}'".format(
+          exclude_file, e))
+
+    if exclude_syntax != "gitignore":
+      file_patterns = [pattern for pattern in file_patterns
+          if pattern.strip() and not pattern.startswith("#")]
+
+    exclude_patterns = file_patterns + list(exclude_patterns or [])
+
+  exclude_patterns = _compile_exclude_patterns(exclude_patterns,
+      exclude_syntax)
 
-  for exclude_pattern in exclude_patterns:
-    excludes = fnmatch.filter(names, exclude_pattern)
-    names = list(set(names) - set(excludes))
-  return names
+  if not base_path:
+    base_path = in_toto.settings.ARTIFACT_BASE_PATH
+  elif base_path != in_toto.settings.ARTIFACT_BASE_PATH:
+    log.info("Overriding setting ARTIFACT_BASE_PATH with passed"
+        " base path.")
+
+
+  # Artifact paths are joined to the base path instead of changing into it,
+  # i.e. recording doesn't depend on or change the current working directory
+  # of the process (see `record_artifacts_concurrently`)
+  if base_path and (not isinstance(base_path, six.string_types) or
+      not os.path.isdir(base_path)):
+    raise ValueError("Could not use '{}' as base path: 'Not a"
+        " directory'".format(base_path))
+
+  # Normalize passed paths
+  norm_artifacts = []
+  for path in artifacts:
+    norm_artifacts.append(os.path.normpath(path))
+
+  # Apply exclude patterns on the passed artifact paths if available, the
+  # patterns are compiled once and reused for all traversed directories
+  if exclude_patterns:
+    norm_artifacts = [artifact for artifact in norm_artifacts
+        if not exclude_patterns(artifact,
+        os.path.isdir(_join_base_path(base_path, artifact)))]
+
+  return _iter_artifacts(norm_artifacts, exclude_patterns,
+      follow_symlink_dirs, base_path, jobs, hash_algorithms, hash_cache,
+      ordered, snapshot, stats, archive_separator, progress)
 
 
 def record_artifacts_as_dict(artifacts, exclude_patterns=None,
-    base_path=None, follow_symlink_dirs=False):
+    base_path=None, follow_symlink_dirs=False, jobs=None, hash_cache=None,
+    hash_algorithms=None, snapshot=None, stats=None, archive_members=None,
+    progress=None):
   """
   <Purpose>
     Hashes each file in the passed path list. If the path list contains
@@ -120,8 +994,13 @@ def record_artifacts_as_dict(artifacts, exclude_patterns=None,
             - No special treatment of slash /
             - No special treatment of consecutive asterisks **
 
-      - Exclude patterns are likely to become command line arguments or part of
-        a config file.
+      - If the ARTIFACT_EXCLUDE_SYNTAX setting is "gitignore", patterns use
+        gitignore syntax instead (see `in_toto.gitignore`). Excluded
+        directories are not traversed.
+
+      - Additional patterns can be read from the file at the path set in the
+        ARTIFACT_EXCLUDE_FILE setting, e.g. a .gitignore file. They precede
+        passed patterns or patterns set in ARTIFACT_EXCLUDE_PATTERNS.
 
   <Arguments>
     artifacts:
@@ -136,26 +1015,92 @@ def record_artifacts_as_dict(artifacts, exclude_patterns=None,
             If passed, patterns specified via settings are overriden.
 
     base_path: (optional)
-            Change to base_path and record artifacts relative from there.
-            If not passed, current working directory is used as base_path.
+            Record artifacts relative to base_path. If not passed, current
+            working directory is used as base_path.
             NOTE: The base_path part of the recorded artifact is not included
             in the returned paths.
+            NOTE: The current working directory is not changed, i.e. this
+            function can be called concurrently from multiple threads (see
+            `record_artifacts_concurrently`).
 
     follow_symlink_dirs: (optional)
             Follow symlinked dirs if the linked dir exists (default is False).
             The recorded path contains the symlink name, not the resolved name.
             NOTE: This parameter toggles following linked directories only,
             linked files are always recorded, independently of this parameter.
-            NOTE: Beware of infinite recursions that can occur if a symlink
-            points to a parent directory or itself.
+            NOTE: Symlinks that point to a parent directory or to themselves
+            are not followed, as this would recurse forever.
+
+    jobs: (optional)
+            Number of workers used to hash the recorded files in parallel.
+            Zero means one worker per CPU. The type of the worker pool, i.e.
+            "thread" (default) or "process", is configured with the
+            ARTIFACT_HASH_POOL setting. If not passed, the ARTIFACT_HASH_JOBS
+            setting is used (see `in_toto.settings`).
+            NOTE: The result is the same regardless of the number of jobs.
+
+    hash_cache: (optional)
+            Path to a hash cache database (see `in_toto.hash_cache`). If
+            passed, the hashes of files that have not changed since they were
+            last recorded with the same database are read from the cache
+            instead of from the files. If not passed, the ARTIFACT_HASH_CACHE
+            setting is used. If neither is set, no cache is used. The maximum
+            number of cache entries is set with ARTIFACT_HASH_CACHE_SIZE.
+
+    hash_algorithms: (optional)
+            A list of hash algorithm names, e.g. ["sha256", "sha512"], used to
+            hash each recorded file. Each file is read only once, regardless of
+            the number of algorithms. If not passed, the
+            ARTIFACT_HASH_ALGORITHMS setting is used.
+
+    snapshot: (optional)
+            An `in_toto.hash_cache.StatSnapshot`. If passed, files that are
+            in the snapshot and unchanged since are not rehashed, and all
+            recorded files are added to the snapshot, e.g. to pass it to
+            another call that records the same files after they might have
+            changed.
+
+    stats: (optional)
+            A `RecordingStats` object, to which the numbers of hashed,
+            cached, reused and deduplicated files and bytes are added.
+            NOTE: Hard links to the same file are only read once, regardless
+            of this parameter, and recorded under each of their paths.
+
+    archive_members: (optional)
+            If True, the regular files in tar (optionally gzip, bzip2 or xz
+            compressed) and zip archives are recorded in addition to the
+            archives, without extracting them (see `in_toto.archives`). A
+            member is recorded as the path of the archive and the member
+            name, joined by the ARTIFACT_ARCHIVE_SEPARATOR setting, e.g.
+            "foo.tar.gz!foo", which can be matched by exclude patterns and
+            artifact rules. If not passed, the ARTIFACT_ARCHIVE_MEMBERS
+            setting is used (default is False).
+            NOTE: Member hashes are neither cached nor taken from the
+            snapshot, and members of unreadable archives are skipped with a
+            warning.
+
+    progress: (optional)
+            A callable, which is called with the `RecordingStats` of the
+            recording and False after each recorded file, and with True once
+            all files are recorded, e.g. an `in_toto.progress.ProgressReporter`.
+            NOTE: If passed, directories are traversed before hashing starts,
+            to count the files to be recorded (see `RecordingStats`).
 
   <Exceptions>
     in_toto.exceptions.ValueError,
-        if we cannot change to base path directory
+        if base path is not a directory, or if we cannot read the exclude file
 
     in_toto.exceptions.FormatError,
         if the list of exlcude patterns does not match format
-        securesystemslib.formats.NAMES_SCHEMA
+        securesystemslib.formats.NAMES_SCHEMA, or if the number of jobs is
+        not a non-negative integer, or if the ARTIFACT_HASH_POOL setting is
+        neither "thread" nor "process", or if the ARTIFACT_EXCLUDE_SYNTAX
+        setting is neither "fnmatch" nor "gitignore", or if archive_members
+        or the ARTIFACT_ARCHIVE_MEMBERS setting is not a boolean, or the
+        ARTIFACT_ARCHIVE_SEPARATOR setting is not a non-empty string.
+
+    securesystemslib.exceptions.UnsupportedAlgorithmError,
+        if one of the hash algorithms is not supported
 
   <Side Effects>
     Calls functions to generate cryptographic hashes.
@@ -164,109 +1109,111 @@ def record_artifacts_as_dict(artifacts, exclude_patterns=None,
     A dictionary with file paths as keys and the files' hashes as values.
   """
 
-  artifacts_dict = {}
+  return dict(iter_artifacts(artifacts, exclude_patterns=exclude_patterns,
+      base_path=base_path, follow_symlink_dirs=follow_symlink_dirs,
+      jobs=jobs, hash_cache=hash_cache, hash_algorithms=hash_algorithms,
+      snapshot=snapshot, stats=stats, archive_members=archive_members,
+      progress=progress))
 
-  if not artifacts:
-    return artifacts_dict
 
-  if base_path:
-    log.info("Overriding setting ARTIFACT_BASE_PATH with passed"
-        " base path.")
-  else:
-    base_path = in_toto.settings.ARTIFACT_BASE_PATH
+def record_artifacts_concurrently(recordings, max_workers=None):
+  """
+  <Purpose>
+    Records several sets of artifacts at once, each in its own thread, e.g.
+    the materials or products of multiple steps run by a build orchestrator.
 
+    Recording never changes the current working directory of the process,
+    hence the artifact sets may use different base paths. Hashing releases
+    the GIL, i.e. the recordings overlap on multi-core machines.
 
-  # Temporarily change into base path dir if set
-  if base_path:
-    original_cwd = os.getcwd()
-    try:
-      os.chdir(base_path)
+    Usage:
+    ```
+    materials_a, materials_b = record_artifacts_concurrently([
+        {"artifacts": ["."], "base_path": "step-a"},
+        {"artifacts": ["src", "setup.py"], "base_path": "step-b",
+            "exclude_patterns": ["*.pyc"]}])
+    ```
 
-    except Exception as e:
-      raise ValueError("Could not use '{}' as base path: '{}'".format(
-          base_path, e))
+    NOTE: Settings (see `in_toto.settings`) are read, but not modified, by
+    each recording. Changing settings during concurrent recordings leads to
+    undefined results.
 
-  # Normalize passed paths
-  norm_artifacts = []
-  for path in artifacts:
-    norm_artifacts.append(os.path.normpath(path))
+  <Arguments>
+    recordings:
+            A list of dictionaries, each with the keyword arguments of one
+            `record_artifacts_as_dict` call.
 
-  # Passed exclude patterns take precedence over exclude pattern settings
-  if exclude_patterns:
-    log.info("Overriding setting ARTIFACT_EXCLUDE_PATTERNS with passed"
-        " exclude patterns.")
-  else:
-    # TODO: Do we want to keep the exclude pattern setting?
-    exclude_patterns = in_toto.settings.ARTIFACT_EXCLUDE_PATTERNS
+    max_workers: (optional)
+            Maximum number of concurrent recordings (default is the number of
+            recordings). Each recording can additionally hash with multiple
+            workers, see the jobs argument of `record_artifacts_as_dict`.
 
-  # Apply exclude patterns on the passed artifact paths if available
-  if exclude_patterns:
-    securesystemslib.formats.NAMES_SCHEMA.check_match(exclude_patterns)
-    norm_artifacts = _apply_exclude_patterns(norm_artifacts, exclude_patterns)
+  <Exceptions>
+    Any exception raised by `record_artifacts_as_dict`, for the first failed
+    recording in the order of the passed list, after all recordings have
+    finished.
 
-  # Iterate over remaining normalized artifact paths
-  for artifact in norm_artifacts:
-    if os.path.isfile(artifact):
-      # Path was already normalized above
-      artifacts_dict[artifact] = _hash_artifact(artifact)
-
-    elif os.path.isdir(artifact):
-      for root, dirs, files in os.walk(artifact,
-          followlinks=follow_symlink_dirs):
-        # Create a list of normalized dirpaths
-        dirpaths = []
-        for dirname in dirs:
-          norm_dirpath = os.path.normpath(os.path.join(root, dirname))
-          dirpaths.append(norm_dirpath)
-
-        # Applying exclude patterns on the directory paths returned by walk
-        # allows to exclude a subdirectory 'sub' with a pattern 'sub'.
-        # If we only applied the patterns below on the subdirectory's
-        # containing file paths, we'd have to use a wildcard, e.g.: 'sub*'
-        if exclude_patterns:
-          dirpaths = _apply_exclude_patterns(dirpaths, exclude_patterns)
-
-        # Reset and refill dirs with remaining names after exclusion
-        # Modify (not reassign) dirnames to only recurse into remaining dirs
-        dirs[:] = []
-        for dirpath in dirpaths:
-          # Dirs only contain the basename and not the full path
-          name = os.path.basename(dirpath)
-          dirs.append(name)
-
-        # Create a list of normalized filepaths
-        filepaths = []
-        for filename in files:
-          norm_filepath = os.path.normpath(os.path.join(root, filename))
-
-          # `os.walk` could also list dead symlinks, which would
-          # result in an error later when trying to read the file
-          if os.path.isfile(norm_filepath):
-            filepaths.append(norm_filepath)
-
-          else:
-            log.info("File '{}' appears to be a broken symlink. Skipping..."
-                .format(norm_filepath))
-
-        # Apply exlcude patterns on the normalized file paths returned by walk
-        if exclude_patterns:
-          filepaths = _apply_exclude_patterns(filepaths, exclude_patterns)
-
-        for filepath in filepaths:
-          artifacts_dict[filepath] = _hash_artifact(filepath)
+  <Side Effects>
+    Calls functions to generate cryptographic hashes.
 
-    # Path is no file and no directory
-    else:
-      log.info("path: {} does not exist, skipping..".format(artifact))
+  <Returns>
+    A list of dictionaries with file paths as keys and the files' hashes as
+    values, in the order of the passed recordings.
 
+  """
+  if not recordings:
+    return []
+
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=max_workers or len(recordings)) as executor:
+    futures = [executor.submit(record_artifacts_as_dict, **recording)
+        for recording in recordings]
+
+  return [future.result() for future in futures]
+
+
+def _execute_link_streaming(link_cmd_args):
+  """Internal helper that executes the passed command like `execute_link`
+  with record_streams, but captures standard output and standard error with
+  bounded memory, while writing them through to the terminal (see
+  `in_toto.streams`). If the BYPRODUCT_MAX_SIZE setting is not None, the
+  returned by-products additionally contain the size in bytes and the hashes
+  of each stream, e.g. "stdout-size" and "stdout-hashes", and streams larger
+  than the setting are truncated. """
+  spool_threshold = get_size_setting("BYPRODUCT_SPOOL_THRESHOLD")
+  max_size = get_size_setting("BYPRODUCT_MAX_SIZE")
+  hash_algorithms = _get_hash_algorithms()
+
+  process = subprocess.Popen(link_cmd_args, stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE)
+
+  captures = [
+    ("stdout", in_toto.streams.StreamCapture(process.stdout, sys.stdout,
+        spool_threshold, hash_algorithms)),
+    ("stderr", in_toto.streams.StreamCapture(process.stderr, sys.stderr,
+        spool_threshold, hash_algorithms)),
+  ]
 
-  # Change back to where original current working dir
-  if base_path:
-    os.chdir(original_cwd)
+  try:
+    for _, capture in captures:
+      capture.start()
+
+    byproducts = {"return-value": process.wait()}
+    for name, capture in captures:
+      capture.join()
+      byproducts[name] = capture.get_text(max_size)
+      if max_size is not None:
+        byproducts[name + "-size"] = capture.size
+        byproducts[name + "-hashes"] = capture.get_hashes()
+
+  finally:
+    for _, capture in captures:
+      capture.close()
 
-  return artifacts_dict
+  return byproducts
 
-def execute_link(link_cmd_args, record_streams):
+
+def execute_link(link_cmd_args, record_streams, instrumentation=None):
   """
   <Purpose>
     Executes the passed command plus arguments in a subprocess and returns
@@ -274,6 +1221,10 @@ def execute_link(link_cmd_args, record_streams):
     and standard error of the command are recorded and also returned to the
     caller.
 
+    If the BYPRODUCT_STREAM setting is enabled, standard output and standard
+    error are recorded with bounded memory and written through to the
+    terminal while the command runs (see `_execute_link_streaming`).
+
   <Arguments>
     link_cmd_args:
             A list where the first element is a command and the remaining
@@ -282,6 +1233,9 @@ def execute_link(link_cmd_args, record_streams):
             A bool that specifies whether to redirect standard output and
             and standard error to a temporary file which is returned to the
             caller (True) or not (False).
+    instrumentation: (optional)
+            An `in_toto.instrumentation.Instrumentation` object, to which the
+            wall time and resource usage of the command are added.
 
   <Exceptions>
     TBA (see https://github.com/in-toto/in-toto/issues/6)
@@ -296,6 +1250,13 @@ def execute_link(link_cmd_args, record_streams):
       Note: If record_streams is False, the dict values are empty strings.
     - The return value of the executed command.
   """
+  if instrumentation is not None:
+    with instrumentation.measure_command():
+      return execute_link(link_cmd_args, record_streams)
+
+  if record_streams and get_bool_setting(None, "BYPRODUCT_STREAM"):
+    return _execute_link_streaming(link_cmd_args)
+
   # TODO: Properly duplicate standard streams (issue #11)
   if record_streams:
     process = subprocess.Popen(link_cmd_args, stdout=subprocess.PIPE,
@@ -351,6 +1312,17 @@ def in_toto_mock(name, link_cmd_args):
   return link_metadata
 
 
+def _get_directories(artifacts, base_path=None):
+  """Internal helper that returns the normalized paths of the passed
+  artifacts that are directories, relative to the passed base path or, if
+  None, the ARTIFACT_BASE_PATH setting. """
+  if not base_path:
+    base_path = in_toto.settings.ARTIFACT_BASE_PATH
+
+  return [os.path.normpath(path) for path in artifacts or []
+      if os.path.isdir(_join_base_path(base_path, path))]
+
+
 def _check_match_signing_key(signing_key):
   """ Helper method to check if the signing_key has securesystemslib's
   KEY_SCHEMA and the private part is not empty.
@@ -362,16 +1334,58 @@ def _check_match_signing_key(signing_key):
         "Signing key needs to be a private key.")
 
 
+def _warm_up_signer(signing_key=None, gpg_keyid=None, gpg_use_default=False,
+    gpg_home=None):
+  """Internal helper that launches the gpg-agent for the passed gpg key in a
+  background thread (see `gpg_launch_agent`), so that it overlaps with
+  recording products, which callers do meanwhile. Returns the started thread,
+  which callers join before signing, or None if a signing key, which needs no
+  preparation, or no key is passed. """
+  if signing_key or not (gpg_keyid or gpg_use_default):
+    return None
+
+  warm_up = functools.partial(in_toto.gpg.functions.gpg_launch_agent,
+      gpg_keyid, gpg_home)
+
+  def _run():
+    # Errors are raised by the actual signing, warming up is best-effort
+    try:
+      warm_up()
+
+    except Exception as e:
+      log.debug("Could not warm up signer: {}".format(e))
+
+  thread = threading.Thread(target=_run)
+  thread.daemon = True
+  thread.start()
+  return thread
+
+
 def in_toto_run(name, material_list, product_list, link_cmd_args,
     record_streams=False, signing_key=None, gpg_keyid=None,
     gpg_use_default=False, gpg_home=None, exclude_patterns=None,
-    base_path=None):
+    base_path=None, jobs=None, hash_cache=None, hash_algorithms=None,
+    full_rehash=None, track_changes=None, directory_digests=None,
+    instrumentation=None, progress=None):
   """
   <Purpose>
     Calls functions in this module to run the command passed as link_cmd_args
     argument and to store materials, products, by-products and environment
     information into a link metadata file.
 
+    Products that were recorded as materials and whose size, timestamps and
+    inode are unchanged after the command was run are not rehashed, but
+    recorded with the hashes of the materials (see
+    `in_toto.hash_cache.StatSnapshot`), unless full_rehash is True. If
+    track_changes is True, products are watched for changes with inotify
+    while the materials are recorded and the command is run, and products
+    that were not touched are not even stat'ed (see
+    `in_toto.change_tracker.ChangeTracker`).
+
+    If directory_digests is True, the files below each passed directory are
+    recorded as a single directory entry with a Merkle root, and the files
+    are written to a sidecar file next to the link (see `in_toto.merkle`).
+
     The link metadata file is signed either with the passed signing_key, or
     a gpg key identified by the passed gpg_keyid or with the default gpg
     key if gpg_use_default is True.
@@ -419,6 +1433,38 @@ def in_toto_run(name, material_list, product_list, link_cmd_args,
             current working directory.
             NOTE: The base_path part of the recorded material is not included
             in the resulting preliminary link's material/product sections.
+    jobs: (optional)
+            Number of workers used to hash materials and products in parallel.
+            If not passed, the ARTIFACT_HASH_JOBS setting is used (see
+            `record_artifacts_as_dict` for details).
+    hash_cache: (optional)
+            Path to a hash cache database used to look up the hashes of
+            unchanged files. If not passed, the ARTIFACT_HASH_CACHE setting
+            is used (see `record_artifacts_as_dict` for details).
+    hash_algorithms: (optional)
+            A list of hash algorithm names used to hash each file. If not
+            passed, the ARTIFACT_HASH_ALGORITHMS setting is used.
+    full_rehash: (optional)
+            If True, all products are rehashed, instead of reusing the hashes
+            of unchanged materials. If not passed, the ARTIFACT_FULL_REHASH
+            setting is used (default is False).
+    track_changes: (optional)
+            If True, changes to products are tracked with inotify on Linux,
+            falling back to comparing their size, timestamps and inode if
+            tracking fails. If not passed, the ARTIFACT_TRACK_CHANGES setting
+            is used (default is False).
+    directory_digests: (optional)
+            If True, passed directories are recorded as Merkle roots. If not
+            passed, the ARTIFACT_DIRECTORY_DIGESTS setting is used (default
+            is False).
+    instrumentation: (optional)
+            An `in_toto.instrumentation.Instrumentation` object, to which the
+            timings of each phase of the recording, the resource usage of the
+            command and the hashing counters are added. If not passed, and
+            the LINK_INSTRUMENTATION setting is enabled, a new object is used.
+    progress: (optional)
+            A progress callback, which is called while materials and products
+            are recorded (see `record_artifacts_as_dict` for details).
 
   <Exceptions>
     securesystemslib.FormatError if a signing_key is passed and does not match
@@ -426,11 +1472,18 @@ def in_toto_run(name, material_list, product_list, link_cmd_args,
         not match securesystemslib.formats.KEYID_SCHEMA or exclude_patterns
         are passed and don't match securesystemslib.formats.NAMES_SCHEMA, or
         base_path is passed and does not match
-        securesystemslib.formats.PATH_SCHEMA or is not a directory.
+        securesystemslib.formats.PATH_SCHEMA or is not a directory, or jobs
+        is passed and is not a non-negative integer, or hash_cache is passed
+        and does not match securesystemslib.formats.PATH_SCHEMA, or
+        full_rehash, track_changes, directory_digests or the corresponding
+        settings are not booleans.
 
   <Side Effects>
     If a key parameter is passed for signing, the newly created link metadata
-    file is written to disk using the filename scheme: `link.FILENAME_FORMAT`
+    file is written to disk using the filename scheme: `link.FILENAME_FORMAT`,
+    followed by the leaves sidecar file, if directory digests are recorded,
+    and the instrumentation sidecar file, if the LINK_INSTRUMENTATION setting
+    is enabled.
 
   <Returns>
     Newly created Metablock object containing a Link object
@@ -450,25 +1503,83 @@ def in_toto_run(name, material_list, product_list, link_cmd_args,
   if base_path:
     securesystemslib.formats.PATH_SCHEMA.check_match(base_path)
 
-  if material_list:
-    log.info("Recording materials '{}'...".format(", ".join(material_list)))
+  # Resolve the base path once, so that products are watched and recorded
+  # relative to the same directory
+  if not base_path:
+    base_path = in_toto.settings.ARTIFACT_BASE_PATH
 
-  materials_dict = record_artifacts_as_dict(material_list,
-      exclude_patterns=exclude_patterns, base_path=base_path,
-      follow_symlink_dirs=True)
+  if hash_cache:
+    securesystemslib.formats.PATH_SCHEMA.check_match(hash_cache)
 
-  if link_cmd_args:
-    log.info("Running command '{}'...".format(" ".join(link_cmd_args)))
-    byproducts = execute_link(link_cmd_args, record_streams)
-  else:
-    byproducts = {}
+  # Timings and counters are always collected, as they are cheap, but only
+  # written to a sidecar file if enabled
+  dump_instrumentation = get_bool_setting(None, "LINK_INSTRUMENTATION")
+  if instrumentation is None:
+    instrumentation = in_toto.instrumentation.Instrumentation()
+
+  for section in ["materials", "products"]:
+    instrumentation.artifacts.setdefault(section, RecordingStats())
+
+  # Snapshot materials to only rehash products that have changed
+  snapshot = None
+  if material_list and product_list and not get_bool_setting(full_rehash,
+      "ARTIFACT_FULL_REHASH"):
+    snapshot = in_toto.hash_cache.StatSnapshot()
+
+    # Watch products before materials are hashed, so that no change is missed
+    if get_bool_setting(track_changes, "ARTIFACT_TRACK_CHANGES"):
+      snapshot.tracker = in_toto.change_tracker.ChangeTracker(product_list,
+          base_path=base_path)
+      snapshot.tracker.start()
+
+  try:
+    if material_list:
+      log.info("Recording materials '{}'...".format(", ".join(material_list)))
+
+    with instrumentation.measure_phase("materials"):
+      materials_dict = record_artifacts_as_dict(material_list,
+          exclude_patterns=exclude_patterns, base_path=base_path,
+          follow_symlink_dirs=True, jobs=jobs, hash_cache=hash_cache,
+          hash_algorithms=hash_algorithms, snapshot=snapshot,
+          stats=instrumentation.artifacts["materials"], progress=progress)
+
+    if link_cmd_args:
+      log.info("Running command '{}'...".format(" ".join(link_cmd_args)))
+      with instrumentation.measure_phase("command"):
+        byproducts = execute_link(link_cmd_args, record_streams,
+            instrumentation=instrumentation)
+    else:
+      byproducts = {}
+
+  finally:
+    if snapshot is not None and snapshot.tracker is not None:
+      snapshot.tracker.stop()
+
+  # Launch the gpg-agent, while products are hashed
+  warm_up_thread = _warm_up_signer(signing_key, gpg_keyid, gpg_use_default,
+      gpg_home)
 
   if product_list:
     log.info("Recording products '{}'...".format(", ".join(product_list)))
 
-  products_dict = record_artifacts_as_dict(product_list,
-      exclude_patterns=exclude_patterns, base_path=base_path,
-      follow_symlink_dirs=True)
+  with instrumentation.measure_phase("products"):
+    products_dict = record_artifacts_as_dict(product_list,
+        exclude_patterns=exclude_patterns, base_path=base_path,
+        follow_symlink_dirs=True, jobs=jobs, hash_cache=hash_cache,
+        hash_algorithms=hash_algorithms, snapshot=snapshot,
+        stats=instrumentation.artifacts["products"], progress=progress)
+
+  # Replace the files of passed directories with their Merkle roots
+  materials_leaves = products_leaves = None
+  if get_bool_setting(directory_digests, "ARTIFACT_DIRECTORY_DIGESTS"):
+    algorithms = _get_hash_algorithms(hash_algorithms)
+    with instrumentation.measure_phase("directory_digests"):
+      materials_dict, materials_leaves = in_toto.merkle.summarize(
+          materials_dict, _get_directories(material_list, base_path),
+          algorithms)
+      products_dict, products_leaves = in_toto.merkle.summarize(
+          products_dict, _get_directories(product_list, base_path),
+          algorithms)
 
   log.info("Creating link metadata...")
   link = in_toto.models.link.Link(name=name,
@@ -478,31 +1589,59 @@ def in_toto_run(name, material_list, product_list, link_cmd_args,
   link_metadata = Metablock(signed=link)
 
   signature = None
-  if signing_key:
-    log.info("Signing link metadata using passed key...")
-    signature = link_metadata.sign(signing_key)
+  with instrumentation.measure_phase("signing"):
+    if warm_up_thread is not None:
+      warm_up_thread.join()
 
-  elif gpg_keyid:
-    log.info("Signing link metadata using passed GPG keyid...")
-    signature = link_metadata.sign_gpg(gpg_keyid, gpg_home=gpg_home)
+    if signing_key:
+      log.info("Signing link metadata using passed key...")
+      signature = link_metadata.sign(signing_key)
 
-  elif gpg_use_default:
-    log.info("Signing link metadata using default GPG key ...")
-    signature = link_metadata.sign_gpg(gpg_keyid=None, gpg_home=gpg_home)
+    elif gpg_keyid:
+      log.info("Signing link metadata using passed GPG keyid...")
+      signature = link_metadata.sign_gpg(gpg_keyid, gpg_home=gpg_home)
+
+    elif gpg_use_default:
+      log.info("Signing link metadata using default GPG key ...")
+      signature = link_metadata.sign_gpg(gpg_keyid=None, gpg_home=gpg_home)
 
   # We need the signature's keyid to write the link to keyid infix'ed filename
   if signature:
     signing_keyid = signature["keyid"]
     filename = FILENAME_FORMAT.format(step_name=name, keyid=signing_keyid)
-    log.info("Storing link metadata to '{}'...".format(filename))
-    link_metadata.dump(filename)
+    with instrumentation.measure_phase("storing"):
+      link_filename = add_compression_suffix(filename)
+      log.info("Storing link metadata to '{}'...".format(link_filename))
+      link_metadata.dump(link_filename)
+
+      if materials_leaves or products_leaves:
+        leaves_filename = filename + in_toto.merkle.LEAVES_FILENAME_SUFFIX
+        log.info("Storing directory leaves to '{}'...".format(
+            leaves_filename))
+        in_toto.merkle.dump_leaves(leaves_filename, materials_leaves,
+            products_leaves)
+
+    if dump_instrumentation:
+      instrumentation_filename = (filename +
+          in_toto.instrumentation.INSTRUMENTATION_FILENAME_SUFFIX)
+      log.info("Storing instrumentation to '{}'...".format(
+          instrumentation_filename))
+      instrumentation.dump(instrumentation_filename)
 
   return link_metadata
 
 
+def _use_record_snapshot():
+  """Internal helper that returns True, if in_toto_record_start should write a
+  stat snapshot of the materials, and in_toto_record_stop should reuse it. """
+  return (get_bool_setting(None, "ARTIFACT_RECORD_SNAPSHOT") and
+      not get_bool_setting(None, "ARTIFACT_FULL_REHASH"))
+
+
 def in_toto_record_start(step_name, material_list, signing_key=None,
     gpg_keyid=None, gpg_use_default=False, gpg_home=None,
-    exclude_patterns=None, base_path=None):
+    exclude_patterns=None, base_path=None, jobs=None, hash_cache=None,
+    hash_algorithms=None, progress=None):
   """
   <Purpose>
     Starts creating link metadata for a multi-part in-toto step. I.e.
@@ -538,6 +1677,20 @@ def in_toto_record_start(step_name, material_list, signing_key=None,
             current working directory.
             NOTE: The base_path part of the recorded materials is not included
             in the resulting preliminary link's material section.
+    jobs: (optional)
+            Number of workers used to hash materials in parallel. If not
+            passed, the ARTIFACT_HASH_JOBS setting is used (see
+            `record_artifacts_as_dict` for details).
+    hash_cache: (optional)
+            Path to a hash cache database used to look up the hashes of
+            unchanged files. If not passed, the ARTIFACT_HASH_CACHE setting
+            is used (see `record_artifacts_as_dict` for details).
+    hash_algorithms: (optional)
+            A list of hash algorithm names used to hash each file. If not
+            passed, the ARTIFACT_HASH_ALGORITHMS setting is used.
+    progress: (optional)
+            A progress callback, which is called while materials are recorded
+            (see `record_artifacts_as_dict` for details).
 
   <Exceptions>
     ValueError if none of signing_key, gpg_keyid or gpg_use_default=True
@@ -548,11 +1701,15 @@ def in_toto_record_start(step_name, material_list, signing_key=None,
         not match securesystemslib.formats.KEYID_SCHEMA or exclude_patterns
         are passed and don't match securesystemslib.formats.NAMES_SCHEMA, or
         base_path is passed and does not match
-        securesystemslib.formats.PATH_SCHEMA or is not a directory.
+        securesystemslib.formats.PATH_SCHEMA or is not a directory, or jobs
+        is passed and is not a non-negative integer, or hash_cache is passed
+        and does not match securesystemslib.formats.PATH_SCHEMA.
 
   <Side Effects>
     Writes newly created link metadata file to disk using the filename scheme
-    from link.UNFINISHED_FILENAME_FORMAT
+    from link.UNFINISHED_FILENAME_FORMAT, followed by the stat snapshot of the
+    materials, if the ARTIFACT_RECORD_SNAPSHOT setting is enabled and the
+    ARTIFACT_FULL_REHASH setting is not (see `in_toto.hash_cache.StatSnapshot`).
 
   <Returns>
     None.
@@ -577,12 +1734,22 @@ def in_toto_record_start(step_name, material_list, signing_key=None,
   if base_path:
     securesystemslib.formats.PATH_SCHEMA.check_match(base_path)
 
+  if hash_cache:
+    securesystemslib.formats.PATH_SCHEMA.check_match(hash_cache)
+
   if material_list:
     log.info("Recording materials '{}'...".format(", ".join(material_list)))
 
+  # Snapshot materials to only rehash products that have changed, when
+  # recording is stopped
+  snapshot = None
+  if material_list and _use_record_snapshot():
+    snapshot = in_toto.hash_cache.StatSnapshot()
+
   materials_dict = record_artifacts_as_dict(material_list,
       exclude_patterns=exclude_patterns, base_path=base_path,
-      follow_symlink_dirs=True)
+      follow_symlink_dirs=True, jobs=jobs, hash_cache=hash_cache,
+      hash_algorithms=hash_algorithms, snapshot=snapshot, progress=progress)
 
   log.info("Creating preliminary link metadata...")
   link = in_toto.models.link.Link(name=step_name,
@@ -612,11 +1779,22 @@ def in_toto_record_start(step_name, material_list, signing_key=None,
   log.info("Storing preliminary link metadata to '{}'...".format(unfinished_fn))
   link_metadata.dump(unfinished_fn)
 
+  snapshot_fn = unfinished_fn + in_toto.hash_cache.SNAPSHOT_FILENAME_SUFFIX
+  if snapshot is not None:
+    log.info("Storing stat snapshot to '{}'...".format(snapshot_fn))
+    snapshot.dump(snapshot_fn, link)
+
+  # Don't leave the snapshot of a previous recording, although it would be
+  # ignored as stale
+  elif os.path.exists(snapshot_fn):
+    os.remove(snapshot_fn)
+
 
 
 def in_toto_record_stop(step_name, product_list, signing_key=None,
     gpg_keyid=None, gpg_use_default=False, gpg_home=None,
-    exclude_patterns=None, base_path=None):
+    exclude_patterns=None, base_path=None, jobs=None, hash_cache=None,
+    hash_algorithms=None, progress=None):
   """
   <Purpose>
     Finishes creating link metadata for a multi-part in-toto step.
@@ -628,6 +1806,12 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
     (products and signature), removes unfinished link file from and
     stores new link file to disk.
 
+    Products that are unchanged since the materials were recorded are not
+    rehashed, if the stat snapshot written by in_toto_record_start is
+    available and belongs to the unfinished link, the
+    ARTIFACT_RECORD_SNAPSHOT setting is enabled and the ARTIFACT_FULL_REHASH
+    setting is not.
+
     One of signing_key, gpg_keyid or gpg_use_default has to be passed and it
     needs to be the same that was used with preceding in_toto_record_start.
 
@@ -655,6 +1839,20 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
             current working directory.
             NOTE: The base_path part of the recorded products is not included
             in the resulting preliminary link's product section.
+    jobs: (optional)
+            Number of workers used to hash products in parallel. If not
+            passed, the ARTIFACT_HASH_JOBS setting is used (see
+            `record_artifacts_as_dict` for details).
+    hash_cache: (optional)
+            Path to a hash cache database used to look up the hashes of
+            unchanged files. If not passed, the ARTIFACT_HASH_CACHE setting
+            is used (see `record_artifacts_as_dict` for details).
+    hash_algorithms: (optional)
+            A list of hash algorithm names used to hash each file. If not
+            passed, the ARTIFACT_HASH_ALGORITHMS setting is used.
+    progress: (optional)
+            A progress callback, which is called while products are recorded
+            (see `record_artifacts_as_dict` for details).
 
   <Exceptions>
     ValueError if none of signing_key, gpg_keyid or gpg_use_default=True
@@ -665,7 +1863,9 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
         not match securesystemslib.formats.KEYID_SCHEMA, or exclude_patterns
         are passed and don't match securesystemslib.formats.NAMES_SCHEMA, or
         base_path is passed and does not match
-        securesystemslib.formats.PATH_SCHEMA or is not a directory.
+        securesystemslib.formats.PATH_SCHEMA or is not a directory, or jobs
+        is passed and is not a non-negative integer, or hash_cache is passed
+        and does not match securesystemslib.formats.PATH_SCHEMA.
 
     LinkNotFoundError if gpg is used for signing and the corresponding
         preliminary link file can not be found in the current working directory
@@ -673,7 +1873,8 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
   <Side Effects>
     Writes newly created link metadata file to disk using the filename scheme
     from link.FILENAME_FORMAT
-    Removes unfinished link file link.UNFINISHED_FILENAME_FORMAT from disk
+    Removes unfinished link file link.UNFINISHED_FILENAME_FORMAT and its stat
+    snapshot from disk
 
   <Returns>
     None.
@@ -697,6 +1898,9 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
   if base_path:
     securesystemslib.formats.PATH_SCHEMA.check_match(base_path)
 
+  if hash_cache:
+    securesystemslib.formats.PATH_SCHEMA.check_match(hash_cache)
+
   # Load preliminary link file
   # If we have a signing key we can use the keyid to construct the name
   if signing_key:
@@ -753,15 +1957,29 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
 
   link_metadata.verify_signature(verification_key)
 
+  # Reuse the hashes of materials for products that are unchanged since
+  # recording was started
+  snapshot_fn = unfinished_fn + in_toto.hash_cache.SNAPSHOT_FILENAME_SUFFIX
+  snapshot = None
+  if _use_record_snapshot():
+    snapshot = in_toto.hash_cache.StatSnapshot.load(snapshot_fn,
+        link_metadata.signed)
+
+  # Launch the gpg-agent, while products are hashed
+  warm_up_thread = _warm_up_signer(signing_key, keyid, gpg_home=gpg_home)
+
   # Record products if a product path list was passed
   if product_list:
     log.info("Recording products '{}'...".format(", ".join(product_list)))
 
   link_metadata.signed.products = record_artifacts_as_dict(product_list,
       exclude_patterns=exclude_patterns, base_path=base_path,
-      follow_symlink_dirs=True)
+      follow_symlink_dirs=True, jobs=jobs, hash_cache=hash_cache,
+      hash_algorithms=hash_algorithms, snapshot=snapshot, progress=progress)
 
   link_metadata.signatures = []
+  if warm_up_thread is not None:
+    warm_up_thread.join()
   if signing_key:
     log.info("Updating signature with key '{:.8}...'...".format(keyid))
     link_metadata.sign(signing_key)
@@ -772,9 +1990,13 @@ def in_toto_record_stop(step_name, product_list, signing_key=None,
     log.info("Updating signature with gpg key '{:.8}...'...".format(keyid))
     link_metadata.sign_gpg(keyid, gpg_home)
 
-  fn = FILENAME_FORMAT.format(step_name=step_name, keyid=keyid)
+  fn = add_compression_suffix(FILENAME_FORMAT.format(step_name=step_name,
+      keyid=keyid))
   log.info("Storing link metadata to '{}'...".format(fn))
   link_metadata.dump(fn)
 
   log.info("Removing unfinished link metadata '{}'...".format(unfinished_fn))
   os.remove(unfinished_fn)
+
+  if os.path.exists(snapshot_fn):
+    os.remove(snapshot_fn)
@@ -35,8 +35,113 @@ DEBUG = False
 # See docstring of `in-toto.record_artifacts_as_dict` for how this is used
 ARTIFACT_EXCLUDE_PATTERNS = ["*.link*", ".git", "*.pyc", "*~"]
 
+# Syntax of artifact exclude patterns, one of "fnmatch" (default) or
+# "gitignore", see `in_toto.gitignore`
+ARTIFACT_EXCLUDE_SYNTAX = "fnmatch"
+
+# Path to a file with additional artifact exclude patterns, one per line, e.g.
+# a .gitignore file
+ARTIFACT_EXCLUDE_FILE = None
+
 # Used as base path for --materials and --products arguments when running
 # in-toto-run/in-toto-record
 # If not set the current working directory is used as base path
 # FIXME: Do we want different base paths for materials and products?
 ARTIFACT_BASE_PATH = None
+
+# Number of parallel workers used to hash materials and products when running
+# in-toto-run/in-toto-record, zero means one worker per CPU
+# See docstring of `in-toto.record_artifacts_as_dict` for how this is used
+ARTIFACT_HASH_JOBS = 1
+
+# Type of the worker pool used if ARTIFACT_HASH_JOBS is not 1, one of "thread"
+# (hashlib releases the GIL while hashing) or "process"
+ARTIFACT_HASH_POOL = "thread"
+
+# Path to a database used to cache the hashes of recorded materials and
+# products, so that unchanged files don't need to be re-read, see
+# `in_toto.hash_cache` (e.g. "~/.cache/in_toto/hash_cache.sqlite")
+# If not set no cache is used
+ARTIFACT_HASH_CACHE = None
+
+# Maximum number of entries in the hash cache, least recently used entries
+# are evicted first
+ARTIFACT_HASH_CACHE_SIZE = 1000000
+
+# List of hash algorithms used to hash recorded materials and products, each
+# file is read only once regardless of the number of algorithms, see
+# `in_toto.formats.HASH_ALGORITHMS_SCHEMA` for supported algorithms (e.g.
+# "blake2b", which is faster than "sha256" on 64-bit CPUs without SHA
+# instructions)
+ARTIFACT_HASH_ALGORITHMS = ["sha256"]
+
+# Minimum size in bytes of recorded materials and products that are
+# memory-mapped instead of read for hashing, which saves copying their
+# contents, or None to read all files
+ARTIFACT_HASH_MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# If True, recorded files are stat'ed, and hard links to the same unchanged
+# file, e.g. in pnpm stores, are only hashed once per recording
+ARTIFACT_DEDUPLICATE_HARD_LINKS = False
+
+# If True, in-toto-run and in-toto-record stop rehash all products, instead of
+# reusing the hashes of materials that are unchanged after the command was run
+# or since in-toto-record start
+ARTIFACT_FULL_REHASH = False
+
+# If True, in-toto-record start writes the stat fields of the materials to an
+# unsigned sidecar file, and in-toto-record stop reuses the hashes of materials
+# for products whose stat fields match. Only enable it if no one else can write
+# the working directory and the sidecar between start and stop
+ARTIFACT_RECORD_SNAPSHOT = False
+
+# If True, in-toto-run watches products for changes with inotify on Linux, and
+# records products that were not touched by the command without stat'ing them
+ARTIFACT_TRACK_CHANGES = False
+
+# If True, the members of tar and zip archives are recorded in addition to the
+# archives, as archive path and member name joined by ARTIFACT_ARCHIVE_SEPARATOR
+ARTIFACT_ARCHIVE_MEMBERS = False
+ARTIFACT_ARCHIVE_SEPARATOR = "!"
+
+# If True, in-toto-run records each passed directory as a single entry with
+# the Merkle root of its files, which are written to a sidecar file
+ARTIFACT_DIRECTORY_DIGESTS = False
+
+# If True, in-toto-run records the standard streams of the command with
+# bounded memory, and writes them through to the terminal while it runs
+BYPRODUCT_STREAM = False
+
+# Number of bytes of each recorded standard stream kept in memory before it is
+# spooled to a temporary file, or None to keep streams in memory
+BYPRODUCT_SPOOL_THRESHOLD = 1024 * 1024
+
+# Maximum number of bytes of each recorded standard stream stored in the link,
+# larger streams are stored as head and tail plus size and hashes, or None to
+# store streams in full (only used if BYPRODUCT_STREAM is True)
+BYPRODUCT_MAX_SIZE = None
+
+# If True, in-toto-run writes the timings of each phase of the recording, the
+# resource usage of the command and hashing counters to an unsigned JSON
+# sidecar file next to the link, see `in_toto.instrumentation`
+LINK_INSTRUMENTATION = False
+
+# If True, metadata files are flushed to disk when they are written, i.e. the
+# metadata survives a crash of the system, see `Metablock.dump`
+METADATA_FSYNC = False
+
+# Compression codec of link metadata files written by in-toto-run,
+# in-toto-record and in-toto-sign, one of None (no compression), "gzip",
+# "bz2" or "lzma", which appends ".gz", ".bz2" or ".xz" to the file name, see
+# `Metablock.dump`. Compressed files are always detected on load.
+METADATA_COMPRESSION = None
+
+# Compression level of compressed metadata files from 1 (fastest) to 9
+# (smallest), or None for the default level of the codec
+METADATA_COMPRESSION_LEVEL = None
+
+# Maximum number of bytes a compressed metadata file may decompress to, or 0
+# or None for no limit. Loading larger files fails, e.g. for a small malicious
+# link file that decompresses to gigabytes. On Python < 3.5, bz2 and lzma
+# files can only be loaded without limit.
+METADATA_MAX_DECOMPRESSED_SIZE = 256 * 1024 * 1024
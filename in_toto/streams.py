@@ -0,0 +1,218 @@
+"""
+<Program Name>
+  streams.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Provides bounded-memory capture of the standard streams of a subprocess,
+  used by `runlib.execute_link` if the BYPRODUCT_STREAM setting is enabled.
+
+  Each stream is read in a background thread as the command writes it, and is
+    - written through to a terminal stream, i.e. the command's output is
+      shown in real time,
+    - spooled to a temporary file, once it exceeds a threshold (see
+      BYPRODUCT_SPOOL_THRESHOLD), and
+    - hashed, so that a stream that is too large to be stored in a link (see
+      BYPRODUCT_MAX_SIZE) can be recorded as its size and hashes plus a
+      truncated head and tail.
+
+  Captured bytes are decoded with the preferred encoding of the locale and
+  newlines are translated, like `subprocess.Popen(universal_newlines=True)`
+  does, except that undecodable bytes are replaced rather than failing the
+  recording.
+
+"""
+import os
+import locale
+import logging
+import tempfile
+import threading
+
+import securesystemslib.hash
+
+# Inherits from in_toto base logger (c.f. in_toto.log)
+log = logging.getLogger(__name__)
+
+# Number of bytes read from a stream at once
+READ_SIZE = 64 * 1024
+
+# Marker between the head and tail of a truncated stream
+TRUNCATED_FORMAT = "\n[... {} bytes omitted ...]\n"
+
+
+def _decode(data):
+  """Private helper that returns the passed captured bytes as text with
+  universal newlines (see module docstring). """
+  text = data.decode(locale.getpreferredencoding(False), "replace")
+  return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+
+class StreamCapture(object):
+  """Captures a readable stream, e.g. `Popen.stdout`, in a background thread
+  (see module docstring).
+
+  Usage:
+  ```
+  process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+  capture = StreamCapture(process.stdout, tee=sys.stdout)
+  capture.start()
+  process.wait()
+  capture.join()
+  capture.get_text(max_size=1024)
+  capture.close()
+  ```
+  """
+
+  def __init__(self, source, tee=None, spool_threshold=1024 * 1024,
+      hash_algorithms=None):
+    """
+    <Purpose>
+      Creates a capture for the passed stream.
+
+    <Arguments>
+      source:
+              A readable binary file object, which is closed when it is
+              exhausted.
+
+      tee: (optional)
+              A writable file object to which the captured output is written
+              through, e.g. `sys.stdout`. Binary data is written to its
+              `buffer`, if it has one.
+
+      spool_threshold: (optional)
+              The number of bytes kept in memory, before the captured output
+              is spooled to a temporary file, or None to keep all output in
+              memory.
+
+      hash_algorithms: (optional)
+              A list of hash algorithms to hash the captured output with.
+              Default is ["sha256"].
+
+    """
+    self.source = source
+    self.tee = getattr(tee, "buffer", tee)
+    self.size = 0
+    self.hash_algorithms = hash_algorithms or ["sha256"]
+
+    # SpooledTemporaryFile never rolls over with a max_size of 0, and rolls
+    # over on the first non-empty write with a max_size of 1
+    self._spool = tempfile.SpooledTemporaryFile(
+        max_size=0 if spool_threshold is None else max(spool_threshold, 1))
+    self._digest_objects = [securesystemslib.hash.digest(algorithm)
+        for algorithm in self.hash_algorithms]
+    self._thread = None
+
+
+  def start(self):
+    """
+    <Purpose>
+      Starts reading the stream in a background thread.
+
+    """
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+
+  def _run(self):
+    """Private helper that reads the stream until it is exhausted. """
+    fd = self.source.fileno()
+    try:
+      while True:
+        data = os.read(fd, READ_SIZE)
+        if not data:
+          break
+
+        self._spool.write(data)
+        self.size += len(data)
+        for digest_object in self._digest_objects:
+          digest_object.update(data)
+
+        # A closed or broken terminal must not stop the capture
+        if self.tee is not None:
+          try:
+            self.tee.write(data)
+            self.tee.flush()
+
+          except (IOError, OSError, ValueError) as e:
+            log.warning("Could not write captured output ({})".format(e))
+            self.tee = None
+
+    finally:
+      self.source.close()
+
+
+  def join(self):
+    """
+    <Purpose>
+      Waits until the stream is exhausted, i.e. the writing end was closed,
+      e.g. because the process exited.
+
+    """
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+
+  def get_hashes(self):
+    """
+    <Purpose>
+      Returns the hashes of the captured output.
+
+    <Returns>
+      A hashdict, i.e. a dictionary of hash algorithms and hex digests.
+
+    """
+    return {algorithm: digest_object.hexdigest() for algorithm, digest_object
+        in zip(self.hash_algorithms, self._digest_objects)}
+
+
+  def get_text(self, max_size=None):
+    """
+    <Purpose>
+      Returns the captured output as text. If the output is larger than
+      max_size bytes, only its first and last max_size / 2 bytes are
+      returned, separated by a marker (see TRUNCATED_FORMAT).
+
+    <Arguments>
+      max_size: (optional)
+              The maximum number of captured bytes to return, or None to
+              return all.
+
+    <Returns>
+      A string.
+
+    """
+    if max_size is None or self.size <= max_size:
+      self._spool.seek(0)
+      return _decode(self._spool.read())
+
+    head_size = max_size // 2
+    tail_size = max_size - head_size
+
+    self._spool.seek(0)
+    head = self._spool.read(head_size)
+    self._spool.seek(self.size - tail_size)
+    tail = self._spool.read(tail_size)
+
+    return (_decode(head) +
+        TRUNCATED_FORMAT.format(self.size - head_size - tail_size) +
+        _decode(tail))
+
+
+  def close(self):
+    """
+    <Purpose>
+      Discards the captured output, i.e. removes the spooled temporary file.
+
+    """
+    self._spool.close()
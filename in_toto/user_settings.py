@@ -14,7 +14,9 @@
 <Purpose>
   Provides methods to parse environment variables (`get_env`) and RCfiles
   (`get_rc`) and to override default settings (`set_settings`) defined in the
-  `in_toto.settings` module.
+  `in_toto.settings` module, and to read boolean and size settings, whose
+  values are strings if set via environment variables or RCfiles
+  (`get_bool_setting`, `get_size_setting`).
 
   Check out the respective docstrings to learn about the requirements for
   environment variables and RCfiles (includes examples).
@@ -25,6 +27,8 @@ import six
 import logging
 import in_toto.settings
 
+import securesystemslib.exceptions
+
 try:
   import configparser
 except ImportError: # pragma: no cover
@@ -56,7 +60,17 @@ RC_PATHS = [
 # TODO: Should we use `dir` on the module instead? If we list them here, we
 # have to manually update if `settings.py` changes.
 IN_TOTO_SETTINGS = [
-  "ARTIFACT_EXCLUDE_PATTERNS", "ARTIFACT_BASE_PATH"
+  "ARTIFACT_EXCLUDE_PATTERNS", "ARTIFACT_EXCLUDE_SYNTAX",
+  "ARTIFACT_EXCLUDE_FILE", "ARTIFACT_BASE_PATH", "ARTIFACT_HASH_JOBS",
+  "ARTIFACT_HASH_POOL", "ARTIFACT_HASH_CACHE", "ARTIFACT_HASH_CACHE_SIZE",
+  "ARTIFACT_HASH_ALGORITHMS", "ARTIFACT_HASH_MMAP_THRESHOLD",
+  "ARTIFACT_DEDUPLICATE_HARD_LINKS",
+  "ARTIFACT_FULL_REHASH", "ARTIFACT_RECORD_SNAPSHOT", "ARTIFACT_TRACK_CHANGES",
+  "ARTIFACT_ARCHIVE_MEMBERS", "ARTIFACT_ARCHIVE_SEPARATOR",
+  "ARTIFACT_DIRECTORY_DIGESTS", "BYPRODUCT_STREAM",
+  "BYPRODUCT_SPOOL_THRESHOLD", "BYPRODUCT_MAX_SIZE", "LINK_INSTRUMENTATION",
+  "METADATA_FSYNC", "METADATA_COMPRESSION", "METADATA_COMPRESSION_LEVEL",
+  "METADATA_MAX_DECOMPRESSED_SIZE"
 ]
 
 
@@ -217,3 +231,81 @@ def set_settings():
       default_setting = getattr(in_toto.settings, setting)
       log.info("Setting (default): {0}={1}".format(
           setting, default_setting))
+
+
+def get_bool_setting(value, setting):
+  """
+  <Purpose>
+    Returns the passed value or, if None, the value of the passed boolean
+    setting, e.g. "ARTIFACT_FULL_REHASH". The strings "true" and "false"
+    (case-insensitive), as set via environment variables or RCfiles, are
+    converted to booleans.
+
+  <Arguments>
+    value:
+            A boolean, a string, or None to use the setting.
+
+    setting:
+            The name of a setting in `in_toto.settings`.
+
+  <Exceptions>
+    securesystemslib.exceptions.FormatError
+            If the value is not a boolean, or one of the strings "true" or
+            "false".
+
+  <Returns>
+    A boolean.
+
+  """
+  if value is None:
+    value = getattr(in_toto.settings, setting)
+
+  if isinstance(value, six.string_types) and \
+      value.lower() in ("true", "false"):
+    value = value.lower() == "true"
+
+  if not isinstance(value, bool):
+    raise securesystemslib.exceptions.FormatError("'{}' must be a boolean,"
+        " got '{}'.".format(setting, value))
+
+  return value
+
+
+def get_size_setting(setting):
+  """
+  <Purpose>
+    Returns the value of the passed size setting, e.g. "BYPRODUCT_MAX_SIZE",
+    i.e. a number of bytes or None. Strings of integers, as set via
+    environment variables or RCfiles, are converted to integers, and the
+    string "none" (case-insensitive) to None.
+
+  <Arguments>
+    setting:
+            The name of a setting in `in_toto.settings`.
+
+  <Exceptions>
+    securesystemslib.exceptions.FormatError
+            If the setting is neither None nor a non-negative integer.
+
+  <Returns>
+    An integer or None.
+
+  """
+  size = getattr(in_toto.settings, setting)
+  if size is None or (isinstance(size, six.string_types) and
+      size.lower() == "none"):
+    return None
+
+  # Booleans are no option
+  try:
+    if isinstance(size, bool):
+      raise ValueError
+    size = int(size)
+    if size < 0:
+      raise ValueError
+
+  except (TypeError, ValueError):
+    raise securesystemslib.exceptions.FormatError("'{}' must be None or a"
+        " non-negative integer, got '{}'.".format(setting, size))
+
+  return size
@@ -37,7 +37,8 @@ import in_toto.runlib
 import in_toto.models.layout
 import in_toto.models.link
 import in_toto.formats
-from in_toto.models.metadata import Metablock
+import in_toto.merkle
+from in_toto.models.metadata import Metablock, COMPRESSION_SUFFIXES
 from in_toto.models.link import (FILENAME_FORMAT, FILENAME_FORMAT_SHORT)
 from in_toto.models.layout import SUBLAYOUT_LINK_DIR_FORMAT
 from in_toto.exceptions import (RuleVerificationError, LayoutExpiredError,
@@ -48,6 +49,10 @@ import in_toto.rulelib
 # Inherits from in_toto base logger (c.f. in_toto.log)
 log = logging.getLogger(__name__)
 
+# Collision-prone hash algorithms, which don't suffice to compare hashdicts
+# recorded with different algorithms (see `_hash_dicts_equal`)
+LEGACY_HASH_ALGORITHMS = frozenset(["md5", "sha1"])
+
 def _raise_on_bad_retval(return_value, command=None):
   """
   <Purpose>
@@ -96,6 +101,9 @@ def load_links_for_layout(layout, link_dir_path):
     For each step the metadata might consist of multiple (thresholds) Link
     or Layout (sub-layouts) files.
 
+    If a file does not exist, its compressed variants, i.e. the file name
+    with a suffix in `COMPRESSION_SUFFIXES` appended, are tried in turn.
+
   <Arguments>
     layout:
           Layout object
@@ -137,12 +145,14 @@ def load_links_for_layout(layout, link_dir_path):
         filename = FILENAME_FORMAT.format(step_name=step.name, keyid=keyid)
         filepath = os.path.join(link_dir_path, filename)
 
-        try:
-          metadata = Metablock.load(filepath)
-          links_per_step[keyid] = metadata
+        for suffix in [""] + list(COMPRESSION_SUFFIXES.values()):
+          try:
+            metadata = Metablock.load(filepath + suffix)
+            links_per_step[keyid] = metadata
+            break
 
-        except IOError:
-          pass
+          except IOError:
+            pass
 
     # Check if the step has been performed by enough number of functionaries
     if len(links_per_step) < step.threshold:
@@ -199,8 +209,10 @@ def run_all_inspections(layout):
     # If so, we should probably make it a default in run_link
     # We could use artifact rule paths.
     material_list = product_list = ["."]
+    # Inspection rules are verified on the returned link, i.e. files must be
+    # recorded individually
     link = in_toto.runlib.in_toto_run(inspection.name, material_list,
-        product_list, inspection.run)
+        product_list, inspection.run, directory_digests=False)
 
     _raise_on_bad_retval(link.signed.byproducts.get("return-value"), inspection.run)
 
@@ -480,6 +492,31 @@ def verify_all_steps_command_alignment(layout, chain_link_dict):
       verify_command_alignment(command, expected_command)
 
 
+def _hash_dicts_equal(hash_dict, other_hash_dict):
+  """Internal helper that returns True if the passed hashdicts of an artifact
+  are equal, or have at least one hash algorithm in common, which is not in
+  LEGACY_HASH_ALGORITHMS, and agree on all common algorithms, e.g. if the
+  artifact was recorded with "sha256" in one link and with "sha256" and
+  "blake2b" in another. Hashdicts that only have legacy or no algorithms in
+  common are never equal. """
+  if hash_dict == other_hash_dict:
+    return True
+
+  common_algorithms = set(hash_dict) & set(other_hash_dict)
+  return bool(common_algorithms - LEGACY_HASH_ALGORITHMS) and all(
+      hash_dict[algorithm] == other_hash_dict[algorithm]
+      for algorithm in common_algorithms)
+
+
+def _artifacts_equal(artifacts, other_artifacts):
+  """Internal helper that returns True if the passed artifact dictionaries
+  have the same paths, and equal hashdicts for each path (see
+  `_hash_dicts_equal`). """
+  return (set(artifacts) == set(other_artifacts) and
+      all(_hash_dicts_equal(hash_dict, other_artifacts[path])
+      for path, hash_dict in six.iteritems(artifacts)))
+
+
 def verify_match_rule(rule, source_artifacts_queue, source_artifacts, links):
   """
   <Purpose>
@@ -516,7 +553,8 @@ def verify_match_rule(rule, source_artifacts_queue, source_artifacts, links):
         A source and destination artifact are equal if the source artifact path
         minus an optional source-path-prefix equals the destination artifact
         path minus an optional destination-path-prefix, and the hash of both
-        artifacts are equal.
+        artifacts are equal, for all hash algorithms recorded for both
+        artifacts (at least one).
         The path prefixes allow for relocating the artifacts between
         steps/inspections. Path prefixes don't allow wildcards.
 
@@ -648,8 +686,8 @@ def verify_match_rule(rule, source_artifacts_queue, source_artifacts, links):
       continue
 
     # finally, if both paths exist, make sure they do in fact have the same
-    # hash
-    if source_artifact != dest_artifact:
+    # hash, for all hash algorithms used in both links
+    if not _hash_dicts_equal(source_artifact, dest_artifact):
       continue
 
     # Matching went well, let's remove the path from the queue. Subsequent
@@ -832,7 +870,7 @@ def verify_modify_rule(rule, source_materials_queue, source_products_queue,
 
     # Is it okay to assume that path returns an artifact? The path
     # should not be in the queues, if it is not in the artifact dictionaries
-    if source_materials[path] == source_products[path]:
+    if _hash_dicts_equal(source_materials[path], source_products[path]):
       continue
 
     modified_materials.add(path)
@@ -1082,12 +1120,70 @@ def verify_all_item_rules(items, links):
     verify_item_rules(item.name, "products", item.expected_products, links)
 
 
-def verify_threshold_constraints(layout, chain_link_dict):
+def _get_leaves_path(link_dir_path, step_name, keyid):
+  """Internal helper that returns the path of the leaves sidecar file of the
+  link for the passed step and keyid (see `in_toto.merkle`). """
+  return os.path.join(link_dir_path, FILENAME_FORMAT.format(
+      step_name=step_name, keyid=keyid) +
+      in_toto.merkle.LEAVES_FILENAME_SUFFIX)
+
+
+def _get_directory_differences(link, other_link, step_name, keyid,
+    other_keyid, link_dir_path):
+  """Internal helper that returns the paths of the files that differ between
+  the directories with different Merkle roots in the passed links, read from
+  their leaves sidecar files in the passed directory. The leaves are not
+  verified, i.e. the paths must only be used for reporting. Returns an empty
+  list if the links have no differing directories, or if the leaves can't be
+  read. """
+  differing = {}
+  for section in ["materials", "products"]:
+    artifacts = getattr(link.signed, section)
+    other_artifacts = getattr(other_link.signed, section)
+    differing[section] = [path for path in
+        set(artifacts) | set(other_artifacts)
+        if in_toto.merkle.is_directory_entry(path) and
+        not _hash_dicts_equal(artifacts.get(path, {}),
+        other_artifacts.get(path, {}))]
+
+  if not any(differing.values()):
+    return []
+
+  try:
+    leaves = in_toto.merkle.load_leaves(
+        _get_leaves_path(link_dir_path, step_name, keyid))
+    other_leaves = in_toto.merkle.load_leaves(
+        _get_leaves_path(link_dir_path, step_name, other_keyid))
+
+  except (IOError, ValueError) as e:
+    log.info("Could not read directory leaves: {}".format(e))
+    return []
+
+  paths = []
+  for index, section in enumerate(["materials", "products"]):
+    for directory in sorted(differing[section]):
+      paths += [directory + path for path in in_toto.merkle.diff(
+          leaves[index].get(directory, {}),
+          other_leaves[index].get(directory, {}))]
+
+  return paths
+
+
+def verify_threshold_constraints(layout, chain_link_dict, link_dir_path=None):
   """
   <Purpose>
     Verifies that all links corresponding to a given step report the same
     materials and products.
 
+    Artifacts are compared on the hash algorithms used in both links, i.e.
+    links may be recorded with different algorithms, as long as each artifact
+    has at least one algorithm in common.
+
+    Directories recorded as Merkle roots (see `in_toto.merkle`) are compared
+    by their roots. Only if roots differ, the leaves sidecar files of the
+    links are read, if a link_dir_path is passed, to report the differing
+    files.
+
     NOTE: This function does not verify if the signatures of each link
     corresponding to a step are valid or created by a different authorized
     functionary. This should be done earlier, using the function
@@ -1107,6 +1203,9 @@ def verify_threshold_constraints(layout, chain_link_dict):
               }, ...
             }
 
+    link_dir_path: (optional)
+            A path to the directory from which the links were loaded.
+
   <Exceptions>
     ThresholdVerificationError
         If there are not enough (threshold) links for a steps
@@ -1148,14 +1247,88 @@ def verify_threshold_constraints(layout, chain_link_dict):
     for keyid, link in six.iteritems(key_link_dict):
       # TODO: Do we only care for artifacts, or do we want to
       # assert equality of other properties as well?
-      if (reference_link.signed.materials != link.signed.materials or
-          reference_link.signed.products != link.signed.products):
-        raise ThresholdVerificationError("Links '{0}' and '{1}' have different"
-            " artifacts!".format(
-                in_toto.models.link.FILENAME_FORMAT.format(
-                    step_name=step.name, keyid=reference_keyid),
-                in_toto.models.link.FILENAME_FORMAT.format(
-                    step_name=step.name, keyid=keyid)))
+      if not (_artifacts_equal(reference_link.signed.materials,
+          link.signed.materials) and _artifacts_equal(
+          reference_link.signed.products, link.signed.products)):
+        message = "Links '{0}' and '{1}' have different artifacts!".format(
+            in_toto.models.link.FILENAME_FORMAT.format(
+                step_name=step.name, keyid=reference_keyid),
+            in_toto.models.link.FILENAME_FORMAT.format(
+                step_name=step.name, keyid=keyid))
+
+        # Drill down into directories with different Merkle roots
+        if link_dir_path is not None:
+          paths = _get_directory_differences(reference_link, link, step.name,
+              reference_keyid, keyid, link_dir_path)
+          if paths:
+            message += " Differing files: '{}'{}.".format("', '".join(
+                paths[:10]), " and {} more".format(len(paths) - 10)
+                if len(paths) > 10 else "")
+
+        raise ThresholdVerificationError(message)
+
+
+def expand_directory_digests(chain_link_dict, link_dir_path):
+  """
+  <Purpose>
+    Replaces the directory entries of each link in the passed
+    chain_link_dict, i.e. directories recorded as Merkle roots, with the
+    files listed in the link's leaves sidecar file, after verifying them
+    against the signed roots (see `in_toto.merkle`), so that artifact rules
+    can be verified per file.
+
+  <Arguments>
+    chain_link_dict:
+            A dictionary containing link metadata per functionary per step,
+            e.g.:
+            {
+              <link name> : {
+                <functionary key id> : <Metablock containing a Link object>,
+                ...
+              }, ...
+            }
+
+    link_dir_path:
+            A path to the directory from which the links and their leaves
+            sidecar files are loaded.
+
+  <Exceptions>
+    in_toto.exceptions.LinkNotFoundError
+        If a link has directory entries and its leaves file can't be read.
+
+    securesystemslib.exceptions.BadHashError
+        If the leaves of a directory don't match the signed root.
+
+  <Side Effects>
+    Reads leaves sidecar files from disk.
+
+  <Returns>
+    The passed chain_link_dict, with expanded links.
+
+  """
+  for step_name, key_link_dict in six.iteritems(chain_link_dict):
+    for keyid, link in six.iteritems(key_link_dict):
+      if not any(in_toto.merkle.is_directory_entry(path)
+          for path in list(link.signed.materials) + list(link.signed.products)):
+        continue
+
+      leaves_path = _get_leaves_path(link_dir_path, step_name, keyid)
+      try:
+        materials_leaves, products_leaves = in_toto.merkle.load_leaves(
+            leaves_path)
+
+      except (IOError, ValueError) as e:
+        raise in_toto.exceptions.LinkNotFoundError("Could not read directory"
+            " leaves '{}' of step '{}': {}".format(leaves_path, step_name, e))
+
+      log.info("Expanding directory digests of '{}'...".format(
+          FILENAME_FORMAT.format(step_name=step_name, keyid=keyid)))
+      link.signed.materials = in_toto.merkle.expand(link.signed.materials,
+          materials_leaves)
+      link.signed.products = in_toto.merkle.expand(link.signed.products,
+          products_leaves)
+
+  return chain_link_dict
 
 
 def reduce_chain_links(chain_link_dict):
@@ -1380,6 +1553,8 @@ def in_toto_verify(layout, layout_key_dict, link_dir_path="."):
 
         7.  Verify threshold constraints, i.e. if all links corresponding to
             one step have recorded the same artifacts (materials and products).
+            Directories recorded as Merkle roots are then replaced with their
+            files, verified against the roots.
 
         8.  Verify rules defined in each Step's expected_materials and
             expected_products field
@@ -1446,7 +1621,8 @@ def in_toto_verify(layout, layout_key_dict, link_dir_path="."):
   verify_all_steps_command_alignment(layout, chain_link_dict)
 
   log.info("Verifying threshold constraints...")
-  verify_threshold_constraints(layout, chain_link_dict)
+  verify_threshold_constraints(layout, chain_link_dict, link_dir_path)
+  chain_link_dict = expand_directory_digests(chain_link_dict, link_dir_path)
   reduced_chain_link_dict = reduce_chain_links(chain_link_dict)
 
   log.info("Verifying Step rules...")
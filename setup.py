@@ -73,8 +73,10 @@ setup(
   # securesystemslib 0.10.9 requires cryptography>=2.1.3, and thereby dictates
   # the minimum version of cryptography for in-toto. The maximum version
   # is dictated by what is available.
-  install_requires=["six", "cryptography", "securesystemslib>=0.10.10", "attrs",
-                    "python-dateutil", "iso8601"],
+  install_requires=["six", "cryptography", "securesystemslib>=0.12.0", "attrs",
+                    "python-dateutil", "iso8601",
+                    "futures; python_version < '3'",
+                    "scandir; python_version < '3.5'"],
   test_suite="tests.runtests",
   entry_points={
     "console_scripts": ["in-toto-run = in_toto.in_toto_run:main",
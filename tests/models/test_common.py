@@ -20,6 +20,8 @@
 import unittest
 import json
 from in_toto.models.common import Signable
+from in_toto.models.link import Link
+from in_toto.models.layout import Layout, Step
 
 class TestSignable(unittest.TestCase):
   """ Verifies Signable class. """
@@ -28,5 +30,22 @@ class TestSignable(unittest.TestCase):
     """Test load string returned by `Signable.repr` as JSON  """
     json.loads(repr(Signable()))
 
+  def test_signable_bytes_changed(self):
+    """Test signable bytes reflect changes, including in place changes. """
+    link = Link(name="test", materials={"foo": {"sha256": "a" * 64}})
+    signable_bytes = link.signable_bytes
+
+    link.materials["foo"] = {"sha256": "b" * 64}
+    self.assertNotEqual(link.signable_bytes, signable_bytes)
+
+    signable_bytes = link.signable_bytes
+    link.materials["foo"]["sha256"] = "c" * 64
+    self.assertNotEqual(link.signable_bytes, signable_bytes)
+
+    layout = Layout(steps=[Step(name="step")])
+    signable_bytes = layout.signable_bytes
+    layout.steps[0].expected_command.append("make")
+    self.assertNotEqual(layout.signable_bytes, signable_bytes)
+
 if __name__ == "__main__":
   unittest.main()
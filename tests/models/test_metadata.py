@@ -18,12 +18,27 @@
 """
 
 import os
+import bz2
+import gzip
+import stat
+import json
+import shutil
+import tempfile
 import unittest
+from mock import patch
+
+import attr
+
+import securesystemslib.keys
+import securesystemslib.formats
 
 import in_toto.util
-from in_toto.models.metadata import Metablock
-from in_toto.models.layout import Layout
+import in_toto.canonical_json
+import in_toto.models.metadata
+from in_toto.models.metadata import Metablock, add_compression_suffix
+from in_toto.models.layout import Layout, Step
 from in_toto.models.link import Link
+from in_toto.exceptions import SignatureVerificationError
 from securesystemslib.exceptions import FormatError
 
 class TestMetablockValidator(unittest.TestCase):
@@ -83,5 +98,293 @@ class TestMetablockValidator(unittest.TestCase):
     metablock._validate_signatures()
 
 
+
+class TestMetablockSignatures(unittest.TestCase):
+  """Test in_toto.models.metadata.Metablock signing and verifying. """
+
+  @classmethod
+  def setUpClass(self):
+    self.keys = [securesystemslib.keys.generate_rsa_key(),
+        securesystemslib.keys.generate_ed25519_key(),
+        securesystemslib.keys.generate_ecdsa_key()]
+
+  def test_sign_and_verify(self):
+    """Sign and verify with each key type, fail verification if changed. """
+    metablock = Metablock(signed=Link(name="test",
+        materials={"foo": {"sha256": "a" * 64}}))
+
+    for key in self.keys:
+      metablock.sign(key)
+    for key in self.keys:
+      metablock.verify_signature(key)
+
+    # Signatures are over securesystemslib's canonical JSON encoding
+    data = securesystemslib.formats.encode_canonical(
+        attr.asdict(metablock.signed)).encode("UTF-8")
+    for key, signature in zip(self.keys, metablock.signatures):
+      self.assertTrue(securesystemslib.keys.verify_signature(key, signature,
+          data))
+
+    # Values changed in place fail verification
+    metablock.signed.materials["foo"] = {"sha256": "b" * 64}
+    for key in self.keys:
+      with self.assertRaises(SignatureVerificationError):
+        metablock.verify_signature(key)
+
+  def test_sign_and_verify_with_fast_encoder(self):
+    """Key-based signing and verifying encode with the fast encoder. """
+    metablock = Metablock(signed=Link(name="test"))
+    with patch("securesystemslib.formats.encode_canonical",
+        side_effect=AssertionError("slow encoder used")), patch(
+        "in_toto.canonical_json.encode_canonical",
+        wraps=in_toto.canonical_json.encode_canonical) as mock_encode:
+      metablock.sign(self.keys[0])
+      metablock.verify_signature(self.keys[0])
+
+    self.assertEqual(mock_encode.call_count, 2)
+
+
+
+class TestMetablockDump(unittest.TestCase):
+  """Test in_toto.models.metadata.Metablock.dump. """
+
+  def setUp(self):
+    self.test_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.test_dir, "test.link")
+
+  def tearDown(self):
+    shutil.rmtree(self.test_dir)
+
+  def test_dump_compatible(self):
+    """Dumped metadata is the indented JSON of the metadata dictionary. """
+    step = Step(name="step", expected_command=["make"])
+    step.add_material_rule_from_string("CREATE foo")
+    for signed in [Link(name="test", materials={u"f\u00f6\"o": {
+        "sha256": "a" * 64}}), Layout(steps=[step])]:
+      metablock = Metablock(signed=signed, signatures=[{"keyid": "a" * 64,
+          "sig": "b"}])
+
+      # Small chunks to write multiple chunks
+      with patch("in_toto.models.metadata.DUMP_CHUNK_SIZE", 10):
+        metablock.dump(self.path)
+
+      with open(self.path, "rb") as fp:
+        self.assertEqual(fp.read(), json.dumps({
+            "signatures": metablock.signatures,
+            "signed": attr.asdict(signed)}, indent=1, separators=(",", ": "),
+            sort_keys=True).encode("utf-8"))
+
+      self.assertEqual(repr(Metablock.load(self.path)), repr(metablock))
+      self.assertListEqual(os.listdir(self.test_dir), ["test.link"])
+
+  def test_dump_atomic(self):
+    """A failed dump leaves the previous file and no temporary file. """
+    Metablock(signed=Link(name="old")).dump(self.path)
+    with patch("in_toto.models.metadata._replace_file",
+        side_effect=OSError("failed")):
+      with self.assertRaises(OSError):
+        Metablock(signed=Link(name="new")).dump(self.path)
+
+    self.assertEqual(Metablock.load(self.path).signed.name, "old")
+    self.assertListEqual(os.listdir(self.test_dir), ["test.link"])
+
+  @unittest.skipIf(os.name == "nt", "requires POSIX permissions")
+  def test_dump_keeps_mode(self):
+    """A replaced file keeps its permissions. """
+    Metablock(signed=Link(name="old")).dump(self.path)
+    os.chmod(self.path, 0o640)
+    Metablock(signed=Link(name="new")).dump(self.path)
+
+    self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+    self.assertEqual(Metablock.load(self.path).signed.name, "new")
+
+  @unittest.skipUnless(hasattr(os, "symlink"), "requires symlinks")
+  def test_dump_through_symlink(self):
+    """Files are written through symlinks. """
+    target = os.path.join(self.test_dir, "target.link")
+    Metablock(signed=Link(name="old")).dump(target)
+    os.symlink("target.link", self.path)
+    Metablock(signed=Link(name="new")).dump(self.path)
+
+    self.assertTrue(os.path.islink(self.path))
+    self.assertEqual(Metablock.load(target).signed.name, "new")
+    self.assertListEqual(sorted(os.listdir(self.test_dir)),
+        ["target.link", "test.link"])
+
+  def test_dump_fsync(self):
+    """Files are flushed to disk if fsync is enabled. """
+    metablock = Metablock(signed=Link(name="test"))
+    for fsync, setting, called in [(None, False, False), (None, "true", True),
+        (True, False, True), (False, True, False)]:
+      with patch("in_toto.settings.METADATA_FSYNC", setting), \
+          patch("os.fsync") as mock_fsync:
+        metablock.dump(self.path, fsync=fsync)
+      self.assertEqual(mock_fsync.called, called)
+
+    with self.assertRaises(FormatError):
+      metablock.dump(self.path, fsync="yes")
+    self.assertListEqual(os.listdir(self.test_dir), ["test.link"])
+
+
+class TestMetablockCompression(unittest.TestCase):
+  """Test compressed metadata files with in_toto.models.metadata.Metablock.
+  """
+
+  def setUp(self):
+    self.test_dir = tempfile.mkdtemp()
+    self.metablock = Metablock(signed=Link(name="test",
+        materials={"a/{}".format(i): {"sha256": "{:064x}".format(i)}
+        for i in range(100)}))
+    self.plain_path = os.path.join(self.test_dir, "test.link")
+    self.metablock.dump(self.plain_path)
+    with open(self.plain_path, "rb") as fp:
+      self.plain = fp.read()
+
+  def tearDown(self):
+    shutil.rmtree(self.test_dir)
+
+  def test_dump_and_load(self):
+    """Files are compressed by suffix and decompressed by magic bytes. """
+    for suffix, compression in [(".gz", "gzip"), (".bz2", "bz2"),
+        (".xz", "lzma")]:
+      path = self.plain_path + suffix
+      # Small chunks to compress and decompress multiple chunks
+      with patch("in_toto.models.metadata.DUMP_CHUNK_SIZE", 100):
+        self.metablock.dump(path)
+        metablock = Metablock.load(path)
+
+      self.assertEqual(repr(metablock), repr(self.metablock))
+      self.assertLess(os.path.getsize(path), len(self.plain))
+
+      # Compressed with the passed codec regardless of the suffix
+      self.metablock.dump(self.plain_path + ".other", compression=compression)
+      with open(path, "rb") as fp, \
+          open(self.plain_path + ".other", "rb") as other_fp:
+        self.assertEqual(fp.read(), other_fp.read())
+
+    with gzip.open(self.plain_path + ".gz") as fp:
+      self.assertEqual(fp.read(), self.plain)
+    with open(self.plain_path + ".bz2", "rb") as fp:
+      self.assertEqual(bz2.decompress(fp.read()), self.plain)
+
+  def test_load_concatenated(self):
+    """Concatenated streams are decompressed one after the other. """
+    path = self.plain_path + ".gz"
+    half = len(self.plain) // 2
+    with open(path, "wb") as fp:
+      for data in [self.plain[:half], self.plain[half:]]:
+        with gzip.GzipFile(fileobj=fp, mode="wb") as gzip_fp:
+          gzip_fp.write(data)
+
+    self.assertEqual(repr(Metablock.load(path)), repr(self.metablock))
+
+  def test_load_without_eof(self):
+    """End of stream is detected by unused data on Python 2. """
+    class Decompressor(object):
+      """zlib decompressor without `eof` attribute, like on Python 2. """
+      def __init__(self, decompressor):
+        self._decompressor = decompressor
+      def __getattr__(self, name):
+        if name == "eof":
+          raise AttributeError(name)
+        return getattr(self._decompressor, name)
+      def copy(self):
+        return Decompressor(self._decompressor.copy())
+
+    create_decompressor = in_toto.models.metadata._create_decompressor
+    path = self.plain_path + ".gz"
+    half = len(self.plain) // 2
+    with open(path, "wb") as fp:
+      for data in [self.plain[:half], self.plain[half:]]:
+        with gzip.GzipFile(fileobj=fp, mode="wb") as gzip_fp:
+          gzip_fp.write(data)
+    with open(path, "rb") as fp:
+      data = fp.read()
+
+    with patch("in_toto.models.metadata._create_decompressor",
+        lambda compression: Decompressor(create_decompressor(compression))):
+      self.assertEqual(repr(Metablock.load(path)), repr(self.metablock))
+
+      for corrupt in [data[:-4], data + b"garbage"]:
+        with open(path, "wb") as fp:
+          fp.write(corrupt)
+        with self.assertRaises(FormatError):
+          Metablock.load(path)
+
+  def test_load_corrupt(self):
+    """Truncated or corrupt compressed files fail with FormatError. """
+    path = self.plain_path + ".bz2"
+    self.metablock.dump(path)
+    with open(path, "rb") as fp:
+      data = fp.read()
+
+    for corrupt in [data[:-10], data[:3] + b"x" * 20, data + b"garbage"]:
+      with open(path, "wb") as fp:
+        fp.write(corrupt)
+      with self.assertRaises(FormatError):
+        Metablock.load(path)
+
+  def test_load_max_decompressed_size(self):
+    """Files that decompress to more than the maximum size fail. """
+    for suffix in [".gz", ".bz2", ".xz"]:
+      path = self.plain_path + suffix
+      self.metablock.dump(path)
+      for setting in [len(self.plain), str(len(self.plain)), None, "none",
+          0, "0"]:
+        with patch("in_toto.settings.METADATA_MAX_DECOMPRESSED_SIZE",
+            setting):
+          self.assertEqual(repr(Metablock.load(path)), repr(self.metablock))
+
+      for setting in [len(self.plain) - 1, 1]:
+        with patch("in_toto.settings.METADATA_MAX_DECOMPRESSED_SIZE",
+            setting), patch("in_toto.models.metadata.DUMP_CHUNK_SIZE", 100):
+          with self.assertRaises(FormatError):
+            Metablock.load(path)
+
+    # Highly compressible data is rejected without decompressing all of it
+    path = self.plain_path + ".gz"
+    with gzip.open(path, "wb") as fp:
+      fp.write(b"0" * (10 * 1024 * 1024))
+    with patch("in_toto.settings.METADATA_MAX_DECOMPRESSED_SIZE", 1024), \
+        patch("in_toto.models.metadata.json.loads") as mock_loads:
+      with self.assertRaises(FormatError):
+        Metablock.load(path)
+    mock_loads.assert_not_called()
+
+    for setting in [-1, "many", True]:
+      with patch("in_toto.settings.METADATA_MAX_DECOMPRESSED_SIZE", setting):
+        with self.assertRaises(FormatError):
+          Metablock.load(path)
+
+  def test_compression_level(self):
+    """The level is passed or taken from the setting. """
+    path = self.plain_path + ".gz"
+    sizes = []
+    for level, setting in [(1, None), (None, "9"), (None, None)]:
+      with patch("in_toto.settings.METADATA_COMPRESSION_LEVEL", setting):
+        self.metablock.dump(path, compression_level=level)
+      sizes.append(os.path.getsize(path))
+      self.assertEqual(repr(Metablock.load(path)), repr(self.metablock))
+    self.assertGreater(sizes[0], sizes[1])
+
+    for level in [0, 10, "fast", 1.5, True]:
+      with self.assertRaises(FormatError):
+        self.metablock.dump(path, compression_level=level)
+
+  def test_add_compression_suffix(self):
+    """The suffix of the passed codec or the setting is appended. """
+    self.assertEqual(add_compression_suffix("a.link"), "a.link")
+    self.assertEqual(add_compression_suffix("a.link", "bz2"), "a.link.bz2")
+    with patch("in_toto.settings.METADATA_COMPRESSION", "LZMA"):
+      self.assertEqual(add_compression_suffix("a.link"), "a.link.xz")
+      self.assertEqual(add_compression_suffix("a.link", "none"), "a.link")
+
+    with patch("in_toto.settings.METADATA_COMPRESSION", "zip"):
+      with self.assertRaises(FormatError):
+        add_compression_suffix("a.link")
+    with self.assertRaises(FormatError):
+      self.metablock.dump(self.plain_path, compression="zip")
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_canonical_json.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/canonical_json.py against securesystemslib's canonical JSON
+  encoder.
+
+"""
+import random
+import unittest
+from collections import OrderedDict
+
+import six
+from mock import patch
+
+import securesystemslib.formats
+import securesystemslib.exceptions
+
+import in_toto.canonical_json
+from in_toto.canonical_json import encode_canonical
+
+
+# Characters used in fuzzed strings, including characters escaped by
+# canonical JSON, control characters escaped by `json.dumps` and non-ASCII
+# characters
+FUZZ_CHARACTERS = (u"abcxyz019 /.-_!\"\\\x00\x01\x08\t\n\x0c\r\x1f\x7f" +
+    u"éΔ 中\U0001f600")
+
+
+def _random_string(rng):
+  return u"".join(rng.choice(FUZZ_CHARACTERS)
+      for _ in range(rng.randint(0, 8)))
+
+
+def _random_object(rng, depth=0, invalid=False):
+  """Returns a random object, which, if invalid is True, may contain values
+  that cannot be encoded as canonical JSON. """
+  choices = ["string", "int", "bool", "none"]
+  if depth < 4:
+    choices += ["list", "tuple", "dict", "dict"]
+  if invalid:
+    choices += ["float", "bytes", "set"]
+  choice = rng.choice(choices)
+
+  if choice == "string":
+    return _random_string(rng)
+
+  elif choice == "int":
+    return rng.choice([0, -1, 1, 2**64, -2**70, rng.randint(-1000, 1000)])
+
+  elif choice == "bool":
+    return rng.choice([True, False])
+
+  elif choice == "none":
+    return None
+
+  elif choice in ["list", "tuple"]:
+    items = [_random_object(rng, depth + 1, invalid)
+        for _ in range(rng.randint(0, 4))]
+    return items if choice == "list" else tuple(items)
+
+  elif choice == "dict":
+    obj = {}
+    for _ in range(rng.randint(0, 4)):
+      key = _random_string(rng)
+      if invalid and rng.random() < 0.1:
+        key = rng.choice([1, None, 1.5, True])
+      obj[key] = _random_object(rng, depth + 1, invalid)
+    return obj
+
+  elif choice == "float":
+    return rng.random()
+
+  elif choice == "bytes":
+    return b"bytes" if six.PY3 else bytearray(b"bytes")
+
+  else:
+    return set([1])
+
+
+class TestEncodeCanonical(unittest.TestCase):
+  """Test in-toto's canonical JSON encoder. """
+
+  def assert_encodes_like_securesystemslib(self, obj):
+    """Assert that obj is encoded to the same string, or that both encoders
+    fail with FormatError. """
+    try:
+      expected = securesystemslib.formats.encode_canonical(obj)
+
+    except securesystemslib.exceptions.FormatError:
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        encode_canonical(obj)
+
+    else:
+      self.assertEqual(encode_canonical(obj), expected)
+
+  def test_encode_examples(self):
+    """Encode examples, including strings that json.dumps escapes. """
+    for obj, expected in [
+        ({"b": [1, True, None], "a": {}}, "{\"a\":{},\"b\":[1,true,null]}"),
+        ({"p\"a\\th": {"sha256": "ab"}},
+            "{\"p\\\"a\\\\th\":{\"sha256\":\"ab\"}}"),
+        (["tab\tnew\nline"], "[\"tab\tnew\nline\"]"),
+        (["back\\\\n"], "[\"back\\\\\\\\n\"]"),
+        (u"é ", u"\"é \""),
+        ((), "[]")]:
+      self.assertEqual(encode_canonical(obj), expected)
+      self.assert_encodes_like_securesystemslib(obj)
+
+  def test_encode_invalid(self):
+    """Fail on objects that are not canonical JSON. """
+    for obj in [1.5, {1: "a"}, {"a": set()}, [float("nan")], object()]:
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        encode_canonical(obj)
+      self.assert_encodes_like_securesystemslib(obj)
+
+  def test_encode_subclasses(self):
+    """Encode subclasses of JSON types like securesystemslib. """
+    class Integer(int):
+      def __str__(self):
+        return "42"
+
+    for obj in [OrderedDict([("b", 1), ("a", 2)]), [Integer(1)],
+        {"a": Integer(2)}]:
+      self.assert_encodes_like_securesystemslib(obj)
+
+  def test_encode_shared_and_circular(self):
+    """Encode shared objects and fail on circular references. """
+    hash_dict = {"sha256": "a" * 64}
+    self.assert_encodes_like_securesystemslib({"a": hash_dict,
+        "b": hash_dict, "c": [hash_dict, hash_dict]})
+
+    circular = {"a": []}
+    circular["a"].append(circular)
+    with self.assertRaises(RuntimeError):
+      encode_canonical(circular)
+
+  def test_encode_escaped_strings(self):
+    """The pure Python encoder is used for escaped strings. """
+    obj = {"a\nb": ["c"]}
+    with patch("in_toto.canonical_json._encode",
+        side_effect=in_toto.canonical_json._encode) as mock_encode:
+      self.assertEqual(encode_canonical(obj), "{\"a\nb\":[\"c\"]}")
+    self.assertTrue(mock_encode.called)
+
+  def test_fuzz(self):
+    """Encode random objects like securesystemslib. """
+    rng = random.Random(0)
+    for _ in range(2000):
+      self.assert_encodes_like_securesystemslib(_random_object(rng))
+      self.assert_encodes_like_securesystemslib(
+          _random_object(rng, invalid=True))
+
+  def test_fuzz_artifacts(self):
+    """Encode random artifact dictionaries like securesystemslib. """
+    rng = random.Random(1)
+    for _ in range(200):
+      artifacts = {}
+      for _ in range(rng.randint(0, 20)):
+        artifacts[_random_string(rng)] = {
+            algorithm: "%064x" % rng.getrandbits(256)
+            for algorithm in rng.sample(["sha256", "sha512", "blake2b"],
+            rng.randint(1, 3))}
+      self.assert_encodes_like_securesystemslib({"materials": artifacts,
+          "products": artifacts, "command": ["make", _random_string(rng)]})
+
+
+if __name__ == "__main__":
+  unittest.main()
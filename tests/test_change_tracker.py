@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_change_tracker.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/change_tracker.py
+
+"""
+import os
+import sys
+import errno
+import unittest
+import shutil
+import tempfile
+from mock import patch
+
+import in_toto.change_tracker
+from in_toto.change_tracker import ChangeTracker
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "requires inotify")
+class TestChangeTracker(unittest.TestCase):
+  """Test tracking changes with inotify and falling back on failure. """
+
+  @classmethod
+  def setUpClass(self):
+    self.working_dir = os.getcwd()
+
+  @classmethod
+  def tearDownClass(self):
+    os.chdir(self.working_dir)
+
+  def setUp(self):
+    self.test_dir = os.path.realpath(tempfile.mkdtemp())
+    os.chdir(self.test_dir)
+    os.makedirs(os.path.join("dir", "subdir"))
+    os.mkdir("other")
+    for path in ["foo", "bar", os.path.join("dir", "a"),
+        os.path.join("dir", "subdir", "b"), os.path.join("other", "c")]:
+      with open(path, "w") as fp:
+        fp.write(path)
+    os.symlink("foo", os.path.join("dir", "link"))
+
+  def tearDown(self):
+    os.chdir(self.working_dir)
+    shutil.rmtree(self.test_dir)
+
+  def test_track_changes(self):
+    """Only untouched files in watched directories are unchanged. """
+    tracker = ChangeTracker(["dir", "foo"])
+    tracker.start()
+    with open(os.path.join("dir", "a"), "a") as fp:
+      fp.write("changed")
+    os.chmod("foo", 0o600)
+    with open(os.path.join("dir", "new"), "w") as fp:
+      fp.write("new")
+    tracker.stop()
+
+    self.assertFalse(tracker.failed)
+    for path in [os.path.join("dir", "a"), "foo", os.path.join("dir", "new"),
+        os.path.join("dir", "link"), os.path.join("other", "c")]:
+      self.assertFalse(tracker.is_unchanged(path), path)
+
+    # Files in the parent directory of a tracked file are tracked too
+    for path in ["bar", os.path.join("dir", "subdir", "b")]:
+      self.assertTrue(tracker.is_unchanged(path), path)
+
+  def test_moved_directory(self):
+    """Files below moved or replaced directories are changed. """
+    tracker = ChangeTracker(["."], base_path=self.test_dir)
+    tracker.start()
+    os.rename(os.path.join("dir", "subdir"), "subdir")
+    os.mkdir(os.path.join("dir", "subdir"))
+    tracker.stop()
+
+    self.assertFalse(tracker.failed)
+    self.assertFalse(tracker.is_unchanged(os.path.join("dir", "subdir", "b")))
+    self.assertTrue(tracker.is_unchanged(os.path.join("dir", "a")))
+    self.assertTrue(tracker.is_unchanged(os.path.join("other", "c")))
+
+  def test_queue_overflow(self):
+    """No file is unchanged if the event queue overflowed. """
+    tracker = ChangeTracker(["dir"])
+    tracker.start()
+    tracker._handle_event(-1, in_toto.change_tracker.IN_Q_OVERFLOW, b"")
+    tracker.stop()
+    self.assertTrue(tracker.failed)
+    self.assertFalse(tracker.is_unchanged(os.path.join("dir", "a")))
+
+  def test_watch_failure(self):
+    """No file is unchanged if watches can't be added. """
+    tracker = ChangeTracker(["dir"])
+    with patch("in_toto.change_tracker.ChangeTracker._add_watch",
+        side_effect=OSError(errno.ENOSPC, "No space left on device")):
+      tracker.start()
+    tracker.stop()
+    self.assertTrue(tracker.failed)
+    self.assertFalse(tracker.is_unchanged(os.path.join("dir", "a")))
+
+  def test_inotify_not_available(self):
+    """No file is unchanged if inotify is not available. """
+    tracker = ChangeTracker(["dir"])
+    with patch("in_toto.change_tracker.sys.platform", "darwin"):
+      tracker.start()
+    tracker.stop()
+    self.assertTrue(tracker.failed)
+    self.assertFalse(tracker.is_unchanged(os.path.join("dir", "a")))
+
+
+if __name__ == "__main__":
+  unittest.main()
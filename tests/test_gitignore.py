@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_gitignore.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/gitignore.py
+
+"""
+import os
+import unittest
+import shutil
+import tempfile
+
+from in_toto.gitignore import GitIgnore, read_patterns
+
+
+class TestGitIgnore(unittest.TestCase):
+  """Test gitignore pattern syntax and semantics. """
+
+  def _assert_matches(self, patterns, excluded, included):
+    """Assert that the passed patterns exclude and include the passed lists
+    of (path, is_dir) tuples. """
+    gitignore = GitIgnore(patterns)
+    for path, is_dir in excluded:
+      self.assertTrue(gitignore.match(path, is_dir),
+          "'{}' should be excluded by {}".format(path, patterns))
+    for path, is_dir in included:
+      self.assertFalse(gitignore.match(path, is_dir),
+          "'{}' should be included by {}".format(path, patterns))
+
+  def test_basename_patterns(self):
+    """Patterns without slash match basenames at any level. """
+    self._assert_matches(["*.log", "f?o", "[!a]bc"],
+        [("a.log", False), ("x/y/a.log", False), ("x/foo", True),
+            ("bbc", False)],
+        [("a.log/x", False), ("fooo", False), ("abc", False), ("x/abc", False)])
+
+  def test_anchored_patterns(self):
+    """Patterns with leading or middle slash match full paths. """
+    self._assert_matches(["/build", "doc/*.txt"],
+        [("build", True), ("doc/a.txt", False)],
+        [("src/build", True), ("doc/x/a.txt", False),
+            ("x/doc/a.txt", False)])
+
+  def test_directory_patterns(self):
+    """Patterns with trailing slash only match directories. """
+    self._assert_matches(["node_modules/", "/target/"],
+        [("node_modules", True), ("src/node_modules", True),
+            ("target", True)],
+        [("node_modules", False), ("src/target", True)])
+
+  def test_double_asterisk_patterns(self):
+    """Leading, trailing and middle double asterisks. """
+    self._assert_matches(["**/cache", "out/**", "a/**/b", "x**y"],
+        [("cache", True), ("p/q/cache", False), ("out/a", False),
+            ("out/a/b", True), ("a/b", False), ("a/x/y/b", False),
+            ("xzzy", False)],
+        [("out", True), ("a/xb", False), ("x/y", False)])
+
+  def test_negation(self):
+    """The last matching pattern decides. """
+    self._assert_matches(["*.log", "!important.log", "x/important.log"],
+        [("a.log", False), ("x/important.log", False)],
+        [("important.log", False), ("y/important.log", False)])
+
+  def test_comments_spaces_and_escapes(self):
+    """Comments, blank lines, trailing spaces and escapes. """
+    self._assert_matches(["# comment", "", "   ", "foo   ", "bar\\ ",
+        "\\#baz", "\\!qux", "a\\*b", "[ab"],
+        [("foo", False), ("bar ", False), ("#baz", False), ("!qux", False),
+            ("a*b", False), ("[ab", False)],
+        [("# comment", False), ("foo ", False), ("bar", False),
+            ("axb", False), ("a", False)])
+
+  def test_root_is_never_excluded(self):
+    """The recorded directory itself is not matched. """
+    self._assert_matches(["*", "**"], [("foo", False)], [(".", True)])
+
+  def test_read_patterns(self):
+    """Read patterns from an ignore file. """
+    test_dir = tempfile.mkdtemp()
+    path = os.path.join(test_dir, ".gitignore")
+    with open(path, "w") as fp:
+      fp.write("# comment\n*.log\n\n!keep.log\n")
+
+    self.assertListEqual(read_patterns(path),
+        ["# comment", "*.log", "", "!keep.log"])
+    shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+  unittest.main()
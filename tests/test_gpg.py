@@ -29,7 +29,7 @@ import cryptography.hazmat.primitives.serialization as serialization
 import cryptography.hazmat.backends as backends
 
 from in_toto.gpg.functions import (gpg_sign_object, gpg_export_pubkey,
-    gpg_verify_signature)
+    gpg_verify_signature, gpg_launch_agent)
 from in_toto.gpg.util import get_version, is_version_fully_supported
 from in_toto.gpg.rsa import create_pubkey as rsa_create_pubkey
 from in_toto.gpg.dsa import create_pubkey as dsa_create_pubkey
@@ -137,6 +137,14 @@ class TestGPGRSA(unittest.TestCase):
 
 
 
+  def test_gpg_launch_agent(self):
+    """Launch the agent for a specific or the default key. """
+    gpg_launch_agent(self.default_keyid, homedir=self.gnupg_home)
+    gpg_launch_agent(homedir=self.gnupg_home)
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      gpg_launch_agent("not a keyid", homedir=self.gnupg_home)
+
+
   def test_gpg_sign_and_verify_object(self):
     """Create a signature using a specific key on the keyring """
 
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_hash_cache.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/hash_cache.py
+
+"""
+import os
+import json
+import unittest
+import shutil
+import tempfile
+from mock import patch, Mock
+
+import in_toto.hash_cache
+from in_toto.hash_cache import HashCache, StatSnapshot, stat_key, time_ns
+from in_toto.models.link import Link
+
+
+@patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0)
+class TestHashCache(unittest.TestCase):
+  """Test HashCache lookups, invalidation, eviction and error handling. """
+
+  @classmethod
+  def setUpClass(self):
+    self.working_dir = os.getcwd()
+    self.test_dir = os.path.realpath(tempfile.mkdtemp())
+    os.chdir(self.test_dir)
+
+  @classmethod
+  def tearDownClass(self):
+    os.chdir(self.working_dir)
+    shutil.rmtree(self.test_dir)
+
+  def setUp(self):
+    self.cache_path = os.path.join("cache", "hashes.sqlite")
+    for name in ["foo", "bar", "baz"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+
+  def tearDown(self):
+    shutil.rmtree("cache", ignore_errors=True)
+
+  def test_set_and_get(self):
+    """Cached hashes are returned for unchanged files in later sessions. """
+    hash_dict = {"sha256": "a" * 64}
+    with HashCache(self.cache_path) as cache:
+      self.assertIsNone(cache.get(os.stat("foo"), ["sha256"]))
+      cache.set(os.stat("foo"), hash_dict, time_ns())
+
+    self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, 0o600)
+
+    with HashCache(self.cache_path) as cache:
+      self.assertDictEqual(cache.get(os.stat("foo"), ["sha256"]), hash_dict)
+      # Not all requested algorithms are cached
+      self.assertIsNone(cache.get(os.stat("foo"), ["sha256", "sha512"]))
+      self.assertIsNone(cache.get(os.stat("bar"), ["sha256"]))
+      self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+  def test_changed_file(self):
+    """Cached hashes are not returned for modified files. """
+    with HashCache(self.cache_path) as cache:
+      cache.set(os.stat("foo"), {"sha256": "a" * 64}, time_ns())
+
+    stat_result = os.stat("foo")
+    with open("foo", "a") as fp:
+      fp.write("changed")
+    self.assertNotEqual(stat_key(stat_result), stat_key(os.stat("foo")))
+
+    with HashCache(self.cache_path) as cache:
+      self.assertIsNone(cache.get(os.stat("foo"), ["sha256"]))
+
+  def test_racy_file(self):
+    """Files with timestamps close to the hashing time are not cached. """
+    start_ns = time_ns()
+    with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 10**18):
+      self.assertTrue(in_toto.hash_cache.is_racy(os.stat("foo"), start_ns))
+      with HashCache(self.cache_path) as cache:
+        cache.set(os.stat("foo"), {"sha256": "a" * 64}, start_ns)
+        self.assertIsNone(cache.get(os.stat("foo"), ["sha256"]))
+
+  def test_evict_least_recently_used(self):
+    """Least recently used entries are evicted if the cache is full. """
+    with HashCache(self.cache_path, max_size=2) as cache:
+      for name in ["foo", "bar"]:
+        cache.set(os.stat(name), {"sha256": "a" * 64}, time_ns())
+
+    # Use "foo" so that "bar" is least recently used
+    with HashCache(self.cache_path, max_size=2) as cache:
+      self.assertIsNotNone(cache.get(os.stat("foo"), ["sha256"]))
+
+    with HashCache(self.cache_path, max_size=2) as cache:
+      cache.set(os.stat("baz"), {"sha256": "a" * 64}, time_ns())
+
+    with HashCache(self.cache_path, max_size=2) as cache:
+      self.assertIsNotNone(cache.get(os.stat("foo"), ["sha256"]))
+      self.assertIsNone(cache.get(os.stat("bar"), ["sha256"]))
+      self.assertIsNotNone(cache.get(os.stat("baz"), ["sha256"]))
+
+  def test_bad_database(self):
+    """Unusable cache databases are ignored. """
+    os.mkdir("cache")
+    with open(self.cache_path, "w") as fp:
+      fp.write("not a database")
+
+    with HashCache(self.cache_path) as cache:
+      cache.set(os.stat("foo"), {"sha256": "a" * 64}, time_ns())
+      self.assertIsNone(cache.get(os.stat("foo"), ["sha256"]))
+
+  def test_bad_max_size(self):
+    """Raise exception with bogus maximum cache size. """
+    for max_size in [-1, "many"]:
+      with self.assertRaises(ValueError):
+        HashCache(self.cache_path, max_size=max_size)
+
+
+
+@patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0)
+class TestStatSnapshot(unittest.TestCase):
+  """Test StatSnapshot lookups and invalidation. """
+
+  @classmethod
+  def setUpClass(self):
+    self.working_dir = os.getcwd()
+    self.test_dir = os.path.realpath(tempfile.mkdtemp())
+    os.chdir(self.test_dir)
+
+  @classmethod
+  def tearDownClass(self):
+    os.chdir(self.working_dir)
+    shutil.rmtree(self.test_dir)
+
+  def test_get_and_set(self):
+    """Snapshot hashes are returned for unchanged files at the same path. """
+    for name in ["foo", "bar"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+
+    snapshot = StatSnapshot()
+    hash_dict = {"sha256": "a" * 64, "sha512": "b" * 128}
+    for name in ["foo", "bar"]:
+      snapshot.set(name, os.stat(name), hash_dict, time_ns())
+    self.assertEqual(len(snapshot), 2)
+
+    self.assertDictEqual(snapshot.get("foo", os.stat("foo"), ["sha256"]),
+        {"sha256": "a" * 64})
+    self.assertIsNone(snapshot.get("foo", os.stat("foo"), ["md5"]))
+    # Another file at a known path
+    self.assertIsNone(snapshot.get("foo", os.stat("bar"), ["sha256"]))
+    self.assertIsNone(snapshot.get("baz", os.stat("foo"), ["sha256"]))
+
+    with open("foo", "a") as fp:
+      fp.write("changed")
+    self.assertIsNone(snapshot.get("foo", os.stat("foo"), ["sha256"]))
+    self.assertEqual((snapshot.hits, snapshot.misses), (1, 4))
+
+    # Racy files are removed from the snapshot
+    with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 10**18):
+      snapshot.set("bar", os.stat("bar"), hash_dict, time_ns())
+    self.assertIsNone(snapshot.get("bar", os.stat("bar"), ["sha256"]))
+    self.assertEqual(len(snapshot), 1)
+
+  def test_get_tracked(self):
+    """Snapshot hashes are returned for files the tracker reports unchanged.
+    """
+    for name in ["foo", "bar"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+    os.link("bar", "baz")
+
+    snapshot = StatSnapshot()
+    hash_dict = {"sha256": "a" * 64}
+    for name in ["foo", "bar"]:
+      snapshot.set(name, os.stat(name), hash_dict, time_ns())
+
+    # No tracker
+    self.assertIsNone(snapshot.get_tracked("foo", ["sha256"]))
+
+    snapshot.tracker = Mock()
+    snapshot.tracker.is_unchanged.side_effect = lambda path: path != "qux"
+    self.assertDictEqual(snapshot.get_tracked("foo", ["sha256"]), hash_dict)
+    self.assertIsNone(snapshot.get_tracked("foo", ["md5"]))
+    # Hard linked, unknown or changed files
+    self.assertIsNone(snapshot.get_tracked("bar", ["sha256"]))
+    self.assertIsNone(snapshot.get_tracked("baz", ["sha256"]))
+    snapshot.set("qux", os.stat("foo"), hash_dict, time_ns())
+    self.assertIsNone(snapshot.get_tracked("qux", ["sha256"]))
+
+    for name in ["foo", "bar", "baz"]:
+      os.remove(name)
+
+  def test_dump_and_load(self):
+    """Snapshots are reloaded with the hashes of the signed link. """
+    for name in ["foo", "bar"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+
+    link = Link(name="test", materials={"foo": {"sha256": "a" * 64},
+        "bar": {"sha256": "b" * 64}})
+    snapshot = StatSnapshot()
+    snapshot.set("foo", os.stat("foo"), {"sha256": "a" * 64}, time_ns())
+    # Entries whose hashes are not in the link are not dumped
+    snapshot.set("bar", os.stat("bar"), {"sha256": "c" * 64}, time_ns())
+    snapshot.dump("snapshot", link)
+
+    loaded = StatSnapshot.load("snapshot", link)
+    self.assertEqual(len(loaded), 1)
+    self.assertDictEqual(loaded.get("foo", os.stat("foo"), ["sha256"]),
+        {"sha256": "a" * 64})
+    self.assertIsNone(loaded.get("foo", os.stat("bar"), ["sha256"]))
+
+    # Snapshots of other links, and missing or invalid snapshots are ignored
+    other_link = Link(name="test", materials={"foo": {"sha256": "d" * 64}})
+    self.assertIsNone(StatSnapshot.load("snapshot", other_link))
+    self.assertIsNone(StatSnapshot.load("missing", link))
+    for content in ["not json", "[]", "{}", json.dumps({"link":
+        StatSnapshot._get_link_digest(link), "entries": {"foo": [1, 2]}})]:
+      with open("snapshot", "w") as fp:
+        fp.write(content)
+      self.assertIsNone(StatSnapshot.load("snapshot", link))
+
+    for name in ["foo", "bar", "snapshot"]:
+      os.remove(name)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -104,6 +104,38 @@ class TestInTotoRecordTool(tests.common.CliTestCase):
     self.assert_cli_sys_exit(["start"] + args, 0)
     self.assert_cli_sys_exit(["stop"] + args, 0)
 
+    # Start/stop with parallel hashing jobs
+    args = ["--step-name", "test2.7", "--key", self.key_path, "--jobs", "2"]
+    self.assert_cli_sys_exit(["start"] + args + ["--materials",
+        self.test_artifact1, self.test_artifact2], 0)
+    self.assert_cli_sys_exit(["stop"] + args + ["--products",
+        self.test_artifact1, self.test_artifact2], 0)
+
+    # Start/stop with hash cache
+    args = ["--step-name", "test2.8", "--key", self.key_path, "--hash-cache",
+        "hashes.sqlite"]
+    self.assert_cli_sys_exit(["start"] + args + ["--materials",
+        self.test_artifact1], 0)
+    self.assert_cli_sys_exit(["stop"] + args + ["--products",
+        self.test_artifact1], 0)
+    self.assertTrue(os.path.exists("hashes.sqlite"))
+    os.remove("hashes.sqlite")
+
+    # Start/stop with hash algorithms
+    args = ["--step-name", "test2.9", "--key", self.key_path,
+        "--hash-algorithms", "sha256", "sha512"]
+    self.assert_cli_sys_exit(["start"] + args + ["--materials",
+        self.test_artifact1], 0)
+    self.assert_cli_sys_exit(["stop"] + args + ["--products",
+        self.test_artifact1], 0)
+
+    # Start/stop with progress
+    args = ["--step-name", "test2.10", "--key", self.key_path, "--progress"]
+    self.assert_cli_sys_exit(["start"] + args + ["--materials",
+        self.test_artifact1], 0)
+    self.assert_cli_sys_exit(["stop"] + args + ["--products",
+        self.test_artifact1], 0)
+
     # Start/stop with recording multiple artifacts
     args = ["--step-name", "test3", "--key", self.key_path]
     self.assert_cli_sys_exit(["start"] + args + ["--materials",
@@ -131,6 +131,46 @@ class TestInTotoRunTool(tests.common.CliTestCase):
     args4 = named_args + ["--base-path", "bogus/path"] + positional_args
     self.assert_cli_sys_exit(args4, 1)
 
+    # Test with parallel hashing jobs
+    args5 = named_args + ["--jobs", "2"] + positional_args
+    self.assert_cli_sys_exit(args5, 0)
+    link_metadata = Metablock.load(self.test_link)
+    self.assertListEqual(list(link_metadata.signed.products.keys()),
+        [self.test_artifact])
+
+    # Test with hash cache
+    args6 = named_args + ["--hash-cache", "hashes.sqlite"] + positional_args
+    self.assert_cli_sys_exit(args6, 0)
+    self.assertTrue(os.path.exists("hashes.sqlite"))
+    os.remove("hashes.sqlite")
+
+    # Test with hash algorithms
+    args7 = named_args + ["--hash-algorithms", "sha256", "sha512"] + \
+        positional_args
+    self.assert_cli_sys_exit(args7, 0)
+    link_metadata = Metablock.load(self.test_link)
+    self.assertListEqual(sorted(
+        link_metadata.signed.products[self.test_artifact].keys()),
+        ["sha256", "sha512"])
+
+    # Test with full rehash
+    args8 = named_args + ["--full-rehash"] + positional_args
+    with patch("in_toto.runlib.in_toto_run") as mock_run:
+      self.assert_cli_sys_exit(args8, 0)
+      self.assertTrue(mock_run.call_args[1]["full_rehash"])
+
+    # Test with change tracking
+    args9 = named_args + ["--track-changes"] + positional_args
+    with patch("in_toto.runlib.in_toto_run") as mock_run:
+      self.assert_cli_sys_exit(args9, 0)
+      self.assertTrue(mock_run.call_args[1]["track_changes"])
+
+    # Test with progress
+    args10 = named_args + ["--progress"] + positional_args
+    with patch("in_toto.runlib.in_toto_run") as mock_run:
+      self.assert_cli_sys_exit(args10, 0)
+      self.assertTrue(callable(mock_run.call_args[1]["progress"]))
+
 
   def test_main_with_specified_gpg_key(self):
     """Test CLI command with specified gpg key. """
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_instrumentation.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/instrumentation.py
+
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+import in_toto.instrumentation
+from in_toto.instrumentation import Instrumentation
+from in_toto.runlib import RecordingStats
+
+
+class TestInstrumentation(unittest.TestCase):
+  """Test measuring phases and commands and dumping the results. """
+
+  def test_measure_phase(self):
+    """Times of repeated phases add up, also if the phase fails. """
+    instrumentation = Instrumentation()
+    for _ in range(2):
+      with instrumentation.measure_phase("materials"):
+        sum(range(10000))
+
+    with self.assertRaises(ValueError):
+      with instrumentation.measure_phase("command"):
+        raise ValueError
+
+    self.assertListEqual(sorted(instrumentation.phases.keys()),
+        ["command", "materials"])
+    for phase in instrumentation.phases.values():
+      self.assertGreaterEqual(phase["wall"], 0)
+      self.assertGreaterEqual(phase["cpu"], 0)
+
+  @unittest.skipIf(in_toto.instrumentation.resource is None,
+      "requires resource module")
+  def test_measure_command(self):
+    """The resource usage of waited for children is recorded. """
+    instrumentation = Instrumentation()
+    with instrumentation.measure_command():
+      subprocess.call([sys.executable, "-c", "sum(range(100000))"])
+
+    self.assertListEqual(sorted(instrumentation.command.keys()),
+        ["in_blocks", "involuntary_context_switches", "max_rss",
+        "out_blocks", "system", "user", "voluntary_context_switches", "wall"])
+    self.assertGreater(instrumentation.command["max_rss"], 0)
+    self.assertGreater(instrumentation.command["user"] +
+        instrumentation.command["system"], 0)
+
+  def test_dump(self):
+    """Instrumentation is written as JSON. """
+    instrumentation = Instrumentation()
+    with instrumentation.measure_phase("products"):
+      pass
+    instrumentation.artifacts["products"] = RecordingStats()
+    instrumentation.artifacts["products"].hashed_bytes = 42
+
+    test_dir = tempfile.mkdtemp()
+    path = os.path.join(test_dir, "test.link.instrumentation")
+    instrumentation.dump(path)
+    with open(path) as fp:
+      data = json.load(fp)
+    shutil.rmtree(test_dir)
+
+    self.assertDictEqual(data, json.loads(json.dumps(
+        instrumentation.to_dict())))
+    self.assertEqual(data["artifacts"]["products"]["hashed_bytes"], 42)
+    self.assertDictEqual(data["command"], {})
+
+
+if __name__ == "__main__":
+  unittest.main()
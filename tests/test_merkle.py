@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_merkle.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/merkle.py
+
+"""
+import os
+import copy
+import unittest
+import shutil
+import tempfile
+
+import securesystemslib.exceptions
+
+from in_toto.merkle import (compute_root, summarize, expand, diff,
+    dump_leaves, load_leaves)
+
+
+class TestMerkle(unittest.TestCase):
+  """Test Merkle roots over recorded directories. """
+
+  def setUp(self):
+    self.artifacts = {
+      "foo": {"sha256": "a" * 64, "sha512": "1" * 128},
+      "dir/a": {"sha256": "b" * 64, "sha512": "2" * 128},
+      "dir/b": {"sha256": "c" * 64, "sha512": "3" * 128},
+      "dir/sub/c": {"sha256": "d" * 64, "sha512": "4" * 128},
+      "other/d": {"sha256": "e" * 64, "sha512": "5" * 128},
+    }
+
+  def test_compute_root(self):
+    """Roots depend on paths and digests of all leaves. """
+    leaves = {"a": {"sha256": "b" * 64}, "b": {"sha256": "c" * 64},
+        "c": {"sha256": "d" * 64}}
+    root = compute_root(leaves, "sha256")
+    self.assertEqual(len(root), 64)
+
+    for changed in [{"a": {"sha256": "b" * 64}, "b": {"sha256": "c" * 64}},
+        dict(leaves, d={"sha256": "e" * 64}),
+        dict(leaves, a={"sha256": "f" * 64}),
+        {"x": leaves["a"], "b": leaves["b"], "c": leaves["c"]}]:
+      self.assertNotEqual(compute_root(changed, "sha256"), root)
+
+    # Empty directories have a root too
+    self.assertNotEqual(compute_root({}, "sha256"), root)
+
+    with self.assertRaises(KeyError):
+      compute_root(leaves, "sha512")
+
+  def test_summarize_and_expand(self):
+    """Summarized artifacts expand to the original artifacts. """
+    summarized, leaves = summarize(self.artifacts, ["dir", "dir/sub",
+        "empty"], ["sha256", "sha512"])
+
+    self.assertListEqual(sorted(summarized.keys()),
+        ["dir/", "foo", "other/d"])
+    self.assertListEqual(sorted(leaves["dir/"].keys()),
+        ["a", "b", "sub/c"])
+    self.assertDictEqual(expand(summarized, leaves), self.artifacts)
+
+    # The current directory summarizes all artifacts
+    summarized, leaves = summarize(self.artifacts, ["."], ["sha256"])
+    self.assertListEqual(list(summarized.keys()), ["./"])
+    self.assertDictEqual(expand(summarized, leaves), {path:
+        {"sha256": hash_dict["sha256"]}
+        for path, hash_dict in self.artifacts.items()})
+
+  def test_expand_tampered_leaves(self):
+    """Leaves that don't match the signed roots are rejected. """
+    summarized, leaves = summarize(self.artifacts, ["dir"], ["sha256"])
+
+    tampered_leaves = []
+    for path, hash_dict in [("a", {"sha256": "f" * 64}), ("x", None),
+        ("b", {"sha256": "not hex"}), ("b", {"sha512": "3" * 128})]:
+      tampered = copy.deepcopy(leaves)
+      if hash_dict is None:
+        tampered["dir/"][path] = tampered["dir/"].pop("a")
+      else:
+        tampered["dir/"][path] = hash_dict
+      tampered_leaves.append(tampered)
+    tampered_leaves.append({})
+
+    for tampered in tampered_leaves:
+      with self.assertRaises(securesystemslib.exceptions.BadHashError):
+        expand(summarized, tampered)
+
+    # Unverified algorithms are dropped
+    added = copy.deepcopy(leaves)
+    added["dir/"]["a"]["sha512"] = "0" * 128
+    self.assertDictEqual(expand(summarized, added)["dir/a"],
+        {"sha256": "b" * 64})
+
+    # Directory entries without roots are rejected
+    with self.assertRaises(securesystemslib.exceptions.BadHashError):
+      expand({"dir/": {}}, leaves)
+
+  def test_diff(self):
+    """Differing, added and removed leaves are reported. """
+    leaves = {"a": {"sha256": "a" * 64}, "b": {"sha256": "b" * 64}}
+    other_leaves = {"a": {"sha256": "f" * 64}, "c": {"sha256": "c" * 64},
+        "b": {"sha256": "b" * 64}}
+    self.assertListEqual(diff(leaves, other_leaves), ["a", "c"])
+    self.assertListEqual(diff(leaves, leaves), [])
+
+  def test_dump_and_load_leaves(self):
+    """Leaves are written to and read from sidecar files. """
+    test_dir = tempfile.mkdtemp()
+    path = os.path.join(test_dir, "test.link.leaves")
+    _, leaves = summarize(self.artifacts, ["dir"], ["sha256"])
+    dump_leaves(path, leaves, {})
+    self.assertEqual(load_leaves(path), (leaves, {}))
+
+    with open(path, "w") as fp:
+      fp.write("[]")
+    with self.assertRaises(ValueError):
+      load_leaves(path)
+
+    shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_progress.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/progress.py
+
+"""
+import unittest
+
+import six
+from mock import patch
+
+from in_toto.runlib import RecordingStats
+from in_toto.progress import ProgressReporter, _format_seconds
+
+
+
+class TtyStringIO(six.StringIO):
+  """In-memory stream that pretends to be a terminal. """
+  def isatty(self):
+    return True
+
+
+
+class TestProgressReporter(unittest.TestCase):
+  """Test the progress reporter for recordings. """
+
+  def _report(self, stream, updates, times):
+    """Call a reporter with the passed (files, done) updates at the passed
+    times, using one recording with 10 files of 1 MB each. """
+    reporter = ProgressReporter(stream=stream, interval=1.0)
+    stats = RecordingStats()
+    stats.total_files = 10
+    with patch("in_toto.progress.time.time", side_effect=times):
+      for files, done in updates:
+        stats.files = files
+        stats.hashed_bytes = files * 10**6
+        reporter(stats, done)
+
+  def test_format_seconds(self):
+    """Seconds are formatted as hours, minutes and seconds. """
+    self.assertEqual(_format_seconds(0), "0:00:00")
+    self.assertEqual(_format_seconds(3723.9), "1:02:03")
+
+  def test_report(self):
+    """Updates are throttled and show throughput, remaining files and ETA. """
+    stream = six.StringIO()
+    self._report(stream, [(0, False), (1, False), (5, False), (10, True)],
+        [100.0, 100.5, 102.0, 104.0])
+
+    self.assertListEqual(stream.getvalue().splitlines(), [
+      "Recording: 0/10 files, 0.0 files/s, 0.0 MB/s, 10 remaining",
+      "Recording: 5/10 files, 2.5 files/s, 2.5 MB/s, 5 remaining,"
+      " ETA 0:00:02",
+      "Recording: 10/10 files, 2.5 files/s, 2.5 MB/s",
+    ])
+
+  def test_report_tty(self):
+    """Updates are written in place on terminals. """
+    stream = TtyStringIO()
+    self._report(stream, [(0, False), (10, True)], [100.0, 102.0])
+    self.assertEqual(stream.getvalue(),
+        "\r\033[KRecording: 0/10 files, 0.0 files/s, 0.0 MB/s, 10 remaining"
+        "\r\033[KRecording: 10/10 files, 5.0 files/s, 5.0 MB/s\n")
+
+  def test_report_recordings(self):
+    """Each recording is reported from its own start. """
+    stream = six.StringIO()
+    reporter = ProgressReporter(stream=stream, label="Hashing")
+    with patch("in_toto.progress.time.time", side_effect=[0.0, 5.0]):
+      for _ in range(2):
+        stats = RecordingStats()
+        reporter(stats, True)
+
+    self.assertListEqual(stream.getvalue().splitlines(),
+        ["Hashing: 0/0 files, 0.0 files/s, 0.0 MB/s"] * 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
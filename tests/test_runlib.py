@@ -20,22 +20,37 @@
 import six
 
 import os
+import sys
+import json
+import mmap
+import fnmatch
+import hashlib
 import unittest
 import shutil
+import tarfile
+import zipfile
 import tempfile
+from mock import patch
 
 import in_toto.settings
+import in_toto.merkle
+import in_toto.hash_cache
 import in_toto.exceptions
+import in_toto.runlib
+import in_toto.streams
+import in_toto.instrumentation
 from in_toto.models.metadata import Metablock
 from in_toto.exceptions import SignatureVerificationError
 from in_toto.runlib import (in_toto_run, in_toto_record_start,
     in_toto_record_stop, record_artifacts_as_dict, _apply_exclude_patterns,
-    _hash_artifact)
+    _compile_exclude_patterns, _hash_artifact, record_artifacts_concurrently,
+    iter_artifacts, RecordingStats, _warm_up_signer)
 from in_toto.util import (generate_and_write_rsa_keypair,
     prompt_import_rsa_key_from_file)
 from in_toto.models.link import (UNFINISHED_FILENAME_FORMAT, FILENAME_FORMAT)
 
 import securesystemslib.formats
+import securesystemslib.hash
 import securesystemslib.exceptions
 
 class Test_ApplyExcludePatterns(unittest.TestCase):
@@ -83,6 +98,19 @@ class Test_ApplyExcludePatterns(unittest.TestCase):
     result = _apply_exclude_patterns(names, patterns)
     self.assertListEqual(result, expected)
 
+  def test_apply_compiled_exclude_patterns(self):
+    """Compiled patterns match like fnmatch and keep the order of names. """
+    names = ["foo", "bar/foo", "baz", "foo.link", "b[a]r", "x.y", "xzy", "*"]
+    patterns = ["*.link", "ba?", "bar/*", "x.y", "[*]"]
+    expected = [name for name in names
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+    result = _apply_exclude_patterns(names,
+        _compile_exclude_patterns(patterns))
+    self.assertListEqual(result, expected)
+    self.assertListEqual(result, ["foo", "b[a]r", "xzy"])
+    self.assertIsNone(_compile_exclude_patterns([]))
+
 
 class TestRecordArtifactsAsDict(unittest.TestCase):
   """Test record_artifacts_as_dict(artifacts). """
@@ -183,6 +211,77 @@ class TestRecordArtifactsAsDict(unittest.TestCase):
 
     os.chdir(self.test_dir)
 
+  def test_record_concurrently(self):
+    """Record with different base paths from threads without chdir. """
+    recordings = [
+      {"artifacts": ["."], "base_path": "subdir"},
+      {"artifacts": ["."], "base_path": "subdir/subsubdir"},
+      {"artifacts": ["foo", "subdir"], "exclude_patterns": ["*foosub?"]},
+      {"artifacts": ["subsubdir"], "base_path": os.path.join(self.test_dir,
+          "subdir"), "hash_algorithms": ["sha512"]},
+    ] * 4
+    expected = [record_artifacts_as_dict(**recording)
+        for recording in recordings]
+    self.assertListEqual(sorted(expected[0]),
+        ["foosub1", "foosub2", "subsubdir/foosubsub"])
+
+    with patch("in_toto.runlib.os.chdir", side_effect=AssertionError):
+      self.assertListEqual(
+          record_artifacts_concurrently(recordings, max_workers=4), expected)
+      self.assertListEqual(record_artifacts_concurrently(recordings),
+          expected)
+
+    self.assertListEqual(record_artifacts_concurrently([]), [])
+    self.assertEqual(os.getcwd(), self.test_dir)
+
+    # Errors are raised for the first failed recording
+    with self.assertRaises(ValueError):
+      record_artifacts_concurrently([{"artifacts": ["."]},
+          {"artifacts": ["."], "base_path": "path/does/not/exist"}])
+
+  def test_iter_artifacts(self):
+    """Test streaming artifacts in ordered and unordered mode. """
+    artifacts_dict = record_artifacts_as_dict(["."])
+    self.assertListEqual(list(iter_artifacts([])), [])
+
+    for pool in ["thread", "process"]:
+      in_toto.settings.ARTIFACT_HASH_POOL = pool
+      for jobs in [1, 3]:
+        ordered = list(iter_artifacts(["foo", "."], jobs=jobs))
+        self.assertListEqual([path for path, _ in ordered], ["foo", "bar",
+            "foo", "subdir/foosub1", "subdir/foosub2",
+            "subdir/subsubdir/foosubsub"])
+        self.assertDictEqual(dict(ordered), artifacts_dict)
+
+        unordered = list(iter_artifacts(["."], jobs=jobs, ordered=False))
+        self.assertDictEqual(dict(unordered), artifacts_dict)
+        self.assertEqual(len(unordered), len(artifacts_dict))
+
+    in_toto.settings.ARTIFACT_HASH_POOL = "thread"
+
+  def test_iter_artifacts_is_lazy(self):
+    """Files are hashed as results are consumed and errors raised early. """
+    with patch("in_toto.runlib._hash_artifact_with_size",
+        return_value=({"sha256": "a" * 64}, 64)) as mock_hash_artifact:
+      artifacts = iter_artifacts(["."])
+      mock_hash_artifact.assert_not_called()
+      self.assertEqual(next(artifacts)[0], "bar")
+      self.assertEqual(mock_hash_artifact.call_count, 1)
+
+      # At most two files per job are hashed ahead
+      artifacts = iter_artifacts(["."], jobs=2)
+      next(artifacts)
+      self.assertLessEqual(mock_hash_artifact.call_count, 1 + 4)
+      artifacts.close()
+
+    with self.assertRaises(ValueError):
+      iter_artifacts(["."], base_path="path/does/not/exist")
+
+    in_toto.settings.ARTIFACT_HASH_POOL = "fork"
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      iter_artifacts(["."], jobs=2)
+    in_toto.settings.ARTIFACT_HASH_POOL = "thread"
+
   def test_empty_artifacts_list_record_nothing(self):
     """Empty list passed. Return empty dict. """
     self.assertDictEqual(record_artifacts_as_dict([]), {})
@@ -294,6 +393,30 @@ class TestRecordArtifactsAsDict(unittest.TestCase):
     os.unlink("subdir_link")
 
 
+  def test_record_without_symlink_loops(self):
+    """Symlinks to the directory itself or a parent directory are skipped. """
+    os.symlink(".", "subdir/subsubdir/self_link")
+    os.symlink("..", "subdir/subsubdir/parent_link")
+    os.symlink(os.path.join("..", ".."), "subdir/subsubdir/root_link")
+
+    # Symlinked dirs that don't form a loop are still followed, also if they
+    # link to a directory that is recorded through another path
+    os.symlink("subsubdir", "subdir/sibling_link")
+
+    artifacts_dict = record_artifacts_as_dict(["."], follow_symlink_dirs=True)
+    self.assertListEqual(sorted(list(artifacts_dict.keys())),
+        sorted(self.full_file_path_list + ["subdir/sibling_link/foosubsub"]))
+
+    # Loops are also detected if the recorded directory is a symlink
+    artifacts_dict = record_artifacts_as_dict(["subdir/subsubdir/root_link"],
+        follow_symlink_dirs=True)
+    self.assertEqual(len(artifacts_dict), len(self.full_file_path_list) + 1)
+
+    for link in ["self_link", "parent_link", "root_link"]:
+      os.unlink(os.path.join("subdir", "subsubdir", link))
+    os.unlink("subdir/sibling_link")
+
+
   def test_record_files_and_subdirs(self):
     """Explicitly record files and subdirs. """
     artifacts_dict = record_artifacts_as_dict(["foo", "subdir"])
@@ -333,6 +456,80 @@ class TestRecordArtifactsAsDict(unittest.TestCase):
           == sorted(expected_results))
 
 
+  def test_gitignore_exclude_patterns(self):
+    """Test excluding artifacts using gitignore syntax and exclude file. """
+    in_toto.settings.ARTIFACT_EXCLUDE_SYNTAX = "gitignore"
+    excludes_and_results = [
+      # Anchored patterns only match full paths
+      (["/foosub1", "/subdir/foosub2"], ["bar", "foo", "subdir/foosub1",
+          "subdir/subsubdir/foosubsub"]),
+      # Directory-only patterns don't match files
+      (["foo*/", "subsubdir/"], ["bar", "foo", "subdir/foosub1",
+          "subdir/foosub2"]),
+      # Negation and double asterisks
+      (["subdir/**", "!foosub?"], ["bar", "foo", "subdir/foosub1",
+          "subdir/foosub2"]),
+      # Files in excluded directories can't be included again
+      (["subdir", "!foosub1"], ["bar", "foo"]),
+      # Explicitly passed paths are matched too
+      (["**/foo"], ["bar", "subdir/foosub1", "subdir/foosub2",
+          "subdir/subsubdir/foosubsub"]),
+      ]
+
+    for exclude_patterns, expected_results in excludes_and_results:
+      artifacts_dict = record_artifacts_as_dict(["foo", "bar", "subdir"],
+          exclude_patterns=exclude_patterns)
+      self.assertListEqual(sorted(list(artifacts_dict)),
+          sorted(expected_results))
+
+    # Patterns from exclude file precede passed patterns
+    with open(".testignore", "w") as fp:
+      fp.write("# Exclude subdir\nsubdir/\n\nfoo\n")
+    in_toto.settings.ARTIFACT_EXCLUDE_FILE = ".testignore"
+    artifacts_dict = record_artifacts_as_dict(["."],
+        exclude_patterns=["!foo", ".testignore"])
+    self.assertListEqual(sorted(list(artifacts_dict)), ["bar", "foo"])
+
+    # Exclude file with fnmatch syntax, where "subdir/" matches nothing
+    in_toto.settings.ARTIFACT_EXCLUDE_SYNTAX = "fnmatch"
+    artifacts_dict = record_artifacts_as_dict(["."],
+        exclude_patterns=[".testignore"])
+    self.assertListEqual(sorted(list(artifacts_dict)), ["bar",
+        "subdir/foosub1", "subdir/foosub2", "subdir/subsubdir/foosubsub"])
+
+    in_toto.settings.ARTIFACT_EXCLUDE_FILE = None
+    os.remove(".testignore")
+
+  def test_bad_exclude_syntax_and_file(self):
+    """Raise exception with bogus exclude syntax or unreadable file. """
+    in_toto.settings.ARTIFACT_EXCLUDE_SYNTAX = "regex"
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      record_artifacts_as_dict(["."])
+    in_toto.settings.ARTIFACT_EXCLUDE_SYNTAX = "fnmatch"
+
+    in_toto.settings.ARTIFACT_EXCLUDE_FILE = "does/not/exist"
+    with self.assertRaises(ValueError):
+      record_artifacts_as_dict(["."])
+    in_toto.settings.ARTIFACT_EXCLUDE_FILE = None
+
+  def test_exclude_patterns_prune_directories(self):
+    """Excluded directories are not traversed and file order is stable. """
+    scanned = []
+    scandir = in_toto.runlib.scandir
+    def _scandir(path):
+      scanned.append(path)
+      return scandir(path)
+
+    with patch("in_toto.runlib.scandir", side_effect=_scandir), patch(
+        "in_toto.runlib._hash_artifact_with_size", return_value=({}, 0)) \
+        as mock_hash_artifact:
+      record_artifacts_as_dict(["."], exclude_patterns=["subdir"])
+
+    self.assertListEqual(scanned, ["."])
+    self.assertListEqual([args[0] for args, _ in
+        mock_hash_artifact.call_args_list], ["bar", "foo"])
+
+
   def test_bad_artifact_exclude_patterns_setting(self):
     """Raise exception with bogus artifact exclude patterns settings. """
     for setting in ["not a list of settings", 12345, True]:
@@ -344,6 +541,304 @@ class TestRecordArtifactsAsDict(unittest.TestCase):
     """Test _hash_artifact passing hash algorithm. """
     self.assertTrue("sha256" in list(_hash_artifact("foo", ["sha256"]).keys()))
 
+  def test_hash_artifact_multiple_algorithms(self):
+    """Test single pass _hash_artifact against securesystemslib. """
+    algorithms = ["sha256", "sha512", "md5"]
+    with open("big", "wb") as fp:
+      fp.write(os.urandom(1000) * 1000)
+
+    # The last chunk is shorter than the others
+    for filepath in ["foo", "big"]:
+      hash_dict = _hash_artifact(filepath, algorithms)
+      for algorithm in algorithms:
+        self.assertEqual(hash_dict[algorithm],
+            securesystemslib.hash.digest_filename(filepath,
+            algorithm).hexdigest())
+
+    os.remove("big")
+
+  def test_hash_artifact_mmap(self):
+    """Test memory-mapped _hash_artifact against buffered reads. """
+    algorithms = ["sha256", "sha512"]
+    with open("big", "wb") as fp:
+      fp.write(os.urandom(1000) * 3000)
+    open("empty", "w").close()
+
+    for filepath in ["foo", "big", "empty"]:
+      hash_dict = _hash_artifact(filepath, algorithms)
+      self.assertDictEqual(
+          _hash_artifact(filepath, algorithms, mmap_threshold=0), hash_dict)
+
+      # Fall back to reading files that can't be mapped
+      with patch("in_toto.runlib.mmap.mmap",
+          side_effect=EnvironmentError("cannot map")) as mock_mmap:
+        self.assertDictEqual(
+            _hash_artifact(filepath, algorithms, mmap_threshold=0), hash_dict)
+        self.assertEqual(mock_mmap.called, filepath != "empty")
+
+    # Fall back to reading mappings without buffer interface (Python 2)
+    def _memoryview(obj):
+      if isinstance(obj, mmap.mmap):
+        raise TypeError("cannot make memory view")
+      return memoryview(obj)
+
+    with patch("in_toto.runlib.memoryview", side_effect=_memoryview,
+        create=True):
+      self.assertDictEqual(_hash_artifact("big", algorithms,
+          mmap_threshold=0), _hash_artifact("big", algorithms))
+
+    # Errors while hashing are not masked by unreleased views on the mapping
+    with patch("securesystemslib.hash.digest", return_value=None):
+      with self.assertRaises(AttributeError):
+        _hash_artifact("big", algorithms, mmap_threshold=0)
+
+    # Files below the threshold are not mapped
+    with patch("in_toto.runlib.mmap.mmap") as mock_mmap:
+      _hash_artifact("big", algorithms, mmap_threshold=3000001)
+      mock_mmap.assert_not_called()
+
+    os.remove("big")
+    os.remove("empty")
+
+  def test_record_with_hash_mmap_threshold(self):
+    """Test recording with hash mmap threshold setting. """
+    artifacts_dict = record_artifacts_as_dict(["."])
+    for threshold in [0, "1", None]:
+      in_toto.settings.ARTIFACT_HASH_MMAP_THRESHOLD = threshold
+      self.assertDictEqual(record_artifacts_as_dict(["."]), artifacts_dict)
+
+    for threshold in [-1, "big", True]:
+      in_toto.settings.ARTIFACT_HASH_MMAP_THRESHOLD = threshold
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        record_artifacts_as_dict(["."])
+
+    in_toto.settings.ARTIFACT_HASH_MMAP_THRESHOLD = 64 * 1024 * 1024
+
+  def test_record_with_hash_algorithms(self):
+    """Test recording with hash algorithms passed as argument or setting. """
+    artifacts_dict = record_artifacts_as_dict(["foo"],
+        hash_algorithms=["sha256", "sha512"])
+    self.assertListEqual(sorted(artifacts_dict["foo"].keys()),
+        ["sha256", "sha512"])
+
+    # Single algorithm from envvars or rcfiles is a string
+    in_toto.settings.ARTIFACT_HASH_ALGORITHMS = "sha512"
+    artifacts_dict = record_artifacts_as_dict(["foo"])
+    self.assertListEqual(list(artifacts_dict["foo"].keys()), ["sha512"])
+    in_toto.settings.ARTIFACT_HASH_ALGORITHMS = ["sha256"]
+
+  @unittest.skipIf(sys.version_info < (3, 6), "requires hashlib.blake2b")
+  def test_record_with_blake2_and_sha3(self):
+    """Test recording with BLAKE2 and SHA-3 hash algorithms. """
+    algorithms = ["blake2b", "blake2s", "sha3_256", "sha3_512"]
+    artifacts_dict = record_artifacts_as_dict(["foo"],
+        hash_algorithms=algorithms)
+    with open("foo", "rb") as fp:
+      data = fp.read()
+    self.assertDictEqual(artifacts_dict["foo"], {algorithm:
+        hashlib.new(algorithm, data).hexdigest() for algorithm in algorithms})
+
+  @unittest.skipUnless(sys.version_info < (3, 6), "requires Python < 3.6")
+  def test_unsupported_hash_algorithms(self):
+    """Raise exception if hashlib does not provide a hash algorithm. """
+    with self.assertRaises(
+        securesystemslib.exceptions.UnsupportedAlgorithmError):
+      record_artifacts_as_dict(["foo"], hash_algorithms=["blake2b"])
+
+  def test_bad_hash_algorithms(self):
+    """Raise exception with bogus hash algorithms. """
+    for hash_algorithms in [[], [1], ["sha256", None], ["no-such-hash"],
+        ["shake_128"]]:
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        record_artifacts_as_dict(["foo"], hash_algorithms=hash_algorithms)
+
+  def test_record_with_jobs(self):
+    """Parallel hashing with thread and process pools equals serial hashing. """
+    artifacts_dict = record_artifacts_as_dict(["."], jobs=1)
+
+    for pool in ["thread", "process"]:
+      in_toto.settings.ARTIFACT_HASH_POOL = pool
+      for jobs in [2, 0, "3"]:
+        self.assertDictEqual(
+            record_artifacts_as_dict(["."], jobs=jobs), artifacts_dict)
+
+      # Jobs via setting
+      in_toto.settings.ARTIFACT_HASH_JOBS = 4
+      self.assertDictEqual(record_artifacts_as_dict(["."]), artifacts_dict)
+      in_toto.settings.ARTIFACT_HASH_JOBS = 1
+
+    in_toto.settings.ARTIFACT_HASH_POOL = "thread"
+
+  def test_record_with_hash_cache(self):
+    """Unchanged files are not re-hashed when using a hash cache. """
+    cache_path = os.path.join(tempfile.mkdtemp(), "hashes.sqlite")
+    artifacts_dict = record_artifacts_as_dict(["."])
+
+    with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0):
+      self.assertDictEqual(record_artifacts_as_dict(["."],
+          hash_cache=cache_path), artifacts_dict)
+
+      # All files are read from the cache (passed via setting) ...
+      in_toto.settings.ARTIFACT_HASH_CACHE = cache_path
+      with patch("in_toto.runlib._hash_artifact_with_size") \
+          as mock_hash_artifact:
+        self.assertDictEqual(record_artifacts_as_dict(["."]), artifacts_dict)
+        mock_hash_artifact.assert_not_called()
+      in_toto.settings.ARTIFACT_HASH_CACHE = None
+
+      # ... except for changed files
+      with open("foo", "w") as fp:
+        fp.write("changed")
+      with patch("in_toto.runlib._hash_artifact_with_size",
+          return_value=({"sha256": "a" * 64}, 7)) as mock_hash_artifact:
+        record_artifacts_as_dict(["."], hash_cache=cache_path)
+        mock_hash_artifact.assert_called_once_with("foo",
+            hash_algorithms=["sha256"], mmap_threshold=64 * 1024 * 1024)
+
+      with open("foo", "w") as fp:
+        fp.write("foo")
+
+    shutil.rmtree(os.path.dirname(cache_path))
+
+  def test_record_hard_links_once(self):
+    """Hard links to the same file are hashed once and recorded each. """
+    os.mkdir("links")
+    self.addCleanup(shutil.rmtree, "links")
+    os.link("foo", os.path.join("links", "foo1"))
+    os.link("foo", os.path.join("links", "foo2"))
+
+    hash_artifact = in_toto.runlib._hash_artifact_with_size
+    for jobs in [1, 2]:
+      stats = RecordingStats()
+      with patch("in_toto.settings.ARTIFACT_DEDUPLICATE_HARD_LINKS", "true"), \
+          patch("in_toto.runlib._hash_artifact_with_size",
+          side_effect=hash_artifact) as mock_hash_artifact:
+        artifacts_dict = record_artifacts_as_dict(["foo", "links", "bar"],
+            jobs=jobs, stats=stats)
+
+      self.assertEqual(mock_hash_artifact.call_count, 2)
+      self.assertListEqual(sorted(artifacts_dict.keys()),
+          ["bar", "foo", "links/foo1", "links/foo2"])
+      self.assertEqual(artifacts_dict["foo"], artifacts_dict["links/foo1"])
+      self.assertEqual(artifacts_dict["foo"], artifacts_dict["links/foo2"])
+      self.assertEqual((stats.files, stats.hashed_files, stats.hashed_bytes,
+          stats.deduplicated_files, stats.deduplicated_bytes), (4, 2, 6, 2, 6))
+
+    # Forgotten files are hashed again
+    with patch("in_toto.settings.ARTIFACT_DEDUPLICATE_HARD_LINKS", True), \
+        patch("in_toto.runlib.HARD_LINK_INODES_SIZE", 0), \
+        patch("in_toto.runlib._hash_artifact_with_size",
+        side_effect=hash_artifact) as mock_hash_artifact:
+      self.assertDictEqual(record_artifacts_as_dict(["foo", "links", "bar"]),
+          artifacts_dict)
+    self.assertEqual(mock_hash_artifact.call_count, 4)
+
+    # Files are neither stat'ed nor deduplicated by default
+    stats = RecordingStats()
+    with patch("in_toto.runlib.os.stat", wraps=os.stat) as mock_stat:
+      self.assertDictEqual(record_artifacts_as_dict(["links"], stats=stats),
+          {"links/foo1": artifacts_dict["foo"],
+          "links/foo2": artifacts_dict["foo"]})
+    self.assertSetEqual(set(args[0] for args, _ in mock_stat.call_args_list),
+        set(["links"]))
+    self.assertEqual((stats.hashed_files, stats.hashed_bytes,
+        stats.deduplicated_files), (2, 6, 0))
+
+  def test_record_progress(self):
+    """Report the progress of recordings and log their totals. """
+    calls = []
+    def progress(stats, done):
+      calls.append((stats.files, stats.total_files, done))
+
+    stats = RecordingStats()
+    with patch("in_toto.runlib.log") as mock_log:
+      record_artifacts_as_dict(["foo", "subdir"], stats=stats,
+          progress=progress)
+
+    self.assertEqual(stats.total_files, 4)
+    self.assertListEqual(calls, [(1, 4, False), (2, 4, False),
+        (3, 4, False), (4, 4, False), (4, 4, True)])
+
+    summary = mock_log.info.call_args[0][0]
+    self.assertTrue(summary.startswith("Recording summary: files=4"
+        " hashed_files=4 hashed_bytes=57 "))
+
+    # Totals of a recording are logged relative to the passed stats
+    with patch("in_toto.runlib.log") as mock_log:
+      record_artifacts_as_dict(["bar"], stats=stats)
+    self.assertEqual(stats.files, 5)
+    self.assertTrue(mock_log.info.call_args[0][0].startswith(
+        "Recording summary: files=1 hashed_files=1 hashed_bytes=3 "))
+
+  def test_record_archive_members(self):
+    """Record members of tar and zip archives without extracting them. """
+    os.mkdir("archives")
+    tar_archives = [("a.tar", "w"), ("a.tar.gz", "w:gz"),
+        ("a.tar.bz2", "w:bz2")]
+    if six.PY3:
+      tar_archives.append(("a.tar.xz", "w:xz"))
+    for name, mode in tar_archives:
+      with tarfile.open(os.path.join("archives", name), mode) as archive:
+        archive.add("foo")
+        archive.add("subdir")
+    with zipfile.ZipFile(os.path.join("archives", "a.zip"), "w") as archive:
+      archive.write("foo")
+      archive.write("subdir/subsubdir/foosubsub")
+    with open(os.path.join("archives", "bad.tar.gz"), "w") as fp:
+      fp.write("not an archive")
+
+    expected = record_artifacts_as_dict(["foo", "subdir"])
+    artifacts_dict = record_artifacts_as_dict(["archives"],
+        archive_members=True)
+
+    for name in [name for name, _ in tar_archives] + ["a.zip"]:
+      path = os.path.join("archives", name)
+      self.assertIn(path, artifacts_dict)
+      members = {member_path[len(path) + 1:]: hash_dict
+          for member_path, hash_dict in artifacts_dict.items()
+          if member_path.startswith(path + "!")}
+      if name == "a.zip":
+        self.assertDictEqual(members, {"foo": expected["foo"],
+            "subdir/subsubdir/foosubsub":
+            expected["subdir/subsubdir/foosubsub"]})
+      else:
+        self.assertDictEqual(members, expected)
+
+    # Bad archives are recorded without members
+    self.assertIn("archives/bad.tar.gz", artifacts_dict)
+    self.assertFalse(any(path.startswith("archives/bad.tar.gz!")
+        for path in artifacts_dict))
+
+    # Members are recorded via setting, with custom separator and excludes
+    in_toto.settings.ARTIFACT_ARCHIVE_MEMBERS = "true"
+    in_toto.settings.ARTIFACT_ARCHIVE_SEPARATOR = "::"
+    artifacts_dict = record_artifacts_as_dict(["archives/a.tar"],
+        exclude_patterns=["*::subdir/foosub*"])
+    self.assertListEqual(sorted(artifacts_dict.keys()), ["archives/a.tar",
+        "archives/a.tar::foo", "archives/a.tar::subdir/subsubdir/foosubsub"])
+
+    for separator in ["", None]:
+      in_toto.settings.ARTIFACT_ARCHIVE_SEPARATOR = separator
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        record_artifacts_as_dict(["archives"])
+
+    in_toto.settings.ARTIFACT_ARCHIVE_MEMBERS = False
+    in_toto.settings.ARTIFACT_ARCHIVE_SEPARATOR = "!"
+    self.assertListEqual(list(record_artifacts_as_dict(
+        ["archives/a.zip"]).keys()), ["archives/a.zip"])
+    shutil.rmtree("archives")
+
+  def test_bad_hash_jobs(self):
+    """Raise exception with bogus number of jobs or pool type. """
+    for jobs in [-1, "many", True, [2]]:
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        record_artifacts_as_dict(["."], jobs=jobs)
+
+    in_toto.settings.ARTIFACT_HASH_POOL = "fiber"
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      record_artifacts_as_dict(["."], jobs=2)
+    in_toto.settings.ARTIFACT_HASH_POOL = "thread"
+
 
 
 class TestInTotoRun(unittest.TestCase):
@@ -407,6 +902,34 @@ class TestInTotoRun(unittest.TestCase):
         record_streams=True)
     self.assertTrue("test" in link.signed.byproducts.get("stdout"))
 
+  def test_in_toto_run_with_streamed_byproduct(self):
+    """Successfully run, verify streamed and truncated byproducts. """
+    for setting in ["BYPRODUCT_STREAM", "BYPRODUCT_MAX_SIZE"]:
+      self.addCleanup(setattr, in_toto.settings, setting,
+          getattr(in_toto.settings, setting))
+
+    in_toto.settings.BYPRODUCT_STREAM = "true"
+    link = in_toto_run(self.step_name, None, None, [sys.executable, "-c",
+        "import sys; sys.stdout.write('test'); sys.stderr.write('x' * 100);"
+        " sys.exit(3)"], record_streams=True)
+    self.assertDictEqual(link.signed.byproducts, {"stdout": "test",
+        "stderr": "x" * 100, "return-value": 3})
+
+    in_toto.settings.BYPRODUCT_MAX_SIZE = "10"
+    link = in_toto_run(self.step_name, None, None, [sys.executable, "-c",
+        "import sys; sys.stderr.write('x' * 100)"], record_streams=True)
+    byproducts = link.signed.byproducts
+    self.assertEqual(byproducts["stdout"], "")
+    self.assertEqual(byproducts["stderr"],
+        "x" * 5 + in_toto.streams.TRUNCATED_FORMAT.format(90) + "x" * 5)
+    self.assertEqual(byproducts["stderr-size"], 100)
+    self.assertDictEqual(byproducts["stderr-hashes"],
+        {"sha256": hashlib.sha256(b"x" * 100).hexdigest()})
+
+    in_toto.settings.BYPRODUCT_MAX_SIZE = -1
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      in_toto_run(self.step_name, None, None, ["true"], record_streams=True)
+
   def test_in_toto_run_without_byproduct(self):
     """Successfully run, verify byproduct is not recorded. """
     link = in_toto_run(self.step_name, None, None, ["echo", "test"],
@@ -433,6 +956,192 @@ class TestInTotoRun(unittest.TestCase):
     link = in_toto_run(self.step_name, [], [], ["echo", "test"])
     self.assertEquals(link.signed.environment["workdir"], os.getcwd())
 
+  @patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0)
+  def test_in_toto_run_delta_recording(self):
+    """Only rehash products that changed while the command was run. """
+    for name in ["unchanged", "changed"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+
+    # The command changes one material and creates a new product
+    cmd = [sys.executable, "-c", "open('changed', 'a').write('!');"
+        " open('new', 'w').write('new')"]
+    hash_artifact = in_toto.runlib._hash_artifact_with_size
+    with patch("in_toto.runlib._hash_artifact_with_size",
+        side_effect=hash_artifact) as mock_hash_artifact:
+      link = in_toto_run(self.step_name, ["unchanged", "changed"],
+          ["unchanged", "changed", "new"], cmd)
+
+    self.assertListEqual(sorted(args[0] for args, _ in
+        mock_hash_artifact.call_args_list),
+        ["changed", "changed", "new", "unchanged"])
+    self.assertDictEqual(link.signed.products,
+        record_artifacts_as_dict(["unchanged", "changed", "new"]))
+    self.assertNotEqual(link.signed.materials["changed"],
+        link.signed.products["changed"])
+
+    # Force a full rehash via argument or setting
+    for full_rehash, setting in [(True, False), (None, "true")]:
+      in_toto.settings.ARTIFACT_FULL_REHASH = setting
+      with patch("in_toto.runlib._hash_artifact_with_size",
+          side_effect=hash_artifact) as mock_hash_artifact:
+        in_toto_run(self.step_name, ["unchanged"], ["unchanged"], ["true"],
+            full_rehash=full_rehash)
+      self.assertEqual(mock_hash_artifact.call_count, 2)
+
+    in_toto.settings.ARTIFACT_FULL_REHASH = "no"
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      in_toto_run(self.step_name, ["unchanged"], ["unchanged"], ["true"])
+    in_toto.settings.ARTIFACT_FULL_REHASH = False
+
+    for name in ["unchanged", "changed", "new"]:
+      os.remove(name)
+
+  @unittest.skipUnless(sys.platform.startswith("linux"), "requires inotify")
+  @patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0)
+  def test_in_toto_run_track_changes(self):
+    """Don't stat products that were not touched while the command was run. """
+    for name in ["unchanged", "changed", "hardlinked"]:
+      with open(name, "w") as fp:
+        fp.write(name)
+    os.link("hardlinked", "hardlink")
+
+    cmd = [sys.executable, "-c", "open('changed', 'a').write('!')"]
+    snapshot_get = in_toto.hash_cache.StatSnapshot.get
+    with patch("in_toto.hash_cache.StatSnapshot.get", autospec=True,
+        side_effect=snapshot_get) as mock_get:
+      link = in_toto_run(self.step_name, ["unchanged", "changed",
+          "hardlinked"], ["unchanged", "changed", "hardlinked"], cmd,
+          track_changes=True)
+
+    # Materials are always stat'ed, products only if changed or hard linked
+    self.assertListEqual(sorted(args[1] for args, _ in
+        mock_get.call_args_list), ["changed", "changed", "hardlinked",
+        "hardlinked", "unchanged"])
+    self.assertDictEqual(link.signed.products,
+        record_artifacts_as_dict(["unchanged", "changed", "hardlinked"]))
+
+    in_toto.settings.ARTIFACT_TRACK_CHANGES = "no"
+    with self.assertRaises(securesystemslib.exceptions.FormatError):
+      in_toto_run(self.step_name, ["unchanged"], ["unchanged"], ["true"])
+    in_toto.settings.ARTIFACT_TRACK_CHANGES = False
+
+    for name in ["unchanged", "changed", "hardlinked", "hardlink"]:
+      os.remove(name)
+
+  @unittest.skipUnless(sys.platform.startswith("linux"), "requires inotify")
+  @patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0)
+  def test_in_toto_run_track_changes_base_path_setting(self):
+    """Watch products relative to the ARTIFACT_BASE_PATH setting. """
+    base_path = tempfile.mkdtemp(dir=self.test_dir)
+    path = os.path.join(base_path, "foo")
+    with open(path, "w") as fp:
+      fp.write("foo")
+
+    self.addCleanup(setattr, in_toto.settings, "ARTIFACT_BASE_PATH", None)
+    in_toto.settings.ARTIFACT_BASE_PATH = base_path
+    cmd = [sys.executable, "-c", "open({!r}, 'w').write('bar')".format(path)]
+    link = in_toto_run(self.step_name, ["foo"], ["foo"], cmd,
+        track_changes=True)
+
+    self.assertNotEqual(link.signed.materials["foo"],
+        link.signed.products["foo"])
+    self.assertDictEqual(link.signed.products,
+        record_artifacts_as_dict(["foo"]))
+
+  def test_in_toto_run_directory_digests(self):
+    """Record directories as Merkle roots and store files in a sidecar. """
+    os.makedirs(os.path.join("tree", "sub"))
+    for name in ["a", os.path.join("sub", "b")]:
+      with open(os.path.join("tree", name), "w") as fp:
+        fp.write(name)
+
+    link = in_toto_run(self.step_name, ["tree"], ["tree", self.test_artifact],
+        ["true"], signing_key=self.key, directory_digests=True)
+    self.assertListEqual(list(link.signed.materials.keys()), ["tree/"])
+    self.assertListEqual(sorted(link.signed.products.keys()),
+        [self.test_artifact, "tree/"])
+
+    link_path = FILENAME_FORMAT.format(step_name=self.step_name,
+        keyid=self.key["keyid"])
+    materials_leaves, products_leaves = in_toto.merkle.load_leaves(
+        link_path + in_toto.merkle.LEAVES_FILENAME_SUFFIX)
+    self.assertDictEqual(in_toto.merkle.expand(link.signed.products,
+        products_leaves), record_artifacts_as_dict(["tree",
+        self.test_artifact]))
+    self.assertDictEqual(materials_leaves, products_leaves)
+
+    os.remove(link_path + in_toto.merkle.LEAVES_FILENAME_SUFFIX)
+    shutil.rmtree("tree")
+
+  def test_in_toto_run_compression(self):
+    """Write a compressed link with the compression setting. """
+    link_path = FILENAME_FORMAT.format(step_name=self.step_name,
+        keyid=self.key["keyid"])
+    with patch("in_toto.settings.METADATA_COMPRESSION", "gzip"):
+      link = in_toto_run(self.step_name, [self.test_artifact],
+          [self.test_artifact], ["true"], signing_key=self.key)
+
+    self.assertFalse(os.path.exists(link_path))
+    with open(link_path + ".gz", "rb") as fp:
+      self.assertEqual(fp.read(2), b"\x1f\x8b")
+    self.assertEqual(repr(Metablock.load(link_path + ".gz")), repr(link))
+    os.remove(link_path + ".gz")
+
+  def test_in_toto_run_instrumentation(self):
+    """Write timings, resource usage and counters to a sidecar. """
+    instrumentation = in_toto.instrumentation.Instrumentation()
+    in_toto_run(self.step_name, [self.test_artifact], [self.test_artifact],
+        ["true"], signing_key=self.key, instrumentation=instrumentation)
+    self.assertListEqual(sorted(instrumentation.phases.keys()),
+        ["command", "materials", "products", "signing", "storing"])
+    self.assertEqual(instrumentation.artifacts["materials"].files, 1)
+    self.assertEqual(instrumentation.artifacts["products"].files, 1)
+
+    link_path = FILENAME_FORMAT.format(step_name=self.step_name,
+        keyid=self.key["keyid"])
+    instrumentation_path = (link_path +
+        in_toto.instrumentation.INSTRUMENTATION_FILENAME_SUFFIX)
+    self.assertFalse(os.path.exists(instrumentation_path))
+
+    in_toto.settings.LINK_INSTRUMENTATION = "true"
+    in_toto_run(self.step_name, [self.test_artifact], [self.test_artifact],
+        ["true"], signing_key=self.key)
+    in_toto.settings.LINK_INSTRUMENTATION = False
+
+    with open(instrumentation_path) as fp:
+      data = json.load(fp)
+    self.assertListEqual(sorted(data.keys()),
+        ["artifacts", "command", "phases"])
+    self.assertEqual(data["artifacts"]["products"]["files"], 1)
+    self.assertIn("wall", data["command"])
+    os.remove(instrumentation_path)
+
+  def test_in_toto_run_warm_up_signer(self):
+    """Launch the gpg-agent in the background, ignoring errors. """
+    self.assertIsNone(_warm_up_signer())
+
+    with patch("in_toto.gpg.functions.gpg_launch_agent",
+        side_effect=OSError) as mock_launch:
+      _warm_up_signer(gpg_keyid="abcd", gpg_home="gnupg").join()
+      _warm_up_signer(gpg_use_default=True).join()
+    self.assertListEqual(mock_launch.call_args_list,
+        [(("abcd", "gnupg"),), ((None, None),)])
+
+    # Signing keys are not warmed up
+    with patch("securesystemslib.keys.create_signature") as mock_sign:
+      self.assertIsNone(_warm_up_signer(signing_key=self.key,
+          gpg_keyid=self.key["keyid"]))
+    mock_sign.assert_not_called()
+
+    # The signer is warmed up while products are recorded
+    with patch("in_toto.runlib._warm_up_signer",
+        wraps=in_toto.runlib._warm_up_signer) as mock_warm_up:
+      link = in_toto_run(self.step_name, None, [self.test_artifact],
+          ["true"], signing_key=self.key)
+    mock_warm_up.assert_called_once_with(self.key, None, False, None)
+    link.verify_signature(self.key)
+
   def test_in_toto_bad_signing_key_format(self):
     """Fail run, passed key is not properly formatted. """
     with self.assertRaises(securesystemslib.exceptions.FormatError):
@@ -542,6 +1251,71 @@ class TestInTotoRecordStop(unittest.TestCase):
     self.assertEquals(list(link.signed.products.keys()), [self.test_product])
     os.remove(self.link_name)
 
+  def test_no_snapshot_by_default(self):
+    """Test record stop hashes all products without opt-in snapshot. """
+    snapshot_name = (self.link_name_unfinished +
+        in_toto.hash_cache.SNAPSHOT_FILENAME_SUFFIX)
+    with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0):
+      in_toto_record_start(self.step_name, [self.test_product], self.key)
+    self.assertFalse(os.path.exists(snapshot_name))
+
+    with patch("in_toto.runlib._hash_artifact_with_size",
+        wraps=in_toto.runlib._hash_artifact_with_size) as mock_hash:
+      in_toto_record_stop(self.step_name, [self.test_product], self.key)
+    self.assertEqual(mock_hash.call_count, 1)
+    os.remove(self.link_name)
+
+  def test_reuse_snapshot_of_materials(self):
+    """Test record stop reuses the hashes of unchanged materials. """
+    in_toto.settings.ARTIFACT_RECORD_SNAPSHOT = True
+    self.addCleanup(setattr, in_toto.settings, "ARTIFACT_RECORD_SNAPSHOT",
+        False)
+    snapshot_name = (self.link_name_unfinished +
+        in_toto.hash_cache.SNAPSHOT_FILENAME_SUFFIX)
+    with open("changed", "w") as fp:
+      fp.write("changed")
+
+    # Don't treat the just created files as racy
+    with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0):
+      in_toto_record_start(self.step_name, [self.test_product, "changed"],
+          self.key)
+    self.assertTrue(os.path.exists(snapshot_name))
+    with open("changed", "w") as fp:
+      fp.write("modified")
+
+    with patch("in_toto.runlib._hash_artifact_with_size",
+        wraps=in_toto.runlib._hash_artifact_with_size) as mock_hash:
+      in_toto_record_stop(self.step_name, [self.test_product, "changed"],
+          self.key)
+    self.assertListEqual([call[0][0] for call in mock_hash.call_args_list],
+        ["changed"])
+    self.assertFalse(os.path.exists(snapshot_name))
+
+    link = Metablock.load(self.link_name)
+    self.assertDictEqual(link.signed.products,
+        record_artifacts_as_dict([self.test_product, "changed"]))
+
+    # Stale snapshots and full rehash fall back to hashing all products
+    for full_rehash in [False, True]:
+      with patch("in_toto.hash_cache.TIMESTAMP_GRANULARITY_NS", 0):
+        in_toto_record_start(self.step_name, [self.test_product, "changed"],
+            self.key)
+        os.rename(snapshot_name, "stale")
+        in_toto_record_start(self.step_name, [self.test_product], self.key)
+        os.rename("stale", snapshot_name)
+
+      if full_rehash:
+        in_toto.settings.ARTIFACT_FULL_REHASH = True
+
+      with patch("in_toto.runlib._hash_artifact_with_size",
+          wraps=in_toto.runlib._hash_artifact_with_size) as mock_hash:
+        in_toto_record_stop(self.step_name, [self.test_product], self.key)
+      in_toto.settings.ARTIFACT_FULL_REHASH = False
+      self.assertEqual(mock_hash.call_count, 1)
+
+    os.remove(self.link_name)
+    os.remove("changed")
+
   def test_create_metadata_with_expected_cwd(self):
     """Test record start/stop run, verify cwd. """
     in_toto_record_start(self.step_name, [], self.key)
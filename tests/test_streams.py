@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+<Program Name>
+  test_streams.py
+
+<Author>
+  agent <agent@local>
+
+<Started>
+  Oct 16, 2026
+
+<Copyright>
+  See LICENSE for licensing information.
+
+<Purpose>
+  Test in_toto/streams.py
+
+"""
+import os
+import io
+import hashlib
+import unittest
+
+from in_toto.streams import StreamCapture, TRUNCATED_FORMAT
+
+
+class TestStreamCapture(unittest.TestCase):
+  """Test capturing, spooling, hashing and truncating streams. """
+
+  def _capture(self, data, **kwargs):
+    """Captures the passed bytes written to a pipe. """
+    read_fd, write_fd = os.pipe()
+    capture = StreamCapture(os.fdopen(read_fd, "rb"), **kwargs)
+    capture.start()
+    with os.fdopen(write_fd, "wb") as fp:
+      fp.write(data)
+    capture.join()
+    self.addCleanup(capture.close)
+    return capture
+
+  def test_capture(self):
+    """Captured output is written through, decoded and hashed. """
+    tee = io.BytesIO()
+    data = b"foo\r\nbar\rbaz\n" * 1000
+    capture = self._capture(data, tee=tee, hash_algorithms=["sha256",
+        "sha512"])
+
+    self.assertEqual(tee.getvalue(), data)
+    self.assertEqual(capture.size, len(data))
+    self.assertEqual(capture.get_text(), "foo\nbar\nbaz\n" * 1000)
+    self.assertDictEqual(capture.get_hashes(), {
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "sha512": hashlib.sha512(data).hexdigest()})
+
+  def test_spool(self):
+    """Output is spooled to a file beyond the threshold only. """
+    for threshold, rolled in [(None, False), (0, True), (100, False),
+        (10, True)]:
+      capture = self._capture(b"x" * 50, spool_threshold=threshold)
+      self.assertEqual(capture._spool._rolled, rolled, threshold)
+      self.assertEqual(capture.get_text(), "x" * 50)
+
+  def test_truncate(self):
+    """Output larger than max_size is truncated to head and tail. """
+    capture = self._capture(b"a" * 100 + b"b" * 100 + b"c" * 101,
+        spool_threshold=0)
+    self.assertEqual(capture.get_text(max_size=301), capture.get_text())
+    self.assertEqual(capture.get_text(max_size=21),
+        "a" * 10 + TRUNCATED_FORMAT.format(280) + "c" * 11)
+
+  def test_broken_tee(self):
+    """Output is captured if it can't be written through. """
+    tee = io.BytesIO()
+    tee.close()
+    capture = self._capture(b"foo", tee=tee)
+    self.assertIsNone(capture.tee)
+    self.assertEqual(capture.get_text(), "foo")
+
+
+if __name__ == "__main__":
+  unittest.main()
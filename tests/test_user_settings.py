@@ -22,9 +22,12 @@ import sys
 import unittest
 import shutil
 import tempfile
+from mock import patch
 import in_toto.settings
 import in_toto.user_settings
 
+import securesystemslib.exceptions
+
 
 class TestUserSettings(unittest.TestCase):
   @classmethod
@@ -114,5 +117,32 @@ class TestUserSettings(unittest.TestCase):
     self.assertRaises(AttributeError, getattr, in_toto.settings,
         "not_whitelisted")
 
+
+  def test_get_bool_setting(self):
+    """ Test passed values and settings are parsed as booleans. """
+    with patch("in_toto.settings.METADATA_FSYNC", "True"):
+      self.assertTrue(in_toto.user_settings.get_bool_setting(None,
+          "METADATA_FSYNC"))
+      self.assertFalse(in_toto.user_settings.get_bool_setting("false",
+          "METADATA_FSYNC"))
+
+    for value in ["yes", 1]:
+      with self.assertRaises(securesystemslib.exceptions.FormatError):
+        in_toto.user_settings.get_bool_setting(value, "METADATA_FSYNC")
+
+
+  def test_get_size_setting(self):
+    """ Test size settings are parsed as None or non-negative integers. """
+    for setting, size in [(None, None), ("None", None), (0, 0),
+        ("1024", 1024)]:
+      with patch("in_toto.settings.BYPRODUCT_MAX_SIZE", setting):
+        self.assertEqual(in_toto.user_settings.get_size_setting(
+            "BYPRODUCT_MAX_SIZE"), size)
+
+    for setting in [-1, "big", True]:
+      with patch("in_toto.settings.BYPRODUCT_MAX_SIZE", setting):
+        with self.assertRaises(securesystemslib.exceptions.FormatError):
+          in_toto.user_settings.get_size_setting("BYPRODUCT_MAX_SIZE")
+
 if __name__ == "__main__":
   unittest.main()
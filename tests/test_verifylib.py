@@ -29,6 +29,7 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 import in_toto.settings
+import in_toto.merkle
 from in_toto.models.metadata import Metablock
 from in_toto.models.link import Link, FILENAME_FORMAT
 from in_toto.models.layout import (Step, Inspection, Layout,
@@ -39,7 +40,7 @@ from in_toto.verifylib import (verify_delete_rule, verify_create_rule,
     verify_command_alignment, run_all_inspections, in_toto_verify,
     verify_sublayouts, get_summary_link, _raise_on_bad_retval,
     load_links_for_layout, verify_link_signature_thresholds,
-    verify_threshold_constraints)
+    verify_threshold_constraints, expand_directory_digests)
 from in_toto.exceptions import (RuleVerificationError,
     SignatureVerificationError, LayoutExpiredError, BadReturnValueError,
     ThresholdVerificationError)
@@ -700,6 +701,35 @@ class TestVerifyMatchRule(unittest.TestCase):
     result = verify_match_rule(rule, queue, artifacts, self.links)
     self.assertEquals(['bar'], result);
 
+  def test_match_on_common_hash_algorithms(self):
+    """["MATCH", "foo", "WITH", "MATERIALS", "FROM", "link-1"],
+    source foo is recorded with additional algorithms, passes if all common
+    algorithms match, and fails without common algorithms. """
+
+    rule = ["MATCH", "foo", "WITH", "MATERIALS", "FROM", "link-1"]
+    for hash_dict, expected in [
+        ({"sha256": self.sha256_foo, "blake2b": "a" * 128}, []),
+        ({"sha256": "aaaaaaaaaa", "blake2b": "a" * 128}, ["foo"]),
+        ({"blake2b": "a" * 128}, ["foo"])]:
+      artifacts = {"foo": hash_dict}
+      result = verify_match_rule(rule, ["foo"], artifacts, self.links)
+      self.assertListEqual(result, expected)
+
+  def test_match_on_common_legacy_hash_algorithm(self):
+    """["MATCH", "foo", "WITH", "MATERIALS", "FROM", "link-1"],
+    fails if md5 is the only common algorithm, even if it matches, and passes
+    if the hashdicts are equal. """
+    link = Metablock(signed=Link(name="link-1",
+        materials={"foo": {"md5": "a" * 32, "sha256": "b" * 64}}))
+    rule = ["MATCH", "foo", "WITH", "MATERIALS", "FROM", "link-1"]
+    for hash_dict, expected in [
+        ({"md5": "a" * 32, "blake2b": "c" * 128}, ["foo"]),
+        ({"md5": "a" * 32}, ["foo"]),
+        ({"md5": "a" * 32, "sha256": "b" * 64}, [])]:
+      artifacts = {"foo": hash_dict}
+      result = verify_match_rule(rule, ["foo"], artifacts, {"link-1": link})
+      self.assertListEqual(result, expected)
+
 
 class TestVerifyItemRules(unittest.TestCase):
   """Test verifylib.verify_item_rules(source_name, source_type, rules, links)"""
@@ -1024,6 +1054,25 @@ class TestInTotoVerify(unittest.TestCase):
       in_toto_verify(layout, layout_key_dict)
     os.rename("package.link.bak", "package.2f89b927.link")
 
+  def test_verify_passing_compressed_links(self):
+    """Test pass verification with compressed link metadata files. """
+    for name, suffix in [("package.2f89b927.link", ".gz"),
+        ("write-code.776a00e2.link", ".xz")]:
+      Metablock.load(name).dump(name + suffix)
+      os.rename(name, name + ".bak")
+
+    layout = Metablock.load(self.layout_single_signed_path)
+    layout_key_dict = import_rsa_public_keys_from_files_as_dict(
+        [self.alice_path])
+    try:
+      in_toto_verify(layout, layout_key_dict)
+
+    finally:
+      for name, suffix in [("package.2f89b927.link", ".gz"),
+          ("write-code.776a00e2.link", ".xz")]:
+        os.remove(name + suffix)
+        os.rename(name + ".bak", name)
+
   def test_verify_failing_inspection_exits_non_zero(self):
     """Test fail verification with inspection returning non-zero. """
     layout = Metablock.load(self.layout_failing_inspection_retval)
@@ -1264,6 +1313,32 @@ class TestInTotoVerifyThresholds(unittest.TestCase):
 
 
 
+  def test_threshold_constraints_with_different_hash_algorithms(self):
+    """ Compare links recorded with different hash algorithms on the
+    common algorithms. """
+    layout = Layout(steps=[Step(name=self.name, threshold=2)])
+    link_bob = Metablock(signed=Link(name=self.name,
+        materials={"foo": {"sha256": self.foo_hash}}))
+
+    for materials, equal in [
+        ({"foo": {"sha256": self.foo_hash, "blake2b": "a" * 128}}, True),
+        ({"foo": {"sha256": "b" * 64, "blake2b": "a" * 128}}, False),
+        ({"foo": {"blake2b": "a" * 128}}, False)]:
+      link_alice = Metablock(signed=Link(name=self.name, materials=materials))
+      chain_link_dict = {
+        self.name: {
+          self.bob_keyid: link_bob,
+          self.alice_keyid: link_alice,
+        }
+      }
+
+      if equal:
+        verify_threshold_constraints(layout, chain_link_dict)
+
+      else:
+        with self.assertRaises(ThresholdVerificationError):
+          verify_threshold_constraints(layout, chain_link_dict)
+
   def test_threshold_constraints_pas_with_equal_links(self):
     """ Pass threshold constraint verification with equal links. """
     # Layout with one step and threshold 2
@@ -1297,6 +1372,56 @@ class TestInTotoVerifyThresholds(unittest.TestCase):
     verify_threshold_constraints(layout, chain_link_dict)
 
 
+  def test_threshold_constraints_with_directory_digests(self):
+    """Compare Merkle roots, report differing files and expand links. """
+    layout = Layout(steps=[Step(name=self.name, threshold=2)])
+    artifacts = {"dir/a": {"sha256": "a" * 64}, "dir/b": {"sha256": "b" * 64},
+        "foo": {"sha256": self.foo_hash}}
+    other_artifacts = dict(artifacts, **{"dir/b": {"sha256": "c" * 64}})
+
+    test_dir = tempfile.mkdtemp()
+    chain_link_dict = {self.name: {}}
+    for keyid, recorded in [(self.bob_keyid, artifacts),
+        (self.alice_keyid, other_artifacts)]:
+      products, leaves = in_toto.merkle.summarize(recorded, ["dir"],
+          ["sha256"])
+      chain_link_dict[self.name][keyid] = Metablock(signed=Link(
+          name=self.name, products=products))
+      in_toto.merkle.dump_leaves(os.path.join(test_dir, FILENAME_FORMAT.format(
+          step_name=self.name, keyid=keyid) + ".leaves"), {}, leaves)
+
+    with self.assertRaises(ThresholdVerificationError) as context:
+      verify_threshold_constraints(layout, chain_link_dict, test_dir)
+    self.assertIn("Differing files: 'dir/b'", str(context.exception))
+
+    # Links with equal roots are expanded to files verified against the roots
+    chain_link_dict[self.name][self.alice_keyid] = copy.deepcopy(
+        chain_link_dict[self.name][self.bob_keyid])
+    shutil.copy(os.path.join(test_dir, FILENAME_FORMAT.format(
+        step_name=self.name, keyid=self.bob_keyid) + ".leaves"),
+        os.path.join(test_dir, FILENAME_FORMAT.format(
+        step_name=self.name, keyid=self.alice_keyid) + ".leaves"))
+    verify_threshold_constraints(layout, chain_link_dict, test_dir)
+    expanded = expand_directory_digests(copy.deepcopy(chain_link_dict),
+        test_dir)
+    for link in expanded[self.name].values():
+      self.assertDictEqual(link.signed.products, artifacts)
+
+    # Leaves that don't match the roots, or no leaves at all
+    leaves_path = os.path.join(test_dir, FILENAME_FORMAT.format(
+        step_name=self.name, keyid=self.alice_keyid) + ".leaves")
+    _, leaves = in_toto.merkle.summarize(other_artifacts, ["dir"], ["sha256"])
+    in_toto.merkle.dump_leaves(leaves_path, {}, leaves)
+    with self.assertRaises(securesystemslib.exceptions.BadHashError):
+      expand_directory_digests(copy.deepcopy(chain_link_dict), test_dir)
+
+    os.remove(leaves_path)
+    with self.assertRaises(in_toto.exceptions.LinkNotFoundError):
+      expand_directory_digests(copy.deepcopy(chain_link_dict), test_dir)
+
+    shutil.rmtree(test_dir)
+
+
 
 
 